@@ -1,32 +1,55 @@
 from __future__ import annotations
 
+if __name__ == "__main__":
+    # `python -m bugbear` runs the `bugbear` command before anything else is
+    # defined: the command imports `bugbear` as a module if it checks files
+    # here, and not at all if it asks a server to.
+    import sys
+
+    import bugbear_client
+
+    sys.exit(bugbear_client.main())
+
+import argparse
 import ast
 import builtins
+import io
 import itertools
 import logging
+import marshal
 import math
+import os
 import re
 import sys
+import threading
+import time
+import tokenize
 import warnings
+from array import array
+from bisect import bisect_left
 from collections import Counter, defaultdict
-from contextlib import suppress
+from contextlib import contextmanager, suppress
 from functools import lru_cache
 from keyword import iskeyword
 from typing import (
     Any,
+    Callable,
+    ClassVar,
     Dict,
     Iterable,
     Iterator,
-    List,
     NamedTuple,
+    Optional,
     Protocol,
     Sequence,
-    cast,
+    TypeVar,
+    overload,
 )
 
 import attr  # type: ignore
-import pycodestyle  # type: ignore
 from flake8.exceptions import PluginExecutionFailed
+from flake8.style_guide import Decision, DecisionEngine
+from flake8.utils import stdin_get_value
 
 __version__ = "25.11.29"
 
@@ -42,7 +65,19 @@ CONTEXTFUL_NODES = (
     ast.DictComp,
     ast.GeneratorExp,
 )
+CONTEXTFUL_NODE_TYPES = frozenset(CONTEXTFUL_NODES)
 FUNCTION_NODES = (ast.AsyncFunctionDef, ast.FunctionDef, ast.Lambda)
+COMPREHENSION_NODES = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+LOOP_NODES = (ast.For, ast.AsyncFor, ast.While, *COMPREHENSION_NODES)
+B023_ASSIGNMENTS = (
+    ast.Assign,
+    ast.AnnAssign,
+    ast.AugAssign,
+    ast.For,
+    ast.AsyncFor,
+    ast.comprehension,
+)
+SCOPE_NODES = (*FUNCTION_NODES, ast.ClassDef, *COMPREHENSION_NODES)
 FUNCTIONS_WITHOUT_SIDE_EFFECTS = (
     "all",
     "any",
@@ -70,10 +105,28 @@ B908_unittest_methods = {
 
 B902_default_decorators = {"classmethod"}
 
+# The options flake8's `DecisionEngine` reads, with the values flake8 gives them
+# when they aren't set, for options that don't come from flake8.  "B" is the
+# code of this plugin's entry point.
+DECISION_OPTION_DEFAULTS: dict[str, list[str] | None] = {
+    "select": None,
+    "extend_select": None,
+    "ignore": None,
+    "extend_ignore": None,
+    "extended_default_select": ["B"],
+    "extended_default_ignore": [],
+}
+
+
+class Context:
+    __slots__ = ("node", "stack", "class_summary")
 
-class Context(NamedTuple):
-    node: ast.AST
-    stack: list[ast.AST]
+    def __init__(self, node: ast.AST, stack: list[ast.AST]) -> None:
+        self.node = node
+        self.stack = stack
+        # The summary of the class, for the context of a `ClassDef`, built on
+        # first use by `BugBearVisitor.class_summary()`.
+        self.class_summary: ClassSummary | None = None
 
 
 @attr.s(unsafe_hash=False)
@@ -87,11 +140,59 @@ class BugBearChecker:
     max_line_length = attr.ib(default=79)
     visitor = attr.ib(init=False, factory=lambda: BugBearVisitor)
     options = attr.ib(default=None)
+    # set by `enabled_codes()`, or up front when checking many files with the
+    # same options
+    _enabled_codes: frozenset[str] | None = attr.ib(default=None, init=False)
+    # The enabled codes of each select/ignore configuration, so that flake8,
+    # which makes a checker per file, decides them once per run.
+    _enabled_codes_by_options: ClassVar[dict[tuple, frozenset[str]]] = {}
 
     def run(self) -> Iterable[tuple[int, int, str, type]]:
+        for e in self.collect_errors():
+            yield self.adapt_error(e)
+
+    def collect_errors(self) -> list[error]:
+        """Runs the checks and returns the errors with enabled codes.
+
+        Unlike `run()`, this doesn't format the messages, which consumers that
+        only need the codes and positions of the errors can do without.
+        """
+        cache = self.result_cache()
+        if cache is None:
+            return self.find_errors()
+        # a hit needs no tree
+        self.load_lines()
+        key = cache.key(source_text(self.lines), self.result_fingerprint())
+        errors = cache.get(key)
+        if errors is None:
+            errors = self.find_errors()
+            cache.put(key, errors)
+        return errors
+
+    def find_errors(self) -> list[error]:
+        """Runs the checks, without looking at the cache."""
         if not self.tree or not self.lines:
             self.load_file()
 
+        enabled_codes = self.enabled_codes()
+        visitor = self.visitor(
+            filename=self.filename,
+            lines=self.lines,
+            enabled_codes=enabled_codes,
+            **self.visitor_options(),
+        )
+        try:
+            visitor.visit(self.tree)
+        except RecursionError as exc:
+            raise PluginExecutionFailed(self.filename, self.name, exc) from exc
+        errors: Iterable[error] = visitor.errors
+        if "B950" in enabled_codes:
+            errors = itertools.chain(errors, self.gen_line_based_checks())
+        enabled = [error.code in enabled_codes for error in _errors]
+        return [e for e in errors if enabled[e.error_index]]
+
+    def visitor_options(self) -> dict[str, Any]:
+        """Returns the options of the AST checks, from flake8's options."""
         if self.options and hasattr(self.options, "extend_immutable_calls"):
             b008_b039_extend_immutable_calls = set(self.options.extend_immutable_calls)
         else:
@@ -101,40 +202,92 @@ class BugBearChecker:
         if self.options and hasattr(self.options, "classmethod_decorators"):
             b902_classmethod_decorators = set(self.options.classmethod_decorators)
 
-        visitor = self.visitor(
-            filename=self.filename,
-            lines=self.lines,
-            b008_b039_extend_immutable_calls=b008_b039_extend_immutable_calls,
-            b902_classmethod_decorators=b902_classmethod_decorators,
+        return {
+            "b008_b039_extend_immutable_calls": b008_b039_extend_immutable_calls,
+            "b902_classmethod_decorators": b902_classmethod_decorators,
+        }
+
+    def result_fingerprint(self) -> bytes:
+        """Returns what the errors depend on besides the source code."""
+        options = sorted((k, sorted(v)) for k, v in self.visitor_options().items())
+        enabled_codes = sorted(self.enabled_codes())
+        return repr((options, enabled_codes, self.max_line_length)).encode()
+
+    def result_cache(self) -> ResultCache | None:
+        """Returns the cache selected with `--bugbear-cache-dir`, if any."""
+        directory = getattr(self.options, "bugbear_cache_dir", None)
+        if not directory:
+            return None
+        max_size = getattr(self.options, "bugbear_cache_max_size", 64)
+        # a connection can't be shared with processes forked from this one
+        return open_result_cache(
+            os.path.abspath(directory), max_size * 2**20, os.getpid()
         )
-        try:
-            visitor.visit(self.tree)
-        except RecursionError as exc:
-            raise PluginExecutionFailed(self.filename, self.name, exc) from exc
-        for e in itertools.chain(visitor.errors, self.gen_line_based_checks()):
-            if self.should_warn(e.message[:4]):
-                yield self.adapt_error(e)
+
+    def enabled_codes(self) -> frozenset[str]:
+        """Returns the codes that will be reported with the current options.
+
+        Checks that can only emit other codes are not run at all.  When flake8
+        drives the plugin, its select/ignore configuration is applied here
+        already instead of discarding the errors after they were computed.
+        """
+        if self._enabled_codes is None:
+            # No (or incomplete) options, e.g. when not running under flake8,
+            # get flake8's defaults.
+            decision_options = {
+                name: getattr(self.options, name, default)
+                for name, default in DECISION_OPTION_DEFAULTS.items()
+            }
+            key = (
+                sys.version_info,
+                self.options is None,
+                *(None if v is None else tuple(v) for v in decision_options.values()),
+            )
+            enabled_codes = self._enabled_codes_by_options.get(key)
+            if enabled_codes is None:
+                codes = [code for code in available_codes() if self.should_warn(code)]
+                decision_engine = DecisionEngine(argparse.Namespace(**decision_options))
+                enabled_codes = frozenset(
+                    code
+                    for code in codes
+                    if decision_engine.decision_for(code) is Decision.Selected
+                )
+                self._enabled_codes_by_options[key] = enabled_codes
+            self._enabled_codes = enabled_codes
+        return self._enabled_codes
 
     def gen_line_based_checks(self) -> Iterator["error"]:
         """gen_line_based_checks() -> (error, error, error, ...)
 
         The following simple checks are based on the raw lines, not the AST.
         """
-        noqa_type_ignore_regex = re.compile(
-            r"#\s*(noqa|type:\s*ignore|pragma:)[^#\r\n]*$"
+        lines = self.lines
+        limit = 1.1 * self.max_line_length
+        # Removing comments only makes lines shorter, so only the lines that are
+        # too long as they are need a closer look.  They're picked out without
+        # running any Python code per line.
+        lengths = (
+            lines.line_lengths() if isinstance(lines, SourceLines) else map(len, lines)
         )
-        for lineno, line in enumerate(self.lines, start=1):
+        candidates = itertools.compress(
+            itertools.count(), map((limit + 1).__lt__, lengths)
+        )
+        for i in candidates:
+            lineno = i + 1
+            line = lines[i]
             # Special case: ignore long shebang (following pycodestyle).
             if lineno == 1 and line.startswith("#!"):
                 continue
 
             # At first, removing noqa and type: ignore trailing comments"
-            no_comment_line = noqa_type_ignore_regex.sub("", line)
-            if no_comment_line != line:
-                no_comment_line = noqa_type_ignore_regex.sub("", no_comment_line)
+            no_comment_line = line
+            if "#" in line:
+                no_comment_line = NOQA_TYPE_IGNORE_REGEX.sub("", line)
+                if no_comment_line != line:
+                    no_comment_line = NOQA_TYPE_IGNORE_REGEX.sub("", no_comment_line)
 
             length = len(no_comment_line) - 1
-            if length > 1.1 * self.max_line_length and no_comment_line.strip():
+            if length > limit and no_comment_line.strip():
                 # Special case long URLS and paths to follow pycodestyle.
                 # Would use the `pycodestyle.maximum_line_length` directly but
                 # need to supply it arguments that are not available so chose
@@ -160,24 +313,33 @@ class BugBearChecker:
 
     @classmethod
     def adapt_error(cls, e: error) -> tuple[int, int, str, type]:
-        """Adapts the extended error namedtuple to be compatible with Flake8."""
-        return e._replace(message=e.message.format(*e.vars))[:4]
+        """Adapts the compact error record to the tuple Flake8 expects."""
+        return e.lineno, e.col, e.format_message(), e.type
 
     def load_file(self) -> None:
         """Loads the file in a way that auto-detects source encoding and deals
         with broken terminal encodings for stdin.
 
+        Only what's missing of the lines and the tree is loaded.  The file is
+        read once, and the tree is parsed from the same text the lines are
+        views of.
+
         Stolen from flake8_import_order because it's good.
         """
 
+        self.load_lines()
+        if not self.tree:
+            self.tree = ast.parse(source_text(self.lines))
+
+    def load_lines(self) -> None:
+        """Loads the lines like `load_file()`, but not the tree."""
         if self.filename in ("stdin", "-", None):
             self.filename = "stdin"
-            self.lines = pycodestyle.stdin_get_value().splitlines(True)
-        else:
-            self.lines = pycodestyle.readlines(self.filename)
-
-        if not self.tree:
-            self.tree = ast.parse("".join(self.lines))
+        if not self.lines:
+            if self.filename == "stdin":
+                self.lines = SourceLines(stdin_get_value(), SPLITLINES_LINE_END)
+            else:
+                self.lines = SourceLines(read_source(self.filename))
 
     @staticmethod
     def add_options(optmanager: Any) -> None:
@@ -203,6 +365,20 @@ class BugBearChecker:
                     " by B902"
                 ),
             )
+        optmanager.add_option(
+            "--bugbear-cache-dir",
+            parse_from_config=True,
+            default=None,
+            help="Directory to cache Bugbear's results in, by file contents.",
+        )
+        optmanager.add_option(
+            "--bugbear-cache-max-size",
+            type=int,
+            parse_from_config=True,
+            default=64,
+            help="Size in MiB above which the least recently used results are"
+            " dropped from the cache. (Default: %(default)s)",
+        )
 
     @lru_cache  # noqa: B019
     def should_warn(self, code: str) -> bool:
@@ -231,8 +407,9 @@ class BugBearChecker:
             )
             return True
 
+        select = getattr(self.options, "select", None)
         for i in range(2, len(code) + 1):
-            if self.options.select and code[:i] in self.options.select:
+            if select and code[:i] in select:
                 return True
 
             # flake8 >=4.0: Also check for codes in extend_select
@@ -247,11 +424,251 @@ class BugBearChecker:
             "Optional warning %s not present in selected warnings: %r. Not "
             "firing it at all.",
             code,
-            self.options.select,
+            select,
         )
         return False
 
 
+# where `open()` ends lines, after translating "\r\n" and "\r" to "\n"
+LINE_END = re.compile("\n")
+# where `str.splitlines()` ends lines
+SPLITLINES_LINE_END = re.compile("\r\n|[\n\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]")
+
+
+class SourceLines(Sequence[str]):
+    """The lines of a source text, sliced from it when they're used.
+
+    A list of lines takes about as much memory again as the text itself, so
+    only the offsets where the lines start are kept, and they're only computed
+    when the lines are first used.
+    """
+
+    def __init__(self, text: str, line_end: re.Pattern[str] = LINE_END) -> None:
+        self.text = text
+        self._line_end = line_end
+        self._offsets: array[int] | None = None
+
+    @property
+    def offsets(self) -> array[int]:
+        """Where each line starts, followed by the length of the text."""
+        if self._offsets is None:
+            offsets = array("q", [0])
+            offsets.extend(m.end() for m in self._line_end.finditer(self.text))
+            if offsets[-1] != len(self.text):
+                offsets.append(len(self.text))
+            self._offsets = offsets
+        return self._offsets
+
+    def line_lengths(self) -> Iterator[int]:
+        """The length of each line, without slicing the lines."""
+        offsets = self.offsets
+        return map(int.__sub__, itertools.islice(offsets, 1, None), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...  # noqa: E704
+
+    @overload
+    def __getitem__(self, index: slice) -> list[str]: ...  # noqa: E704
+
+    def __getitem__(self, index: int | slice) -> str | list[str]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        offsets = self.offsets
+        if index < 0:
+            index += len(offsets) - 1
+        if not 0 <= index < len(offsets) - 1:
+            raise IndexError("line index out of range")
+        return self.text[offsets[index] : offsets[index + 1]]
+
+    def __iter__(self) -> Iterator[str]:
+        text = self.text
+        offsets = self.offsets
+        for i in range(len(offsets) - 1):
+            yield text[offsets[i] : offsets[i + 1]]
+
+    def __bool__(self) -> bool:
+        return bool(self.text)
+
+
+def read_source(filename: str) -> str:
+    """Reads a source file like `pycodestyle.readlines()`, but into one string.
+
+    The encoding is detected from a BOM or a coding cookie, with a fallback to
+    Latin-1 if it's improperly declared, and line endings are translated to
+    "\n" like files opened in text mode do.  The file is read once, as bytes.
+    """
+    with open(filename, "rb") as f:
+        data = f.read()
+    try:
+        encoding, _ = tokenize.detect_encoding(io.BytesIO(data).readline)
+        text = data.decode(encoding)
+    except (LookupError, SyntaxError, UnicodeError):
+        # Fall back if file encoding is improperly declared
+        text = data.decode("latin-1")
+    del data
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def source_text(lines: Sequence[str]) -> str:
+    """Returns the text of `lines`, without a copy if they're `SourceLines`."""
+    if isinstance(lines, SourceLines):
+        return lines.text
+    return "".join(lines)
+
+
+class ResultCache:
+    """Errors found before, keyed by the source code and the options.
+
+    The errors are kept in an SQLite database in `directory`, which any
+    number of processes can use at once.  Within a process, the connection is
+    shared by its threads, one at a time.  When they take up more than
+    `max_size` bytes, the least recently used ones are dropped.  Errors from
+    the database are logged and otherwise treated like a miss, so a broken
+    cache only makes a run slower.
+    """
+
+    # how long after it was last recorded the use of an entry is recorded
+    # again, in seconds; most hits don't have to write
+    TOUCH_INTERVAL = 3600
+
+    def __init__(self, directory: str, max_size: int) -> None:
+        # only imported when the cache is used
+        import sqlite3
+
+        self.max_size = max_size
+        self.database_error = sqlite3.Error
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(
+            os.path.join(directory, "cache.sqlite3"),
+            timeout=60,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self.connection.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            BEGIN IMMEDIATE;
+            CREATE TABLE IF NOT EXISTS results (
+                key BLOB PRIMARY KEY, errors BLOB NOT NULL, used INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS results_used ON results (used);
+            CREATE TABLE IF NOT EXISTS size (total INTEGER NOT NULL);
+            INSERT INTO size SELECT 0 WHERE NOT EXISTS (SELECT * FROM size);
+            COMMIT;
+            """)
+
+    @staticmethod
+    def key(text: str, fingerprint: bytes) -> bytes:
+        import hashlib
+
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(_code_digest())
+        digest.update(sys.version.encode())
+        digest.update(fingerprint)
+        digest.update(text.encode("utf-8", "surrogatepass"))
+        return digest.digest()
+
+    def get(self, key: bytes) -> list[error] | None:
+        try:
+            with self.lock:
+                row = self.connection.execute(
+                    "SELECT errors, used FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                data, used = row
+                now = int(time.time())
+                if now - used > self.TOUCH_INTERVAL:
+                    self.connection.execute(
+                        "UPDATE results SET used = ? WHERE key = ?", (now, key)
+                    )
+        except self.database_error as exc:
+            LOG.warning("Can't read from the Bugbear cache: %s", exc)
+            return None
+        return [
+            error(lineno, col, error_codes[code].index, vars)
+            for lineno, col, code, vars in marshal.loads(data)
+        ]
+
+    def put(self, key: bytes, errors: list[error]) -> None:
+        data = marshal.dumps([(e.lineno, e.col, e.code, e.vars) for e in errors])
+        size = len(key) + len(data)
+        try:
+            with self.lock, self.transaction():
+                inserted = self.connection.execute(
+                    "INSERT OR IGNORE INTO results VALUES (?, ?, ?)",
+                    (key, data, int(time.time())),
+                ).rowcount
+                if inserted:
+                    self.connection.execute(
+                        "UPDATE size SET total = total + ?", (size,)
+                    )
+                    (total,) = self.connection.execute(
+                        "SELECT total FROM size"
+                    ).fetchone()
+                    if total > self.max_size:
+                        self.evict(total)
+        except self.database_error as exc:
+            LOG.warning("Can't write to the Bugbear cache: %s", exc)
+
+    def evict(self, total: int) -> None:
+        """Drops the least recently used entries, down to 3/4 of the size.
+
+        Leaving room means the next writes don't have to evict again.
+        """
+        target = self.max_size * 3 // 4
+        rows = self.connection.execute(
+            "SELECT key, length(key) + length(errors) FROM results ORDER BY used"
+        )
+        keys = []
+        for key, size in rows:
+            if total <= target:
+                break
+            keys.append((key,))
+            total -= size
+        rows.close()
+        self.connection.executemany("DELETE FROM results WHERE key = ?", keys)
+        self.connection.execute("UPDATE size SET total = ?", (total,))
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+
+@lru_cache(maxsize=None)
+def open_result_cache(directory: str, max_size: int, pid: int) -> ResultCache | None:
+    """Returns the `ResultCache` of `directory` for the process `pid`."""
+    try:
+        return ResultCache(directory, max_size)
+    except Exception as exc:  # OSError or sqlite3.Error
+        LOG.warning("Can't use %s as the Bugbear cache: %s", directory, exc)
+        return None
+
+
+@lru_cache(maxsize=None)
+def _code_digest() -> bytes:
+    """Identifies the code of the checks, which can change between releases."""
+    import hashlib
+
+    try:
+        with open(__file__, "rb") as f:
+            return hashlib.blake2b(f.read(), digest_size=20).digest()
+    except OSError:
+        return __version__.encode()
+
+
 def _is_identifier(arg) -> bool:
     # Return True if arg is a valid identifier, per
     # https://docs.python.org/2/reference/lexical_analysis.html#identifiers
@@ -321,39 +738,448 @@ def _to_name_str(node: ast.expr | None) -> str | None:
     # Turn Name and Attribute nodes to strings, e.g "ValueError" or
     # "pkg.mod.error", handling any depth of attribute accesses.
     # Return None for unrecognized nodes.
-    if isinstance(node, ast.Name):
-        return node.id
-    if isinstance(node, ast.Call):
-        return _to_name_str(node.func)
-    elif isinstance(node, ast.Attribute):
-        inner = _to_name_str(node.value)
-        if inner is None:
+    attrs: list[str] = []
+    while True:
+        if isinstance(node, ast.Call):
+            node = node.func
+        elif isinstance(node, ast.Attribute):
+            attrs.append(node.attr)
+            node = node.value
+        elif isinstance(node, ast.Name):
+            attrs.append(node.id)
+            return ".".join(reversed(attrs))
+        else:
             return None
-        return f"{inner}.{node.attr}"
-    else:
-        return None
 
 
-def names_from_assignments(assign_target: ast.expr) -> Iterator[str]:
-    if isinstance(assign_target, ast.Name):
-        yield assign_target.id
-    elif isinstance(assign_target, ast.Starred):
-        yield from names_from_assignments(assign_target.value)
-    elif isinstance(assign_target, (ast.List, ast.Tuple)):
-        for child in assign_target.elts:
-            yield from names_from_assignments(child)
+def _get_names_from_tuple(node: ast.Tuple) -> Iterator[str]:
+    pending = [node]
+    while pending:
+        for dim in pending.pop().elts:
+            if isinstance(dim, ast.Name):
+                yield dim.id
+            elif isinstance(dim, ast.Tuple):
+                pending.append(dim)
+
+
+_NODE_TYPE_CODES: dict[type[ast.AST], int] = {}
+
+
+def node_type_code(node_type: type[ast.AST]) -> int:
+    """Returns a small integer identifying `node_type` in `AstIndex.type_code`."""
+    code = _NODE_TYPE_CODES.get(node_type)
+    if code is None:
+        code = _NODE_TYPE_CODES[node_type] = len(_NODE_TYPE_CODES)
+    return code
+
+
+class AstIndex:
+    """A flat index of a tree, built in a single pass.
+
+    Nodes are stored in preorder (the order `ast.NodeVisitor` visits them in),
+    so the subtree of the node at position `i` is `nodes[i : end[i]]`, and
+    walking a subtree or skipping over it is a matter of slicing.
 
+    Note that the parser shares single instances of context and operator nodes
+    (e.g. `ast.Load()`), so `position` only holds their last occurrence.
+    """
+
+    def __init__(self, root: ast.AST) -> None:
+        self.root = root
+        self.nodes: list[ast.AST] = []
+        self.parent = array("i")
+        self.end = array("i")
+        self.type_code = array("H")
+        self.position: dict[ast.AST, int] = {}
+        # the positions of the `ast.Name` nodes by name, found on first use
+        self._name_positions: dict[str, array[int]] | None = None
+
+        nodes = self.nodes
+        position = self.position
+        parent = self.parent
+        type_code = self.type_code
+        type_codes = _NODE_TYPE_CODES
+        stack: list[ast.AST] = [root]
+        # the parent positions of the nodes on `stack`
+        parents = [-1]
+        while stack:
+            node = stack.pop()
+            i = position[node] = len(nodes)
+            nodes.append(node)
+            parent.append(parents.pop())
+            code = type_codes.get(node.__class__)
+            type_code.append(node_type_code(node.__class__) if code is None else code)
+            pushed = len(stack)
+            push_children(stack, node)
+            parents.extend(itertools.repeat(i, len(stack) - pushed))
+
+        # Subtrees are contiguous, so a subtree ends where the subtree of its
+        # last descendant ends.
+        end = self.end
+        end.extend(range(1, len(nodes) + 1))
+        for i in range(len(nodes) - 1, 0, -1):
+            if end[i] > end[parent[i]]:
+                end[parent[i]] = end[i]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def parent_of(self, node: ast.AST) -> ast.AST | None:
+        parent = self.parent[self.position[node]]
+        return None if parent < 0 else self.nodes[parent]
+
+    def has_name(self, nodes: Sequence[ast.AST], name: str) -> bool:
+        """Returns whether a list of sibling trees, e.g. a body, has an `ast.Name`
+        of `name` in it."""
+        if self._name_positions is None:
+            self._name_positions = self._find_names()
+        positions = self._name_positions.get(name)
+        if not positions or not nodes:
+            return False
+        # siblings are next to each other in preorder
+        start = self.position[nodes[0]]
+        stop = self.end[self.position[nodes[-1]]]
+        i = bisect_left(positions, start)
+        return i < len(positions) and positions[i] < stop
+
+    def _find_names(self) -> dict[str, array[int]]:
+        positions: dict[str, array[int]] = {}
+        name_code = node_type_code(ast.Name)
+        nodes: list[Any] = self.nodes
+        i = -1
+        with suppress(ValueError):
+            while True:
+                i = self.type_code.index(name_code, i + 1)
+                positions.setdefault(nodes[i].id, array("i")).append(i)
+        return positions
+
+    def walk_type(
+        self, nodes: Sequence[ast.AST | None] | ast.AST | None, *node_types: type
+    ) -> Iterator[Any]:
+        """Walks every node of one of the given (exact) types in a list of trees."""
+        if nodes is None:
+            return
+        if isinstance(nodes, ast.AST):
+            nodes = [nodes]
+        codes = {node_type_code(node_type) for node_type in node_types}
+        type_code = self.type_code
+        all_nodes = self.nodes
+        for node in nodes:
+            if node is None:
+                continue
+            i = self.position[node]
+            for j in range(i, self.end[i]):
+                if type_code[j] in codes:
+                    yield all_nodes[j]
+
+
+class Scope:
+    __slots__ = ("node", "parent", "loop", "children", "uses", "bindings", "declared")
 
-def children_in_scope(node: ast.AST) -> Iterator[ast.AST]:
-    yield node
-    if not isinstance(node, FUNCTION_NODES):
-        for child in ast.iter_child_nodes(node):
-            yield from children_in_scope(child)
+    def __init__(self, node: ast.AST, parent: Scope | None, loop: Loop | None) -> None:
+        self.node = node
+        self.parent = parent
+        # the innermost loop around the node that opens the scope
+        self.loop = loop
+        self.children: list[Scope] = []
+        # every use of a name in the scope, in preorder
+        self.uses: list[NameUse] = []
+        # the uses that bind a name in the scope, by name
+        self.bindings: dict[str, list[NameUse]] = {}
+        # names declared `global` or `nonlocal`
+        self.declared: set[str] = set()
+
+    def binds(self, name: str) -> bool:
+        return name in self.bindings and name not in self.declared
+
+
+class Loop:
+    __slots__ = ("node", "parent", "function")
+
+    def __init__(
+        self, node: ast.AST, parent: Loop | None, function: ast.AST | None
+    ) -> None:
+        self.node = node
+        self.parent = parent
+        # the innermost function around the loop
+        self.function = function
 
 
-def walk_list(nodes: Sequence[ast.AST]) -> Iterator[ast.AST]:
-    for node in nodes:
-        yield from ast.walk(node)
+class NameUse:
+    """A use of a name.
+
+    `kind` is one of "load", "store", "augstore" (the target of an augmented
+    assignment), "walrus" (the target of an assignment expression), "del",
+    "param", "def" (a function or class definition), "import", "except" (the
+    name in `except ... as name`) and "match" (a capture pattern).
+    """
+
+    __slots__ = (
+        "name",
+        "node",
+        "kind",
+        "position",
+        "scope",
+        "statement",
+        "loop",
+        "function",
+        "binder",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        node: Any,  # an `ast.Name`, or the node that binds `name`
+        kind: str,
+        position: int,
+        scope: Scope,
+        statement: ast.stmt | None,
+        loop: Loop | None,
+        function: ast.AST | None,
+        binder: ast.AST | None = None,
+    ) -> None:
+        self.name = name
+        self.node = node
+        self.kind = kind
+        self.position = position
+        # the scope the name is looked up in or bound in
+        self.scope = scope
+        # the innermost statement around the use
+        self.statement = statement
+        # the innermost loop and function around the use
+        self.loop = loop
+        self.function = function
+        # for stores, the node the target belongs to, e.g. an `ast.Assign` or an
+        # `ast.comprehension`
+        self.binder = binder
+
+    @property
+    def is_binding(self) -> bool:
+        return self.kind not in ("load", "del")
+
+
+def b005_import_names(node: ast.Import | ast.ImportFrom) -> Iterator[str]:
+    """Returns what an import adds to `BugBearVisitor._b005_imports`."""
+    if isinstance(node, ast.Import):
+        return (name.asname or name.name for name in node.names)
+    return (f"{node.module}.{name.name or name.asname}" for name in node.names)
+
+
+# the fields of scope nodes that are evaluated inside the scope; the others
+# (default values, decorators, base classes, ...) are evaluated outside of it
+_SCOPE_FIELDS = frozenset(("body", "elt", "key", "value", "generators"))
+_TARGET_CONTAINERS = (ast.Tuple, ast.List, ast.Starred)
+
+
+def _binding_of(node: ast.AST) -> tuple[str, str] | None:
+    """Returns the name and kind of use of nodes other than `ast.Name` that bind
+    a name."""
+    if isinstance(node, ast.arg):
+        return node.arg, "param"
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return node.name, "def"
+    if isinstance(node, ast.alias):
+        if node.name == "*":
+            return None
+        return node.asname or node.name.partition(".")[0], "import"
+    if isinstance(node, ast.ExceptHandler):
+        return (node.name, "except") if node.name else None
+    if isinstance(node, (ast.MatchAs, ast.MatchStar)):
+        return (node.name, "match") if node.name else None
+    if isinstance(node, ast.MatchMapping):
+        return (node.rest, "match") if node.rest else None
+    return None
+
+
+class SymbolTable:
+    """The scopes, name uses and loops of a tree, built in a single pass.
+
+    Scopes follow Python's rules: the bodies of functions, lambdas, classes
+    and comprehensions are scopes of their own, while default values,
+    decorators, base classes and the first iterable of a comprehension belong
+    to the enclosing scope.  Assignment expressions bind in the nearest scope
+    that isn't a comprehension.
+
+    Uses are kept in preorder, so the uses inside a subtree can be looked up by
+    position with `uses_in()` instead of walking it.
+
+    The table can be built for a part of a tree, e.g. a loop.  Then
+    `scope_node` is the node that opens the scope the part is in, if the part
+    doesn't open one itself.
+    """
+
+    def __init__(self, index: AstIndex, scope_node: ast.AST | None = None) -> None:
+        self.index = index
+        self.scopes: dict[ast.AST, Scope] = {}
+        self.loops: list[Loop] = []
+        self.loop_positions = array("i")
+        self.uses: list[NameUse] = []
+        self.use_positions = array("i")
+        self.uses_by_name: dict[str, list[NameUse]] = {}
+        self.positions_by_name: dict[str, array[int]] = {}
+
+        root = index.root
+        self.root = self.scopes[root] = Scope(
+            root if scope_node is None or isinstance(root, SCOPE_NODES) else scope_node,
+            None,
+            None,
+        )
+        stack: list[
+            tuple[ast.AST, Scope, ast.stmt | None, Loop | None, ast.AST | None]
+        ] = [(root, self.root, None, None, None)]
+        while stack:
+            node, scope, statement, loop, function = stack.pop()
+            position = index.position[node]
+            if isinstance(node, ast.stmt):
+                statement = node
+            self.add_uses(node, position, scope, statement, loop, function)
+
+            inner_scope = scope
+            if isinstance(node, SCOPE_NODES) and node is not root:
+                inner_scope = self.scopes[node] = Scope(node, scope, loop)
+                scope.children.append(inner_scope)
+            if isinstance(node, FUNCTION_NODES):
+                function = node
+            if isinstance(node, LOOP_NODES):
+                loop = Loop(node, loop, function)
+                self.loops.append(loop)
+                self.loop_positions.append(position)
+
+            children = []
+            for field, value in ast.iter_fields(node):
+                child_scope = inner_scope if field in _SCOPE_FIELDS else scope
+                if (
+                    field == "iter"
+                    and isinstance(scope.node, COMPREHENSION_NODES)
+                    and node is scope.node.generators[0]
+                ):
+                    # the first iterable is evaluated outside of the comprehension
+                    child_scope = scope.parent or scope
+                for child in value if isinstance(value, list) else [value]:
+                    if isinstance(child, ast.AST):
+                        children.append((child, child_scope, statement, loop, function))
+            stack.extend(reversed(children))
+
+    def add_uses(
+        self,
+        node: ast.AST,
+        position: int,
+        scope: Scope,
+        statement: ast.stmt | None,
+        loop: Loop | None,
+        function: ast.AST | None,
+    ) -> None:
+        binder = None
+        if isinstance(node, ast.Name):
+            name = node.id
+            if isinstance(node.ctx, ast.Load):
+                kind = "load"
+            elif isinstance(node.ctx, ast.Del):
+                kind = "del"
+            else:
+                binder = self.binder_of(position)
+                if isinstance(binder, ast.NamedExpr):
+                    kind = "walrus"
+                    # bound in the nearest scope that isn't a comprehension
+                    while scope.parent and isinstance(scope.node, COMPREHENSION_NODES):
+                        scope = scope.parent
+                elif isinstance(binder, ast.AugAssign):
+                    kind = "augstore"
+                else:
+                    kind = "store"
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            scope.declared.update(node.names)
+            return
+        else:
+            binding = _binding_of(node)
+            if binding is None:
+                return
+            name, kind = binding
+            if kind == "param":
+                # `ast.arg` belongs to the `ast.arguments` of its function
+                arguments = self.index.parent[position]
+                function_node = self.index.nodes[self.index.parent[arguments]]
+                scope = self.scopes[function_node]
+
+        use = NameUse(
+            name, node, kind, position, scope, statement, loop, function, binder
+        )
+        self.uses.append(use)
+        self.use_positions.append(position)
+        self.uses_by_name.setdefault(name, []).append(use)
+        self.positions_by_name.setdefault(name, array("i")).append(position)
+        scope.uses.append(use)
+        if use.is_binding:
+            scope.bindings.setdefault(name, []).append(use)
+
+    def binder_of(self, position: int) -> ast.AST | None:
+        """Returns the node an assignment target at `position` belongs to."""
+        index = self.index
+        parent = index.parent[position]
+        while parent >= 0 and isinstance(index.nodes[parent], _TARGET_CONTAINERS):
+            parent = index.parent[parent]
+        return None if parent < 0 else index.nodes[parent]
+
+    def uses_in(
+        self, nodes: Sequence[ast.AST | None] | ast.AST | None, name: str | None = None
+    ) -> list[NameUse]:
+        """Returns the uses (of `name`, if given) in a list of trees, in preorder."""
+        if nodes is None:
+            return []
+        if isinstance(nodes, ast.AST):
+            nodes = [nodes]
+        if name is None:
+            uses, positions = self.uses, self.use_positions
+        elif name in self.uses_by_name:
+            uses, positions = self.uses_by_name[name], self.positions_by_name[name]
+        else:
+            return []
+
+        found: list[NameUse] = []
+        for node in nodes:
+            if node is not None:
+                i = self.index.position[node]
+                start = bisect_left(positions, i)
+                stop = bisect_left(positions, self.index.end[i], start)
+                found.extend(uses[start:stop])
+        return found
+
+    def name_uses_in(
+        self, nodes: Sequence[ast.AST | None] | ast.AST | None, name: str
+    ) -> list[NameUse]:
+        """Like `uses_in()`, but only returns the uses by `ast.Name` nodes."""
+        return [
+            use for use in self.uses_in(nodes, name) if isinstance(use.node, ast.Name)
+        ]
+
+    def loops_in(self, nodes: Sequence[ast.AST]) -> list[Loop]:
+        """Returns the loops in a list of trees, in preorder."""
+        found: list[Loop] = []
+        for node in nodes:
+            i = self.index.position[node]
+            start = bisect_left(self.loop_positions, i)
+            stop = bisect_left(self.loop_positions, self.index.end[i], start)
+            found.extend(self.loops[start:stop])
+        return found
+
+    @staticmethod
+    def resolves_to(use: NameUse, scope: Scope) -> bool:
+        """Returns whether `use` refers to a binding of its name in `scope`."""
+        if use.is_binding:
+            return use.scope is scope
+        current: Scope | None = use.scope
+        while current is not None and current is not scope:
+            if current.binds(use.name):
+                return False
+            current = current.parent
+            # class bodies aren't visible from the scopes nested in them
+            while (
+                current is not None
+                and current is not scope
+                and isinstance(current.node, ast.ClassDef)
+            ):
+                current = current.parent
+        return current is scope
 
 
 def _typesafe_issubclass(cls: type, class_or_tuple: type | tuple[type, ...]) -> bool:
@@ -366,37 +1192,19 @@ def _typesafe_issubclass(cls: type, class_or_tuple: type | tuple[type, ...]) ->
         return False
 
 
-class ExceptBaseExceptionVisitor(ast.NodeVisitor):
-    def __init__(self, except_node: ast.ExceptHandler) -> None:
-        super().__init__()
-        self.root = except_node
-        self._re_raised = False
-
-    def re_raised(self) -> bool:
-        self.visit(self.root)
-        return self._re_raised
-
-    def visit_Raise(self, node: ast.Raise) -> None:
-        """If we find a corresponding `raise` or `raise e` where e was from
-        `except BaseException as e:` then we mark re_raised as True and can
-        stop scanning."""
-        if node.exc is None or (
-            isinstance(node.exc, ast.Name) and node.exc.id == self.root.name
-        ):
-            self._re_raised = True
-            return
-        return super().generic_visit(node)
-
-    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> None:
-        if node is not self.root:
-            return  # entered a nested except - stop searching
-        return super().generic_visit(node)
-
-
 @attr.define
 class B040CaughtException:
     name: str
     has_note: bool
+    # an index of a subtree containing the handler, for the positions below
+    index: AstIndex
+    # The nodes around the one being visited that can use the exception,
+    # outermost first: `(node, start)` if a name at a position >= `start` in the
+    # subtree of `node` uses it (the arguments of a call, an assigned value or a
+    # raised exception), or `(node, None)` for an `add_note()` call.
+    frames: list[tuple[ast.AST, int | None]] = attr.Factory(list)
+    # the `add_note()` calls in `frames` whose own uses of the name don't count
+    add_note_calls: set[ast.AST] = attr.Factory(set)
 
 
 class B041UnhandledKeyType:
@@ -415,20 +1223,198 @@ class AstPositionNode(Protocol):
     col_offset: int
 
 
+if sys.version_info >= (3, 11):
+    TRYSTAR_NODES: tuple[type[ast.AST], ...] = (ast.TryStar,)
+else:
+    TRYSTAR_NODES = ()
+TRY_NODES: tuple[type[ast.AST], ...] = (ast.Try, *TRYSTAR_NODES)
+
+
+def _trystar_marker(node: ast.Try | ast.TryStar) -> str:
+    # "*" for try/except*, used for correctly printing errors
+    return "" if isinstance(node, ast.Try) else "*"
+
+
+NOQA_TYPE_IGNORE_REGEX = re.compile(r"#\s*(noqa|type:\s*ignore|pragma:)[^#\r\n]*$")
+
+CheckFunc = TypeVar("CheckFunc", bound=Callable[..., None])
+
+
+class RegisteredCheck(NamedTuple):
+    """A `check_for_*` visitor method and the node types it runs on."""
+
+    name: str
+    codes: tuple[str, ...]
+    node_types: tuple[type[ast.AST], ...]
+    func: Callable[..., None]
+    # the check can only report something if one of these is in the source
+    triggers: tuple[str, ...] = ()
+
+
+DispatchTable = Dict[type[ast.AST], tuple[Callable[..., None], ...]]
+Hooks = tuple[Optional[Callable[..., None]], Optional[Callable[..., None]]]
+# Marks the point in `BugBearVisitor.visit()`'s stack where a node is left.
+_LEAVE = object()
+
+
+def push_children(stack: list[Any], node: ast.AST) -> None:
+    """Pushes the children of `node` so that they pop in source order."""
+    for field in reversed(node._fields):
+        value = getattr(node, field, None)
+        if isinstance(value, list):
+            for item in reversed(value):
+                if isinstance(item, ast.AST):
+                    stack.append(item)
+        elif isinstance(value, ast.AST):
+            stack.append(value)
+
+
+def walk_preorder(nodes: Iterable[ast.AST]) -> Iterator[ast.AST]:
+    """Like `ast.walk`, but walks a list of trees in preorder (source order)."""
+    stack = list(nodes)
+    stack.reverse()
+    while stack:
+        node = stack.pop()
+        yield node
+        push_children(stack, node)
+
+
+def register_check(
+    *node_types: type[ast.AST], triggers: tuple[str, ...] = ()
+) -> Callable[[CheckFunc], CheckFunc]:
+    """Register a `check_for_*` method of `BugBearVisitor` to be called with every
+    node of the given types, before the node's children are visited.
+
+    The error codes a check can emit are taken from its name, e.g.
+    `check_for_b024_and_b027` emits B024 and B027.
+
+    A check that can only report something when one of the `triggers` strings
+    appears in the source, e.g. the name of the function it looks for, isn't
+    called at all for files without them.
+    """
+
+    def decorator(func: CheckFunc) -> CheckFunc:
+        func._bugbear_node_types = node_types  # type: ignore[attr-defined]
+        func._bugbear_triggers = triggers  # type: ignore[attr-defined]
+        return func
+
+    return decorator
+
+
+def collect_checks(cls: type) -> tuple[RegisteredCheck, ...]:
+    """Returns the checks registered on a visitor class."""
+    checks = []
+    for name in dir(cls):
+        func = getattr(cls, name, None)
+        node_types = getattr(func, "_bugbear_node_types", None)
+        if node_types is None:
+            continue
+        codes = tuple(code.upper() for code in re.findall(r"b\d{3}", name))
+        triggers = getattr(func, "_bugbear_triggers", ())
+        checks.append(RegisteredCheck(name, codes, node_types, func, triggers))  # type: ignore[arg-type]
+    return tuple(checks)
+
+
+def find_triggers(
+    checks: Iterable[RegisteredCheck], source: str
+) -> frozenset[str] | None:
+    """Returns the triggers of `checks` that appear in `source`.
+
+    Returns None if that can't be decided from the text: identifiers with
+    non-ASCII characters are normalized by the parser, so they may be spelled
+    differently in the source.
+    """
+    if not source.isascii():
+        return None
+    # A substring search per trigger is faster than one pass with a regular
+    # expression of all of them, and stops at the first occurrence.
+    return frozenset(
+        trigger
+        for trigger in {trigger for check in checks for trigger in check.triggers}
+        if trigger in source
+    )
+
+
+def build_dispatch_table(
+    checks: Iterable[RegisteredCheck],
+    enabled_codes: frozenset[str] | None = None,
+    triggers: frozenset[str] | None = None,
+) -> DispatchTable:
+    """Returns a mapping of node types to the checks that have to run on them.
+
+    With `enabled_codes`, checks that can only emit other codes are left out.
+    With `triggers`, the strings found in the source by `find_triggers()`, so
+    are checks whose triggers are all missing.
+    """
+    dispatch_table: dict[type[ast.AST], list[Callable[..., None]]] = {}
+    for check in checks:
+        if enabled_codes is not None and enabled_codes.isdisjoint(check.codes):
+            continue
+        if (
+            triggers is not None
+            and check.triggers
+            and triggers.isdisjoint(check.triggers)
+        ):
+            continue
+        for node_type in check.node_types:
+            dispatch_table.setdefault(node_type, []).append(check.func)
+    return {k: tuple(v) for k, v in dispatch_table.items()}
+
+
+_dispatch_table_for = lru_cache(build_dispatch_table)
+
+
+def available_codes() -> frozenset[str]:
+    """Returns the codes that can be emitted on the running Python version."""
+    return frozenset(
+        code
+        for code in error_codes
+        if sys.version_info >= CODES_MIN_PYTHON_VERSION.get(code, (0,))
+    )
+
+
 @attr.s
 class BugBearVisitor(ast.NodeVisitor):
     filename = attr.ib()
     lines = attr.ib()
     b008_b039_extend_immutable_calls: set[str] = attr.ib(factory=set)
     b902_classmethod_decorators: set[str] = attr.ib(factory=set)
-    node_window: list[ast.AST] = attr.ib(factory=list)
+    # ring buffer of the last NODE_WINDOW_SIZE visited nodes, see `recent_node()`
+    node_window: list[ast.AST | None] = attr.ib(
+        factory=lambda: [None] * BugBearVisitor.NODE_WINDOW_SIZE
+    )
     errors: list[error] = attr.ib(factory=list)
     contexts: list[Context] = attr.ib(factory=list)
     b040_caught_exception: B040CaughtException | None = attr.ib(default=None)
+    # checks that can only emit codes outside of this set are never called
+    enabled_codes: frozenset[str] = attr.ib(factory=available_codes)
+    dispatch: DispatchTable = attr.ib(init=False, repr=False)
 
     NODE_WINDOW_SIZE = 4
-    _b023_seen: set[ast.Name] = attr.ib(factory=set, init=False)
+    # Filled in by `collect_checks()`, see `register_check`.
+    registered_checks: ClassVar[tuple[RegisteredCheck, ...]] = ()
+    dispatch_table: ClassVar[DispatchTable] = {}
+    # Filled in by `find_hooks()`.
+    hooks: ClassVar[dict[type[ast.AST], Hooks]] = {}
+    # the B023 late bindings by loop, and the loops that were looked into
+    _b023_late_bindings: dict[ast.AST, list[ast.Name]] = attr.ib(
+        factory=dict, init=False
+    )
+    _b023_loops: set[ast.AST] = attr.ib(factory=set, init=False)
+    _function_summary: FunctionSummary | None = attr.ib(default=None, init=False)
+    _try_summary: TrySummary | None = attr.ib(default=None, init=False)
+    _root: ast.AST | None = attr.ib(default=None, init=False)
+    _node_window_pos: int = attr.ib(default=0, init=False)
+    # Context frames are reused between nodes at the same context depth.
+    _context_pool: list[Context] = attr.ib(factory=list, init=False)
+    _index: AstIndex | None = attr.ib(default=None, init=False)
+    _symbols: SymbolTable | None = attr.ib(default=None, init=False)
+    # state saved by `enter_*` hooks and restored by the matching `leave_*` hook
+    _saved_state: list[Any] = attr.ib(factory=list, init=False)
     _b005_imports: set[str] = attr.ib(factory=set, init=False)
+    # the exception caught by the innermost `except` handler checked by B040,
+    # even after `b040_caught_exception` is cleared
+    _b040_handler: B040CaughtException | None = attr.ib(default=None, init=False)
 
     # set to "*" when inside a try/except*, for correctly printing errors
     in_trystar: str = attr.ib(default="")
@@ -440,287 +1426,364 @@ class BugBearVisitor(ast.NodeVisitor):
             print(name)
             return self.__getattribute__(name)
 
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.registered_checks = collect_checks(cls)
+        cls.dispatch_table = build_dispatch_table(cls.registered_checks)
+        cls.hooks = {}
+
+    def __attrs_post_init__(self) -> None:
+        # The lines can be left out when the tree is checked on its own.
+        triggers = (
+            find_triggers(self.registered_checks, source_text(self.lines))
+            if self.lines
+            else None
+        )
+        self.dispatch = _dispatch_table_for(
+            self.registered_checks, self.enabled_codes, triggers
+        )
+
     def add_error(self, code: str, node: AstPositionNode, *vars: object) -> None:
         self.errors.append(error_codes[code](node.lineno, node.col_offset, vars=vars))
 
+    def index_of(self, node: ast.AST) -> AstIndex:
+        """Returns a flat index of a subtree that contains `node`.
+
+        The last index built is reused if it contains `node`, so the checks of
+        nested nodes don't index the same nodes over and over.
+        """
+        index = self._index
+        if index is None or node not in index.position:
+            index = self._index = AstIndex(node)
+        return index
+
+    def symbols_of(self, node: ast.AST) -> SymbolTable:
+        """Returns the symbol table of a subtree that contains `node`, which must
+        be in the context being visited.
+
+        Like with `index_of()`, the last table built is reused if it contains
+        `node`.
+        """
+        symbols = self._symbols
+        if symbols is None or node not in symbols.index.position:
+            index = AstIndex(node)
+            # an index around `node`, e.g. of an outer loop, covers more nodes
+            if self._index is None or node not in self._index.position:
+                self._index = index
+            symbols = self._symbols = SymbolTable(index, self.contexts[-1].node)
+        return symbols
+
+    def source_of(self, node: ast.expr) -> str:
+        """Returns the code of an expression for a message.
+
+        `ast.unparse()` recurses, so expressions nested too deeply for it are
+        taken from the lines instead.
+        """
+        try:
+            return ast.unparse(node)
+        except RecursionError:
+            source = source_text(self.lines) if self.lines else ""
+            return ast.get_source_segment(source, node) or "..."
+
     @property
     def node_stack(self) -> list[ast.AST]:
         if len(self.contexts) == 0:
             return []
 
-        context, stack = self.contexts[-1]
-        return stack
+        return self.contexts[-1].stack
 
-    def in_class_init(self) -> bool:
-        return (
-            len(self.contexts) >= 2
-            and isinstance(self.contexts[-2].node, ast.ClassDef)
-            and isinstance(self.contexts[-1].node, ast.FunctionDef)
-            and self.contexts[-1].node.name == "__init__"
-        )
+    def class_summary(self, context: Context) -> ClassSummary:
+        """Returns the summary of the class that opened `context`, built once and
+        shared by the checks of the class and its methods."""
+        if context.class_summary is None:
+            assert isinstance(context.node, ast.ClassDef)
+            context.class_summary = summarize_class(context.node)
+        return context.class_summary
 
-    def visit_Return(self, node: ast.Return) -> None:
-        if self.in_class_init():
-            if node.value is not None:
-                self.add_error("B037", node)
-        self.generic_visit(node)
+    def enclosing_class(self) -> ClassSummary | None:
+        """Returns the summary of the class whose body the current node is in."""
+        if len(self.contexts) < 2 or not isinstance(
+            self.contexts[-2].node, ast.ClassDef
+        ):
+            return None
+        return self.class_summary(self.contexts[-2])
 
-    def visit_Yield(self, node: ast.Yield) -> None:
-        if self.in_class_init():
-            self.add_error("B037", node)
-        self.generic_visit(node)
+    def function_summary(
+        self, node: ast.FunctionDef | ast.AsyncFunctionDef
+    ) -> FunctionSummary:
+        """Returns the summary of the function being visited, built once and
+        shared by the checks of the function."""
+        summary = self._function_summary
+        if summary is None or summary.node is not node:
+            in_class = len(self.contexts) >= 2 and isinstance(
+                self.contexts[-2].node, ast.ClassDef
+            )
+            summary = self._function_summary = summarize_function(node, in_class)
+        return summary
 
-    def visit_YieldFrom(self, node: ast.YieldFrom) -> None:
-        if self.in_class_init():
-            self.add_error("B037", node)
-        self.generic_visit(node)
+    def recent_node(self, age: int) -> ast.AST | None:
+        """Returns the node visited `age - 1` nodes before the current one."""
+        assert 0 < age <= self.NODE_WINDOW_SIZE
+        return self.node_window[(self._node_window_pos - age) % self.NODE_WINDOW_SIZE]
 
     def visit(self, node: ast.AST) -> None:
-        is_contextful = isinstance(node, CONTEXTFUL_NODES)
-
-        if is_contextful:
-            context = Context(node, [])
-            self.contexts.append(context)
+        """Visits `node` and all of its descendants.
+
+        The traversal uses an explicit stack instead of recursion, so it handles
+        trees of any depth.  Before a node's children are visited, the checks
+        registered for its type and its `enter_*` hook run; its `leave_*` hook
+        runs after them.
+
+        The loop runs for every node, so it keeps the work per node down:
+        context frames are reused per context depth, and hooks are looked up
+        once per node type.  It doesn't keep anything per node once the node
+        is left, but it does create short-lived objects, such as the iterators
+        of `push_children()` and of the checks.
+        """
+        self._root = root = node
+        contexts = self.contexts
+        context_pool = self._context_pool
+        dispatch = self.dispatch
+        hooks = self.hooks
+        node_window = self.node_window
+        stack: list[Any] = [root]
+        try:
+            while stack:
+                node = stack.pop()
+                if node is _LEAVE:
+                    self.leave(stack.pop())
+                    continue
 
-        self.node_stack.append(node)
-        self.node_window.append(node)
-        self.node_window = self.node_window[-self.NODE_WINDOW_SIZE :]
-        super().visit(node)
-        self.node_stack.pop()
+                node_type = node.__class__
+                # The root always gets a context, even if it's not contextful.
+                if node_type in CONTEXTFUL_NODE_TYPES or node is root:
+                    depth = len(contexts)
+                    if depth < len(context_pool):
+                        context = context_pool[depth]
+                        context.node = node
+                        context.class_summary = None
+                    else:
+                        context = Context(node, [])
+                        context_pool.append(context)
+                    contexts.append(context)
+                else:
+                    context = contexts[-1]
+                context.stack.append(node)
+                node_window[self._node_window_pos] = node
+                self._node_window_pos = (
+                    self._node_window_pos + 1
+                ) % self.NODE_WINDOW_SIZE
+
+                for check in dispatch.get(node_type, ()):
+                    check(self, node)
+                node_hooks = hooks.get(node_type)
+                if node_hooks is None:
+                    node_hooks = self.find_hooks(node_type)
+                if node_hooks[0] is not None:
+                    node_hooks[0](self, node)
+
+                stack.append(node)
+                stack.append(_LEAVE)
+                push_children(stack, node)
+        finally:
+            self._root = self._index = self._symbols = None
+            self._b023_late_bindings = {}
+            self._b023_loops = set()
+            self._function_summary = None
+            self._try_summary = None
+
+    def leave(self, node: ast.AST) -> None:
+        """Undoes what `visit()` did when entering `node`."""
+        node_type = node.__class__
+        leave = self.hooks[node_type][1]
+        if leave is not None:
+            leave(self, node)
+        contexts = self.contexts
+        contexts[-1].stack.pop()
+        if node_type in CONTEXTFUL_NODE_TYPES or node is self._root:
+            contexts.pop()
 
-        if is_contextful:
-            self.contexts.pop()
+    @classmethod
+    def find_hooks(cls, node_type: type[ast.AST]) -> Hooks:
+        """Returns the `enter_*` and `leave_*` hooks for a node type."""
+        hooks = cls.hooks[node_type] = (
+            getattr(cls, "enter_" + node_type.__name__, None),
+            getattr(cls, "leave_" + node_type.__name__, None),
+        )
+        return hooks
 
-        self.check_for_b018(node)
+    # The `enter_*` and `leave_*` hooks below only maintain state that has to
+    # wrap the traversal of a node's children.  Checks are registered separately
+    # with `@register_check` and dispatched from `visit()`.
 
-    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> None:
+    def enter_ExceptHandler(self, node: ast.ExceptHandler) -> None:
         if node.type is None:
-            self.add_error("B001", node)
-            self.generic_visit(node)
             return
 
-        old_b040_caught_exception = self.b040_caught_exception
-        if node.name is None:
+        self._saved_state.append((self.b040_caught_exception, self._b040_handler))
+        if node.name is None or "B040" not in self.enabled_codes:
             self.b040_caught_exception = None
         else:
-            self.b040_caught_exception = B040CaughtException(node.name, False)  # type: ignore[call-arg]
-
-        names = self.check_for_b013_b014_b029_b030(node)
-
-        if (
-            "BaseException" in names
-            and not ExceptBaseExceptionVisitor(node).re_raised()
-        ):
-            self.add_error("B036", node)
+            self.b040_caught_exception = B040CaughtException(
+                node.name, False, self.index_of(node)
+            )
+        self._b040_handler = self.b040_caught_exception
 
-        self.generic_visit(node)
+    def leave_ExceptHandler(self, node: ast.ExceptHandler) -> None:
+        if node.type is None:
+            return
 
         if (
             self.b040_caught_exception is not None
             and self.b040_caught_exception.has_note
         ):
             self.add_error("B040", node)
-        self.b040_caught_exception = old_b040_caught_exception
+        self.b040_caught_exception, self._b040_handler = self._saved_state.pop()
 
-    def visit_UAdd(self, node: ast.UAdd) -> None:
-        trailing_nodes = list(map(type, self.node_window[-4:]))
-        if trailing_nodes == [ast.UnaryOp, ast.UAdd, ast.UnaryOp, ast.UAdd]:
-            originator = cast(ast.UnaryOp, self.node_window[-4])
-            self.add_error("B002", originator)
-        self.generic_visit(node)
-
-    def visit_Call(self, node: ast.Call) -> None:
-        is_b040_add_note = False
-        if isinstance(node.func, ast.Attribute):
-            self.check_for_b005(node)
-            is_b040_add_note = self.check_for_b040_add_note(node.func)
-        elif isinstance(node.func, ast.Name):
-            # Check for getattr/setattr/delattr with constant attribute names
-            with suppress(AttributeError, IndexError):
-                if (
-                    node.func.id in ("getattr", "hasattr")
-                    and isinstance(node.args[1], ast.Constant)
-                    and node.args[1].value == "__call__"
-                ):
-                    self.add_error("B004", node)
-                if (
-                    node.func.id == "getattr"
-                    and len(node.args) == 2
-                    and _is_identifier(node.args[1])
-                    and isinstance(node.args[1], ast.Constant)
-                    and isinstance(node.args[1].value, str)
-                    and not iskeyword(node.args[1].value)
-                ):
-                    self.add_error("B009", node)
-                elif (
-                    not any(isinstance(n, ast.Lambda) for n in self.node_stack)
-                    and node.func.id == "setattr"
-                    and len(node.args) == 3
-                    and _is_identifier(node.args[1])
-                    and isinstance(node.args[1], ast.Constant)
-                    and isinstance(node.args[1].value, str)
-                    and not iskeyword(node.args[1].value)
-                ):
-                    self.add_error("B010", node)
-                elif (
-                    node.func.id == "delattr"
-                    and len(node.args) == 2
-                    and _is_identifier(node.args[1])
-                    and isinstance(node.args[1], ast.Constant)
-                    and isinstance(node.args[1].value, str)
-                    and not iskeyword(node.args[1].value)
-                ):
-                    self.add_error("B043", node)
-
-        self.check_for_b026(node)
-        self.check_for_b028(node)
-        self.check_for_b034(node)
-        self.check_for_b039(node)
-        self.check_for_b905(node)
-        self.check_for_b910(node)
-        self.check_for_b911(node)
-        self.check_for_b912(node)
-
-        # no need for copying, if used in nested calls it will be set to None
-        current_b040_caught_exception = self.b040_caught_exception
-        if not is_b040_add_note:
-            self.check_for_b040_usage(node.args)
-            self.check_for_b040_usage(node.keywords)
-
-        self.generic_visit(node)
-
-        if is_b040_add_note:
-            # Avoid nested calls within the parameter list using the variable itself.
-            # e.g. `e.add_note(str(e))`
-            self.b040_caught_exception = current_b040_caught_exception
-
-    def visit_Module(self, node: ast.Module) -> None:
-        self.generic_visit(node)
-
-    def visit_Assign(self, node: ast.Assign) -> None:
-        self.check_for_b040_usage(node.value)
-        if len(node.targets) == 1:
-            t = node.targets[0]
-
-            if isinstance(t, ast.Attribute) and isinstance(t.value, ast.Name):
-                if (t.value.id, t.attr) == ("os", "environ"):
-                    self.add_error("B003", node)
-        self.generic_visit(node)
-
-    def visit_For(self, node: ast.For) -> None:
-        self.check_for_b007(node)
-        self.check_for_b020(node)
-        self.check_for_b023(node)
-        self.check_for_b031(node)
-        self.check_for_b909(node)
-        self.generic_visit(node)
-
-    def visit_AsyncFor(self, node: ast.AsyncFor) -> None:
-        self.check_for_b023(node)
-        self.generic_visit(node)
-
-    def visit_While(self, node: ast.While) -> None:
-        self.check_for_b023(node)
-        self.generic_visit(node)
+    def enter_Call(self, node: ast.Call) -> None:
+        if self.b040_caught_exception is None:
+            return
 
-    def visit_ListComp(self, node: ast.ListComp) -> None:
-        self.check_for_b023(node)
-        self.generic_visit(node)
+        if isinstance(node.func, ast.Attribute) and self.check_for_b040_add_note(
+            node.func
+        ):
+            # Uses of the name inside the call itself don't count,
+            # e.g. `e.add_note(str(e))`.
+            self.b040_caught_exception.frames.append((node, None))
+            self.b040_caught_exception.add_note_calls.add(node)
+        else:
+            index = self.b040_caught_exception.index
+            self.enter_b040_usage(node, index.end[index.position[node.func]])
 
-    def visit_SetComp(self, node: ast.SetComp) -> None:
-        self.check_for_b023(node)
-        self.generic_visit(node)
+    def leave_Call(self, node: ast.Call) -> None:
+        self.leave_b040_usage(node)
 
-    def visit_DictComp(self, node: ast.DictComp) -> None:
-        self.check_for_b023(node)
-        self.check_for_b035(node)
-        self.generic_visit(node)
+    def enter_Assign(self, node: ast.Assign) -> None:
+        if self.b040_caught_exception is not None:
+            self.enter_b040_usage(
+                node, self.b040_caught_exception.index.position[node.value]
+            )
 
-    def visit_GeneratorExp(self, node: ast.GeneratorExp) -> None:
-        self.check_for_b023(node)
-        self.generic_visit(node)
+    def leave_Assign(self, node: ast.Assign) -> None:
+        self.leave_b040_usage(node)
 
-    def visit_Assert(self, node: ast.Assert) -> None:
-        self.check_for_b011(node)
-        self.generic_visit(node)
+    def enter_Name(self, node: ast.Name) -> None:
+        if (
+            self.b040_caught_exception is not None
+            and node.id == self.b040_caught_exception.name
+        ):
+            self.check_for_b040_usage(node)
 
-    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> None:
-        self.check_for_b902(node)
-        self.check_for_b006_and_b008(node)
-        self.generic_visit(node)
+    def enter_TryStar(self, node: ast.TryStar) -> None:
+        self._saved_state.append(self.in_trystar)
+        self.in_trystar = "*"
 
-    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
-        self.check_for_b901(node)
-        self.check_for_b902(node)
-        self.check_for_b006_and_b008(node)
-        self.check_for_b019(node)
-        self.check_for_b021(node)
-        self.check_for_b906(node)
-        self.generic_visit(node)
+    def leave_TryStar(self, node: ast.TryStar) -> None:
+        self.in_trystar = self._saved_state.pop()
 
-    def visit_ClassDef(self, node: ast.ClassDef) -> None:
-        self.check_for_b903(node)
-        self.check_for_b021(node)
-        self.check_for_b024_and_b027(node)
-        self.check_for_b042(node)
-        self.generic_visit(node)
+    def enter_Raise(self, node: ast.Raise) -> None:
+        if node.exc is None:
+            self.b040_caught_exception = None
+        elif self.b040_caught_exception is not None:
+            self.enter_b040_usage(
+                node, self.b040_caught_exception.index.position[node.exc]
+            )
 
-    def visit_Try(self, node: ast.Try | ast.TryStar) -> None:
-        self.check_for_b012(node)
-        self.check_for_b025(node)
-        self.generic_visit(node)
+    def leave_Raise(self, node: ast.Raise) -> None:
+        self.leave_b040_usage(node)
 
-    def visit_TryStar(self, node: ast.TryStar) -> None:
-        outer_trystar = self.in_trystar
-        self.in_trystar = "*"
-        self.visit_Try(node)
-        self.in_trystar = outer_trystar
+    def enter_AnnAssign(self, node: ast.AnnAssign) -> None:
+        if self.b040_caught_exception is not None and node.value is not None:
+            self.enter_b040_usage(
+                node, self.b040_caught_exception.index.position[node.value]
+            )
 
-    def visit_Compare(self, node: ast.Compare) -> None:
-        self.check_for_b015(node)
-        self.generic_visit(node)
+    def leave_AnnAssign(self, node: ast.AnnAssign) -> None:
+        self.leave_b040_usage(node)
 
-    def visit_Raise(self, node: ast.Raise) -> None:
-        if node.exc is None:
-            self.b040_caught_exception = None
-        else:
-            self.check_for_b040_usage(node.exc)
-            self.check_for_b040_usage(node.cause)
-        self.check_for_b016(node)
-        self.check_for_b904(node)
-        self.generic_visit(node)
+    def enter_Import(self, node: ast.Import) -> None:
+        self._b005_imports.update(b005_import_names(node))
 
-    def visit_With(self, node: ast.With) -> None:
-        self.check_for_b017(node)
-        self.check_for_b022(node)
-        self.check_for_b908(node)
-        self.generic_visit(node)
+    def enter_ImportFrom(self, node: ast.ImportFrom) -> None:
+        self._b005_imports.update(b005_import_names(node))
 
-    def visit_JoinedStr(self, node: ast.JoinedStr) -> None:
-        self.check_for_b907(node)
-        self.generic_visit(node)
+    @register_check(ast.ExceptHandler)
+    def check_for_b001(self, node: ast.ExceptHandler) -> None:
+        if node.type is None:
+            self.add_error("B001", node)
 
-    def visit_AnnAssign(self, node: ast.AnnAssign) -> None:
-        self.check_for_b032(node)
-        self.check_for_b040_usage(node.value)
-        self.generic_visit(node)
+    @register_check(ast.UAdd)
+    def check_for_b002(self, node: ast.UAdd) -> None:
+        originator = self.recent_node(4)
+        if (
+            isinstance(originator, ast.UnaryOp)
+            and isinstance(self.recent_node(3), ast.UAdd)
+            and isinstance(self.recent_node(2), ast.UnaryOp)
+        ):
+            self.add_error("B002", originator)
 
-    def visit_Import(self, node: ast.Import) -> None:
-        self.check_for_b005(node)
-        self.generic_visit(node)
+    @register_check(ast.Assign)
+    def check_for_b003(self, node: ast.Assign) -> None:
+        if len(node.targets) == 1:
+            t = node.targets[0]
 
-    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
-        self.check_for_b005(node)
-        self.generic_visit(node)
+            if isinstance(t, ast.Attribute) and isinstance(t.value, ast.Name):
+                if (t.value.id, t.attr) == ("os", "environ"):
+                    self.add_error("B003", node)
 
-    def visit_Set(self, node: ast.Set) -> None:
-        self.check_for_b033(node)
-        self.generic_visit(node)
+    @register_check(ast.Call)
+    def check_for_b004_b009_b010_b043(self, node: ast.Call) -> None:
+        if not isinstance(node.func, ast.Name):
+            return
+        # Check for getattr/setattr/delattr with constant attribute names
+        with suppress(AttributeError, IndexError):
+            if (
+                node.func.id in ("getattr", "hasattr")
+                and isinstance(node.args[1], ast.Constant)
+                and node.args[1].value == "__call__"
+            ):
+                self.add_error("B004", node)
+            if (
+                node.func.id == "getattr"
+                and len(node.args) == 2
+                and _is_identifier(node.args[1])
+                and isinstance(node.args[1], ast.Constant)
+                and isinstance(node.args[1].value, str)
+                and not iskeyword(node.args[1].value)
+            ):
+                self.add_error("B009", node)
+            elif (
+                # a lambda opens its own context, so it can only be the
+                # context's node
+                not isinstance(self.contexts[-1].node, ast.Lambda)
+                and node.func.id == "setattr"
+                and len(node.args) == 3
+                and _is_identifier(node.args[1])
+                and isinstance(node.args[1], ast.Constant)
+                and isinstance(node.args[1].value, str)
+                and not iskeyword(node.args[1].value)
+            ):
+                self.add_error("B010", node)
+            elif (
+                node.func.id == "delattr"
+                and len(node.args) == 2
+                and _is_identifier(node.args[1])
+                and isinstance(node.args[1], ast.Constant)
+                and isinstance(node.args[1].value, str)
+                and not iskeyword(node.args[1].value)
+            ):
+                self.add_error("B043", node)
 
-    def visit_Dict(self, node: ast.Dict) -> None:
-        self.check_for_b041(node)
-        self.generic_visit(node)
+    @register_check(ast.FunctionDef)
+    def check_for_b037(self, node: ast.FunctionDef) -> None:
+        summary = self.function_summary(node)
+        if not summary.is_class_init:
+            return
+        for exit in summary.exits:
+            if not isinstance(exit, ast.Return) or exit.value is not None:
+                self.add_error("B037", exit)
 
+    @register_check(ast.Dict)
     def check_for_b041(self, node: ast.Dict) -> None:
         # Complain if there are duplicate key-value pairs in a dictionary literal.
         def convert_to_value(item: ast.expr | None) -> Any:
@@ -747,39 +1810,37 @@ class BugBearVisitor(ast.NodeVisitor):
                         self.add_error("B041", key_node)
                 seen.add(value)
 
-    def check_for_b005(self, node: ast.Import | ast.ImportFrom | ast.Call) -> None:
-        if isinstance(node, ast.Import):
-            for name in node.names:
-                self._b005_imports.add(name.asname or name.name)
-        elif isinstance(node, ast.ImportFrom):
-            for name in node.names:
-                self._b005_imports.add(f"{node.module}.{name.name or name.asname}")
-        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
-            if node.func.attr not in B005_METHODS:
-                return  # method name doesn't match
+    @register_check(ast.Call)
+    def check_for_b005(self, node: ast.Call) -> None:
+        if not isinstance(node.func, ast.Attribute):
+            return
+
+        if node.func.attr not in B005_METHODS:
+            return  # method name doesn't match
 
-            if (
-                isinstance(node.func.value, ast.Name)
-                and node.func.value.id in self._b005_imports
-            ):
-                return  # method is being run on an imported module
+        if (
+            isinstance(node.func.value, ast.Name)
+            and node.func.value.id in self._b005_imports
+        ):
+            return  # method is being run on an imported module
 
-            if (
-                len(node.args) != 1
-                or not isinstance(node.args[0], ast.Constant)
-                or not isinstance(node.args[0].value, str)
-            ):
-                return  # used arguments don't match the builtin strip
+        if (
+            len(node.args) != 1
+            or not isinstance(node.args[0], ast.Constant)
+            or not isinstance(node.args[0].value, str)
+        ):
+            return  # used arguments don't match the builtin strip
 
-            value = node.args[0].value
-            if len(value) == 1:
-                return  # stripping just one character
+        value = node.args[0].value
+        if len(value) == 1:
+            return  # stripping just one character
 
-            if len(value) == len(set(value)):
-                return  # no characters appear more than once
+        if len(value) == len(set(value)):
+            return  # no characters appear more than once
 
-            self.add_error("B005", node)
+        self.add_error("B005", node)
 
+    @register_check(ast.FunctionDef, ast.AsyncFunctionDef)
     def check_for_b006_and_b008(
         self, node: ast.FunctionDef | ast.AsyncFunctionDef
     ) -> None:
@@ -791,6 +1852,7 @@ class BugBearVisitor(ast.NodeVisitor):
         visitor.visit(node.args.defaults + node.args.kw_defaults)
         self.errors.extend(visitor.errors)
 
+    @register_check(ast.Call, triggers=("ContextVar",))
     def check_for_b039(self, node: ast.Call) -> None:
         if not (
             (isinstance(node.func, ast.Name) and node.func.id == "ContextVar")
@@ -817,87 +1879,82 @@ class BugBearVisitor(ast.NodeVisitor):
         visitor.visit(kw.value)
         self.errors.extend(visitor.errors)
 
-    def check_for_b007(self, node: ast.For) -> None:
-        targets = NameFinder()
-        targets.visit(node.target)
-        ctrl_names = set(filter(lambda s: not s.startswith("_"), targets.names))
-        body = NameFinder()
-        for expr in node.body:
-            body.visit(expr)
-        used_names = set(body.names)
-        for name in sorted(ctrl_names - used_names):
-            n = targets.names[name][0]
-            self.add_error("B007", n, name)
+    @register_check(ast.For)
+    def check_for_b007_b020_b909(self, node: ast.For) -> None:
+        summary = summarize_loop(node, self.index_of, self.symbols_of)
+        for name in summary.unused_targets:
+            self.add_error("B007", summary.targets[name], name)
+        for name in summary.iterable_targets:
+            self.add_error("B020", summary.targets[name], name)
+        for mutation in summary.mutations:
+            self.add_error("B909", mutation)
+
+    @register_check(ast.For, triggers=("groupby",))
+    def check_for_b031(self, node: ast.For) -> None:
+        for group in b031_group_reuses(node, self.symbols_of):
+            self.add_error("B031", group, group.id)
 
+    @register_check(ast.Assert)
     def check_for_b011(self, node: ast.Assert) -> None:
         if isinstance(node.test, ast.Constant) and node.test.value is False:
             self.add_error("B011", node)
 
-    def check_for_b012(self, node: ast.Try | ast.TryStar) -> None:
-        def _loop(node: ast.AST, bad_node_types: tuple[type[ast.AST], ...]) -> None:
-            if isinstance(node, (ast.AsyncFunctionDef, ast.FunctionDef)):
-                return
-
-            if isinstance(node, (ast.While, ast.For)):
-                bad_node_types = (ast.Return,)
-
-            elif isinstance(node, bad_node_types):
-                # All Return, Continue, Break nodes have lineno and col_offset
-                self.add_error("B012", cast(AstPositionNode, node), self.in_trystar)
-
-            for child in ast.iter_child_nodes(node):
-                _loop(child, bad_node_types)
-
-        for child in node.finalbody:
-            _loop(child, (ast.Return, ast.Continue, ast.Break))
+    def try_summary(self, node: ast.Try | ast.TryStar) -> TrySummary:
+        """Returns the summary of the `try` statement being visited, built once
+        and shared by the checks of the statement."""
+        summary = self._try_summary
+        if summary is None or summary.node is not node:
+            summary = self._try_summary = summarize_try(node, self.in_trystar)
+        return summary
 
-    def check_for_b013_b014_b029_b030(self, node: ast.ExceptHandler) -> list[str]:
-        handlers: Iterable[ast.expr | None] = _flatten_excepthandler(node.type)
-        names: list[str] = []
-        bad_handlers: list[object] = []
-        ignored_handlers: list[ast.Name | ast.Attribute | ast.Call | ast.Starred] = []
-
-        for handler in handlers:
-            if isinstance(handler, (ast.Name, ast.Attribute)):
-                name = _to_name_str(handler)
-                if name is None:
-                    ignored_handlers.append(handler)
-                else:
-                    names.append(name)
-            elif isinstance(handler, (ast.Call, ast.Starred)):
-                ignored_handlers.append(handler)
+    @register_check(*TRY_NODES)
+    def check_for_b012(self, node: ast.Try | ast.TryStar) -> None:
+        in_trystar = _trystar_marker(node)
+        for escape in self.try_summary(node).finally_escapes:
+            self.add_error("B012", escape, in_trystar)
+
+    @register_check(*TRY_NODES)
+    def check_for_b013_b014_b029_b030(self, node: ast.Try | ast.TryStar) -> None:
+        summary = self.try_summary(node)
+        for handler in summary.handlers:
+            if handler.node.type is None:
+                continue  # bare except, see B001
+
+            names = handler.names
+            if handler.has_bad_types:
+                self.add_error("B030", handler.node)
+            if (
+                len(names) == 0
+                and not handler.has_bad_types
+                and not handler.has_unchecked_types
+            ):
+                self.add_error("B029", handler.node, summary.in_trystar)
+            elif (
+                len(names) == 1
+                and not handler.has_bad_types
+                and not handler.has_unchecked_types
+                and isinstance(handler.node.type, ast.Tuple)
+            ):
+                self.add_error("B013", handler.node, *names, summary.in_trystar)
             else:
-                bad_handlers.append(handler)
-        if bad_handlers:
-            self.add_error("B030", node)
-        if len(names) == 0 and not bad_handlers and not ignored_handlers:
-            self.add_error(
-                "B029",
-                node,
-                self.in_trystar,
-            )
-        elif (
-            len(names) == 1
-            and not bad_handlers
-            and not ignored_handlers
-            and isinstance(node.type, ast.Tuple)
-        ):
-            self.add_error(
-                "B013",
-                node,
-                *names,
-                self.in_trystar,
-            )
-        else:
-            maybe_error = _check_redundant_excepthandlers(names, node, self.in_trystar)
-            if maybe_error is not None:
-                self.errors.append(maybe_error)
-        return names
+                maybe_error = _check_redundant_excepthandlers(
+                    names, handler.node, summary.in_trystar
+                )
+                if maybe_error is not None:
+                    self.errors.append(maybe_error)
+
+    @register_check(*TRY_NODES)
+    def check_for_b036(self, node: ast.Try | ast.TryStar) -> None:
+        for handler in self.try_summary(node).handlers:
+            if "BaseException" in handler.names and not handler.reraises:
+                self.add_error("B036", handler.node)
 
+    @register_check(ast.Compare)
     def check_for_b015(self, node: ast.Compare) -> None:
         if isinstance(self.node_stack[-2], ast.Expr):
             self.add_error("B015", node)
 
+    @register_check(ast.Raise)
     def check_for_b016(self, node: ast.Raise) -> None:
         if isinstance(node.exc, ast.JoinedStr) or (
             isinstance(node.exc, ast.Constant)
@@ -908,6 +1965,7 @@ class BugBearVisitor(ast.NodeVisitor):
         ):
             self.add_error("B016", node)
 
+    @register_check(ast.With, triggers=("raises", "assertRaises"))
     def check_for_b017(self, node: ast.With) -> None:
         """Checks for use of the evil syntax 'with assertRaises(Exception):'
         or 'with pytest.raises(Exception)'.
@@ -952,20 +2010,17 @@ class BugBearVisitor(ast.NodeVisitor):
         ):
             self.add_error("B017", node)
 
+    @register_check(ast.FunctionDef, triggers=("cache",))
     def check_for_b019(self, node: ast.FunctionDef) -> None:
-        if (
-            len(node.decorator_list) == 0
-            or len(self.contexts) < 2
-            or not isinstance(self.contexts[-2].node, ast.ClassDef)
-        ):
+        if len(node.decorator_list) == 0:
+            return
+        summary = self.function_summary(node)
+        if not summary.in_class:
             return
 
         # Preserve decorator order so we can get the lineno from the decorator node
         # rather than the function node (this location definition changes in Python 3.8)
-        resolved_decorators = (
-            ".".join(compose_call_path(decorator)) for decorator in node.decorator_list
-        )
-        for idx, decorator in enumerate(resolved_decorators):
+        for idx, decorator in enumerate(summary.decorator_names):
             if decorator in {"classmethod", "staticmethod"}:
                 return
 
@@ -973,21 +2028,8 @@ class BugBearVisitor(ast.NodeVisitor):
                 self.add_error("B019", node.decorator_list[idx])
                 return
 
-    def check_for_b020(self, node: ast.For) -> None:
-        targets = NameFinder()
-        targets.visit(node.target)
-        ctrl_names = set(targets.names)
-
-        iterset = B020NameFinder()
-        iterset.visit(node.iter)
-        iterset_names = set(iterset.names)
-
-        for name in sorted(ctrl_names):
-            if name in iterset_names:
-                n = targets.names[name][0]
-                self.add_error("B020", n, name)
-
-    def check_for_b023(  # noqa: C901
+    @register_check(*LOOP_NODES)
+    def check_for_b023(
         self,
         loop_node: (
             ast.For
@@ -1007,169 +2049,55 @@ class BugBearVisitor(ast.NodeVisitor):
 
         For each use of a variable inside a function defined inside a loop, we
         emit a warning if that variable is reassigned on each loop iteration
-        (outside the function).  This includes but is not limited to explicit
-        loop variables like the `x` in `for x in range(3):`.
-        """
-        # Because most loops don't contain functions, it's most efficient to
-        # implement this "backwards": first we find all the candidate variable
-        # uses, and then if there are any we check for assignment of those names
-        # inside the loop body.
-        safe_functions = []
-        suspicious_variables = []
-        for node in ast.walk(loop_node):
-            # check if function is immediately consumed to avoid false alarm
-            if isinstance(node, ast.Call):
-                # check for filter&reduce
-                if (
-                    isinstance(node.func, ast.Name)
-                    and node.func.id in ("filter", "reduce", "map")
-                ) or (
-                    isinstance(node.func, ast.Attribute)
-                    and node.func.attr == "reduce"
-                    and isinstance(node.func.value, ast.Name)
-                    and node.func.value.id == "functools"
-                ):
-                    for arg in node.args:
-                        if isinstance(arg, FUNCTION_NODES):
-                            safe_functions.append(arg)
-
-                # check for key=
-                for keyword in node.keywords:
-                    if keyword.arg == "key" and isinstance(
-                        keyword.value, FUNCTION_NODES
-                    ):
-                        safe_functions.append(keyword.value)
-
-            # mark `return lambda: x` as safe
-            # does not (currently) check inner lambdas in a returned expression
-            # e.g. `return (lambda: x, )
-            if isinstance(node, ast.Return):
-                if isinstance(node.value, FUNCTION_NODES):
-                    safe_functions.append(node.value)
-
-            # find unsafe functions
-            if isinstance(node, FUNCTION_NODES) and node not in safe_functions:
-                argnames = {
-                    arg.arg for arg in ast.walk(node.args) if isinstance(arg, ast.arg)
-                }
-                if isinstance(node, ast.Lambda):
-                    body_nodes = ast.walk(node.body)
-                else:
-                    body_nodes = itertools.chain.from_iterable(map(ast.walk, node.body))
-                errors = []
-                for name in body_nodes:
-                    if isinstance(name, ast.Name) and name.id not in argnames:
-                        if isinstance(name.ctx, ast.Load):
-                            errors.append(name)
-                        elif isinstance(name.ctx, ast.Store):
-                            argnames.add(name.id)
-                for err in errors:
-                    if err.id not in argnames and err not in self._b023_seen:
-                        self._b023_seen.add(err)  # dedupe across nested loops
-                        suspicious_variables.append(err)
-
-        if suspicious_variables:
-            if isinstance(loop_node, (ast.For, ast.AsyncFor, ast.While)):
-                reassigned_in_loop = set(self._get_assigned_names(loop_node))
-            elif isinstance(
-                loop_node, (ast.GeneratorExp, ast.SetComp, ast.ListComp, ast.DictComp)
-            ):
-                # For comprehensions, the iteration variables are implicitly reassigned
-                reassigned_in_loop = set()
-                for generator in loop_node.generators:
-                    if isinstance(generator.target, ast.Name):
-                        reassigned_in_loop.add(generator.target.id)
-                    elif isinstance(generator.target, ast.Tuple):
-                        reassigned_in_loop.update(
-                            self._get_names_from_tuple(generator.target)
-                        )
-            else:
-                reassigned_in_loop = set()
-
-        for err in sorted(suspicious_variables, key=lambda n: n.id):
-            if err.id in reassigned_in_loop:
-                self.add_error("B023", err, err.id)
-
-    def check_for_b024_and_b027(self, node: ast.ClassDef) -> None:  # noqa: C901
-        """Check for inheritance from abstract classes in abc and lack of
-        any methods decorated with abstract*"""
-
-        def is_abc_class(value, name: str = "ABC"):
-            # class foo(metaclass = [abc.]ABCMeta)
-            if isinstance(value, ast.keyword):
-                return value.arg == "metaclass" and is_abc_class(value.value, "ABCMeta")
-            # class foo(ABC)
-            # class foo(abc.ABC)
-            return (isinstance(value, ast.Name) and value.id == name) or (
-                isinstance(value, ast.Attribute)
-                and value.attr == name
-                and isinstance(value.value, ast.Name)
-                and value.value.id == "abc"
-            )
-
-        def is_abstract_decorator(expr):
-            return (isinstance(expr, ast.Name) and expr.id[:8] == "abstract") or (
-                isinstance(expr, ast.Attribute) and expr.attr[:8] == "abstract"
-            )
-
-        def is_overload(expr):
-            return (isinstance(expr, ast.Name) and expr.id == "overload") or (
-                isinstance(expr, ast.Attribute) and expr.attr == "overload"
-            )
+        (outside the function).  This includes but is not limited to explicit
+        loop variables like the `x` in `for x in range(3):`.
 
-        def empty_body(body) -> bool:
-            def is_str_or_ellipsis(node):
-                return isinstance(node, ast.Constant) and (
-                    node.value is Ellipsis or isinstance(node.value, str)
+        The uses are found by `b023_late_bindings()` for the outermost loop at
+        once, and each one is reported with the innermost loop that reassigns
+        it.  Loops without a function or lambda in them are only scanned.
+        """
+        if loop_node not in self._b023_loops:
+            has_function = False
+            for node in ast.walk(loop_node):
+                if isinstance(node, LOOP_NODES):
+                    self._b023_loops.add(node)
+                elif isinstance(node, FUNCTION_NODES):
+                    has_function = True
+            if has_function:
+                self._b023_late_bindings.update(
+                    b023_late_bindings(SymbolTable(AstIndex(loop_node)))
                 )
 
-            # Function body consist solely of `pass`, `...`, and/or (doc)string literals
-            return all(
-                isinstance(stmt, ast.Pass)
-                or (isinstance(stmt, ast.Expr) and is_str_or_ellipsis(stmt.value))
-                for stmt in body
-            )
-
-        # don't check multiple inheritance
-        # https://github.com/PyCQA/flake8-bugbear/issues/277
-        if len(node.bases) + len(node.keywords) > 1:
-            return
+        for err in self._b023_late_bindings.get(loop_node, ()):
+            self.add_error("B023", err, err.id)
 
+    @register_check(ast.ClassDef)
+    def check_for_b024_and_b027(self, node: ast.ClassDef) -> None:
+        """Check for inheritance from abstract classes in abc and lack of
+        any methods decorated with abstract*"""
+        summary = self.class_summary(self.contexts[-1])
         # only check abstract classes
-        if not any(map(is_abc_class, (*node.bases, *node.keywords))):
+        if not summary.is_abc:
             return
 
-        has_method = False
-        has_abstract_method = False
-
-        for stmt in node.body:
-            # https://github.com/PyCQA/flake8-bugbear/issues/293
-            # Ignore abc's that declares a class attribute that must be set
-            if isinstance(stmt, ast.AnnAssign) and stmt.value is None:
-                has_abstract_method = True
-                continue
-
-            # only check function defs
-            if not isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                continue
-            has_method = True
-
-            has_abstract_decorator = any(
-                map(is_abstract_decorator, stmt.decorator_list)
-            )
-
-            has_abstract_method |= has_abstract_decorator
-
+        for method in summary.methods:
             if (
-                not has_abstract_decorator
-                and empty_body(stmt.body)
-                and not any(map(is_overload, stmt.decorator_list))
+                not method.has_abstract_decorator
+                and method.empty_body
+                and not method.is_overload
             ):
-                self.add_error("B027", stmt, stmt.name)
+                self.add_error("B027", method.node, method.node.name)
 
-        if has_method and not has_abstract_method:
+        # https://github.com/PyCQA/flake8-bugbear/issues/293
+        # Ignore abc's that declares a class attribute that must be set
+        if (
+            summary.methods
+            and not summary.has_declared_attribute
+            and not any(method.has_abstract_decorator for method in summary.methods)
+        ):
             self.add_error("B024", node, node.name)
 
+    @register_check(ast.Call)
     def check_for_b026(self, call: ast.Call) -> None:
         if not call.keywords:
             return
@@ -1186,76 +2114,7 @@ class BugBearVisitor(ast.NodeVisitor):
             ):
                 self.add_error("B026", starred)
 
-    def check_for_b031(self, loop_node: ast.For) -> None:  # noqa: C901
-        """Check that `itertools.groupby` isn't iterated over more than once.
-
-        We emit a warning when the generator returned by `groupby()` is used
-        more than once inside a loop body or when it's used in a nested loop.
-        """
-        # for <loop_node.target> in <loop_node.iter>: ...
-        if isinstance(loop_node.iter, ast.Call):
-            node = loop_node.iter
-            if (isinstance(node.func, ast.Name) and node.func.id in ("groupby",)) or (
-                isinstance(node.func, ast.Attribute)
-                and node.func.attr == "groupby"
-                and isinstance(node.func.value, ast.Name)
-                and node.func.value.id == "itertools"
-            ):
-                # We have an invocation of groupby which is a simple unpacking
-                if isinstance(loop_node.target, ast.Tuple) and isinstance(
-                    loop_node.target.elts[1], ast.Name
-                ):
-                    group_name = loop_node.target.elts[1].id
-                else:
-                    # Ignore any `groupby()` invocation that isn't unpacked
-                    return
-
-                num_usages = 0
-                for node in walk_list(loop_node.body):  # type: ignore[assignment]
-                    # Handled nested loops
-                    if isinstance(node, ast.For):
-                        for nested_node in walk_list(node.body):
-                            assert nested_node != node
-                            if (
-                                isinstance(nested_node, ast.Name)
-                                and nested_node.id == group_name
-                                and isinstance(nested_node.ctx, ast.Load)
-                            ):
-                                self.add_error("B031", nested_node, nested_node.id)
-
-                    # Handle multiple uses. Count only loads: a store-context
-                    # reference, such as an annotation target (`group: T`), is
-                    # not a read of the generator (#465).
-                    if (
-                        isinstance(node, ast.Name)
-                        and node.id == group_name
-                        and isinstance(node.ctx, ast.Load)
-                    ):
-                        num_usages += 1
-                        if num_usages > 1:
-                            self.add_error("B031", node, node.id)
-
-    def _get_names_from_tuple(self, node: ast.Tuple) -> Iterator[str]:
-        for dim in node.elts:
-            if isinstance(dim, ast.Name):
-                yield dim.id
-            elif isinstance(dim, ast.Tuple):
-                yield from self._get_names_from_tuple(dim)
-
-    def _get_dict_comp_loop_and_named_expr_var_names(
-        self, node: ast.DictComp
-    ) -> Iterator[str]:
-        finder = NamedExprFinder()
-        for gen in node.generators:
-            if isinstance(gen.target, ast.Name):
-                yield gen.target.id
-            elif isinstance(gen.target, ast.Tuple):
-                yield from self._get_names_from_tuple(gen.target)
-
-            finder.visit(gen.ifs)
-
-        yield from finder.names.keys()
-
+    @register_check(ast.DictComp)
     def check_for_b035(self, node: ast.DictComp) -> None:
         """Check that a static key isn't used in a dict comprehension.
 
@@ -1265,10 +2124,16 @@ class BugBearVisitor(ast.NodeVisitor):
         if isinstance(node.key, ast.Constant):
             self.add_error("B035", node.key, node.key.value)
         elif isinstance(node.key, ast.Name):
-            if node.key.id not in self._get_dict_comp_loop_and_named_expr_var_names(
-                node
+            name = node.key.id
+            # bound by the generators, or by an assignment expression in a filter
+            symbols = self.symbols_of(node)
+            if symbols.scopes[node].binds(name) or any(
+                use.kind == "walrus"
+                for generator in node.generators
+                for use in symbols.uses_in(generator.ifs, name)
             ):
-                self.add_error("B035", node.key, node.key.id)
+                return
+            self.add_error("B035", node.key, name)
 
     def check_for_b040_add_note(self, node: ast.Attribute) -> bool:
         if (
@@ -1281,65 +2146,67 @@ class BugBearVisitor(ast.NodeVisitor):
             return True
         return False
 
-    def check_for_b040_usage(
-        self, node: ast.expr | list[ast.expr] | list[ast.keyword] | None
-    ) -> None:
-        def superwalk(
-            node: ast.AST | list[ast.AST] | list[ast.expr] | list[ast.keyword],
-        ) -> Iterator[ast.AST]:
-            if isinstance(node, list):
-                for n in node:
-                    yield from ast.walk(n)
-            else:
-                yield from ast.walk(node)
+    def enter_b040_usage(self, node: ast.AST, start: int) -> None:
+        """Notes that names at positions >= `start` in the subtree of `node` use
+        the caught exception."""
+        assert self.b040_caught_exception is not None
+        self.b040_caught_exception.frames.append((node, start))
 
-        if not self.b040_caught_exception or node is None:
+    def leave_b040_usage(self, node: ast.AST) -> None:
+        handler = self._b040_handler
+        if handler is None or not handler.frames or handler.frames[-1][0] is not node:
             return
 
-        for n in superwalk(node):
-            if isinstance(n, ast.Name) and n.id == self.b040_caught_exception.name:
-                self.b040_caught_exception = None
-                break
+        handler.frames.pop()
+        if node in handler.add_note_calls:
+            handler.add_note_calls.discard(node)
+            # Uses inside the `add_note()` call don't count.
+            self.b040_caught_exception = handler
+
+    def check_for_b040_usage(self, node: ast.Name) -> None:
+        """Checks whether a name of the caught exception uses it.
+
+        The exception is used as soon as the traversal meets its name in a
+        place that uses it, and then stays used.  That is, unless the use is
+        inside an `add_note()` call which is itself inside that place: the
+        call's own uses of the name don't count, but this one happened before
+        the call was reached.
+        """
+        exc = self.b040_caught_exception
+        assert exc is not None
+        position = exc.index.position[node]
+        outermost = next(
+            (
+                i
+                for i, (_, start) in enumerate(exc.frames)
+                if start is not None and start <= position
+            ),
+            None,
+        )
+        if outermost is None:
+            return
+
+        for frame_node, start in exc.frames[outermost + 1 :]:
+            if start is None:
+                exc.add_note_calls.discard(frame_node)
+        self.b040_caught_exception = None
 
-    def _get_assigned_names(
-        self, loop_node: ast.For | ast.AsyncFor | ast.While
-    ) -> Iterator[str]:
-        loop_targets = (ast.For, ast.AsyncFor, ast.comprehension)
-        for node in children_in_scope(loop_node):
-            if isinstance(node, (ast.Assign)):
-                for child in node.targets:
-                    yield from names_from_assignments(child)
-            if isinstance(node, loop_targets + (ast.AnnAssign, ast.AugAssign)):
-                yield from names_from_assignments(node.target)
-
-    def check_for_b904(self, node: ast.Raise) -> None:
+    @register_check(*TRY_NODES)
+    def check_for_b904(self, node: ast.Try | ast.TryStar) -> None:
         """Checks `raise` without `from` inside an `except` clause.
 
         In these cases, you should use explicit exception chaining from the
         earlier error, or suppress it with `raise ... from None`.  See
         https://docs.python.org/3/tutorial/errors.html#exception-chaining
         """
-        if (
-            node.cause is None
-            and node.exc is not None
-            and not (isinstance(node.exc, ast.Name) and node.exc.id.islower())
-            and any(isinstance(n, ast.ExceptHandler) for n in self.node_stack)
-        ):
-            self.add_error("B904", node, self.in_trystar)
-
-    def walk_function_body(
-        self, node: ast.FunctionDef | ast.AsyncFunctionDef
-    ) -> Iterator[tuple[ast.AST, ast.AST]]:
-        def _loop(parent: ast.AST, node: ast.AST) -> Iterator[tuple[ast.AST, ast.AST]]:
-            if isinstance(node, (ast.AsyncFunctionDef, ast.FunctionDef)):
-                return
-            yield parent, node
-            for child in ast.iter_child_nodes(node):
-                yield from _loop(node, child)
-
-        for child in node.body:
-            yield from _loop(node, child)
+        for raise_node, in_trystar in self.try_summary(node).raises_without_cause:
+            assert raise_node.exc is not None
+            if not (
+                isinstance(raise_node.exc, ast.Name) and raise_node.exc.id.islower()
+            ):
+                self.add_error("B904", raise_node, in_trystar)
 
+    @register_check(ast.FunctionDef)
     def check_for_b901(self, node: ast.FunctionDef) -> None:
         if node.name == "__await__":
             return
@@ -1361,21 +2228,9 @@ class BugBearVisitor(ast.NodeVisitor):
             if isinstance(slice, ast.Tuple) and len(slice.elts) == 3:
                 return
 
-        has_yield = False
-        return_node = None
-
-        for parent, x in self.walk_function_body(node):
-            # Only consider yield when it is part of an Expr statement.
-            if isinstance(parent, ast.Expr) and isinstance(
-                x, (ast.Yield, ast.YieldFrom)
-            ):
-                has_yield = True
-
-            if isinstance(x, ast.Return) and x.value is not None:
-                return_node = x
-
-        if has_yield and return_node is not None:
-            self.add_error("B901", return_node)
+        summary = self.function_summary(node)
+        if summary.has_yield and summary.value_returns:
+            self.add_error("B901", summary.value_returns[-1])
 
     # taken from pep8-naming
     @classmethod
@@ -1388,6 +2243,7 @@ class BugBearVisitor(ast.NodeVisitor):
             return cls.find_decorator_name(d.func)
         return None
 
+    @register_check(ast.FunctionDef, ast.AsyncFunctionDef)
     def check_for_b902(  # noqa: C901 (too complex)
         self, node: ast.FunctionDef | ast.AsyncFunctionDef
     ) -> None:
@@ -1397,30 +2253,19 @@ class BugBearVisitor(ast.NodeVisitor):
                 or node.name in B902_IMPLICIT_CLASSMETHODS
             )
 
-        if len(self.contexts) < 2 or not isinstance(
-            self.contexts[-2].node, ast.ClassDef
-        ):
+        cls = self.enclosing_class()
+        if cls is None:
             return
 
-        cls = self.contexts[-2].node
-
-        decorators: set[str] = {
-            d
-            for d in (self.find_decorator_name(dec) for dec in node.decorator_list)
-            if d is not None
-        }
+        method = cls.method(node)
+        decorators = method.decorator_names
 
         if "staticmethod" in decorators:
             # TODO: maybe warn if the first argument is surprisingly `self` or
             # `cls`?
             return
 
-        bases = {
-            b.id if isinstance(b, ast.Name) else b.attr
-            for b in cls.bases
-            if isinstance(b, (ast.Name, ast.Attribute))
-        }
-        if any(basetype in bases for basetype in ("type", "ABCMeta", "EnumMeta")):
+        if cls.is_metaclass:
             if is_classmethod(decorators):
                 expected_first_args = B902_METACLS
                 kind = "metaclass class"
@@ -1463,27 +2308,20 @@ class BugBearVisitor(ast.NodeVisitor):
                 "B902", err_node, actual_first_arg, kind, expected_first_args[0]
             )
 
+    @register_check(ast.ClassDef)
     def check_for_b903(self, node: ast.ClassDef) -> None:
-        body = node.body
-        if (
-            body
-            and isinstance(body[0], ast.Expr)
-            and isinstance(body[0].value, ast.Constant)
-            and isinstance(body[0].value.value, str)
-        ):
-            # Ignore the docstring
-            body = body[1:]
-
+        summary = self.class_summary(self.contexts[-1])
         if (
-            len(body) != 1
-            or not isinstance(body[0], ast.FunctionDef)
-            or body[0].name != "__init__"
+            summary.statement_count != 1
+            or len(summary.methods) != 1
+            or not isinstance(summary.methods[0].node, ast.FunctionDef)
+            or summary.methods[0].node.name != "__init__"
         ):
             # only classes with *just* an __init__ method are interesting
             return
 
         # all the __init__ function does is a series of assignments to attributes
-        for stmt in body[0].body:
+        for stmt in summary.methods[0].node.body:
             if not isinstance(stmt, ast.Assign):
                 return
             targets = stmt.targets
@@ -1494,6 +2332,7 @@ class BugBearVisitor(ast.NodeVisitor):
 
         self.add_error("B903", node)
 
+    @register_check(ast.Expr)
     def check_for_b018(self, node: ast.AST) -> None:
         if not isinstance(node, ast.Expr):
             return
@@ -1522,6 +2361,7 @@ class BugBearVisitor(ast.NodeVisitor):
         ):
             self.add_error("B018", node, node.value.__class__.__name__)
 
+    @register_check(ast.FunctionDef, ast.ClassDef)
     def check_for_b021(self, node: ast.FunctionDef | ast.ClassDef) -> None:
         if (
             node.body
@@ -1530,6 +2370,7 @@ class BugBearVisitor(ast.NodeVisitor):
         ):
             self.add_error("B021", node.body[0].value)
 
+    @register_check(ast.With)
     def check_for_b022(self, node: ast.With) -> None:
         item = node.items[0]
         item_context = item.context_expr
@@ -1569,6 +2410,9 @@ class BugBearVisitor(ast.NodeVisitor):
         else:
             return False
 
+    @register_check(
+        ast.With, triggers=("raises", "warns", "assertRaises", "assertWarns")
+    )
     def check_for_b908(self, node: ast.With) -> None:
         if len(node.body) < 2:
             return
@@ -1576,23 +2420,13 @@ class BugBearVisitor(ast.NodeVisitor):
             if self._is_assertRaises_like(node_item):
                 self.add_error("B908", node)
 
+    @register_check(*TRY_NODES)
     def check_for_b025(self, node: ast.Try | ast.TryStar) -> None:
-        seen = []
-        for handler in node.handlers:
-            if isinstance(handler.type, (ast.Name, ast.Attribute)):
-                name = ".".join(compose_call_path(handler.type))
-                seen.append(name)
-            elif isinstance(handler.type, ast.Tuple):
-                # to avoid checking the same as B014, remove duplicates per except
-                uniques = set()
-                for entry in handler.type.elts:
-                    name = ".".join(compose_call_path(entry))
-                    uniques.add(name)
-                seen.extend(uniques)
+        seen = self.try_summary(node).caught
         # sort to have a deterministic output
         duplicates = sorted({x for x in seen if seen.count(x) > 1})
         for duplicate in duplicates:
-            self.add_error("B025", node, duplicate, self.in_trystar)
+            self.add_error("B025", node, duplicate, _trystar_marker(node))
 
     @staticmethod
     def _is_infinite_iterator(node: ast.expr) -> bool:
@@ -1627,6 +2461,7 @@ class BugBearVisitor(ast.NodeVisitor):
 
         return False
 
+    @register_check(ast.Call, triggers=("zip",))
     def check_for_b905(self, node: ast.Call) -> None:
         if not (isinstance(node.func, ast.Name) and node.func.id == "zip"):
             return
@@ -1636,11 +2471,8 @@ class BugBearVisitor(ast.NodeVisitor):
         if not any(kw.arg == "strict" for kw in node.keywords):
             self.add_error("B905", node)
 
+    @register_check(ast.Call)
     def check_for_b912(self, node: ast.Call) -> None:
-        # `map(strict=...)` was added in Python 3.14; emitting on older
-        # interpreters would flag valid code.
-        if sys.version_info < (3, 14):
-            return
         if not (
             isinstance(node.func, ast.Name)
             and node.func.id == "map"
@@ -1650,6 +2482,7 @@ class BugBearVisitor(ast.NodeVisitor):
         if not any(kw.arg == "strict" for kw in node.keywords):
             self.add_error("B912", node)
 
+    @register_check(ast.FunctionDef)
     def check_for_b906(self, node: ast.FunctionDef) -> None:
         if not node.name.startswith("visit_"):
             return
@@ -1689,15 +2522,10 @@ class BugBearVisitor(ast.NodeVisitor):
         ):
             return
 
-        for n in itertools.chain.from_iterable(ast.walk(nn) for nn in node.body):
-            if isinstance(n, ast.Call) and (
-                (isinstance(n.func, ast.Attribute) and "visit" in n.func.attr)
-                or (isinstance(n.func, ast.Name) and "visit" in n.func.id)
-            ):
-                break
-        else:
+        if not self.function_summary(node).visit_calls:
             self.add_error("B906", node)
 
+    @register_check(ast.JoinedStr)
     def check_for_b907(self, node: ast.JoinedStr) -> None:  # noqa: C901
         quote_marks = "'\""
         current_mark = None
@@ -1713,7 +2541,7 @@ class BugBearVisitor(ast.NodeVisitor):
                     and variable is not None
                     and value.value[0] == current_mark
                 ):
-                    self.add_error("B907", variable, ast.unparse(variable.value))
+                    self.add_error("B907", variable, self.source_of(variable.value))
                     current_mark = variable = None
                     # don't continue with length>1, so we can detect a new pre-mark
                     # in the same string as a post-mark, e.g. `"{foo}" "{bar}"`
@@ -1781,6 +2609,7 @@ class BugBearVisitor(ast.NodeVisitor):
             # if no pre-mark or variable detected, reset state
             current_mark = variable = None
 
+    @register_check(ast.Call, triggers=("warnings",))
     def check_for_b028(self, node: ast.Call) -> None:
         if (
             isinstance(node.func, ast.Attribute)
@@ -1795,6 +2624,7 @@ class BugBearVisitor(ast.NodeVisitor):
         ):
             self.add_error("B028", node)
 
+    @register_check(ast.AnnAssign)
     def check_for_b032(self, node: ast.AnnAssign) -> None:
         if (
             node.value is None
@@ -1810,6 +2640,7 @@ class BugBearVisitor(ast.NodeVisitor):
         ):
             self.add_error("B032", node)
 
+    @register_check(ast.Set)
     def check_for_b033(self, node: ast.Set) -> None:
         seen = set()
         for elt in node.elts:
@@ -1820,6 +2651,7 @@ class BugBearVisitor(ast.NodeVisitor):
             else:
                 seen.add(elt.value)
 
+    @register_check(ast.Call)
     def check_for_b034(self, node: ast.Call) -> None:
         if not isinstance(node.func, ast.Attribute):
             return
@@ -1837,119 +2669,53 @@ class BugBearVisitor(ast.NodeVisitor):
         elif func.attr == "split":
             check(2, "maxsplit")
 
-    def check_for_b042(self, node: ast.ClassDef) -> None:  # noqa: C901 # too-complex
-        def is_exception(s: str):
-            for ending in "Exception", "Error", "Warning", "ExceptionGroup":
-                if s.endswith(ending):
-                    return True
-            return False
-
-        # A class must inherit from a super class to be an exception, and we also
-        # require the class name or any of the base names to look like an exception name.
-        if not (is_exception(node.name) and node.bases):
-            for base in node.bases:
-                if isinstance(base, ast.Name) and is_exception(base.id):
-                    break
-            else:
-                return
+    @register_check(ast.ClassDef)
+    def check_for_b042(self, node: ast.ClassDef) -> None:
+        summary = self.class_summary(self.contexts[-1])
+        if not summary.is_exception:
+            return
 
         # if the user defines __str__ + a pickle dunder they're probably in the clear.
-        has_pickle_dunder = False
-        has_str = False
-        for fun in node.body:
-            if isinstance(fun, ast.FunctionDef) and fun.name in (
-                "__getnewargs_ex__",
-                "__getnewargs__",
-                "__getstate__",
-                "__setstate__",
-                "__reduce__",
-                "__reduce_ex__",
-            ):
-                if has_str:
-                    return
-                has_pickle_dunder = True
-            elif isinstance(fun, ast.FunctionDef) and fun.name == "__str__":
-                if has_pickle_dunder:
-                    return
-                has_str = True
-
-        # iterate body nodes looking for __init__
-        for fun in node.body:
-            if not (isinstance(fun, ast.FunctionDef) and fun.name == "__init__"):
-                continue
-            if any(
-                (isinstance(decorator, ast.Name) and decorator.id == "overload")
-                or (
-                    isinstance(decorator, ast.Attribute)
-                    and decorator.attr == "overload"
-                )
-                for decorator in fun.decorator_list
-            ):
-                continue
-            if fun.args.kwonlyargs or fun.args.kwarg:
-                # kwargs cannot be passed to super().__init__()
-                self.add_error("B042", fun)
-                return
-            # -1 to exclude the `self` argument
-            expected_arg_count = (
-                len(fun.args.posonlyargs)
-                + len(fun.args.args)
-                - 1
-                + (1 if fun.args.vararg else 0)
-            )
-            if expected_arg_count == 0:
-                # no arguments, don't need to call super().__init__()
-                return
-
-            # Look for super().__init__()
-            # We only check top-level nodes instead of doing an `ast.walk`.
-            # Small risk of false alarm if the user does something weird.
-            for b in fun.body:
-                if (
-                    isinstance(b, ast.Expr)
-                    and isinstance(b.value, ast.Call)
-                    and isinstance(b.value.func, ast.Attribute)
-                    and isinstance(b.value.func.value, ast.Call)
-                    and isinstance(b.value.func.value.func, ast.Name)
-                    and b.value.func.value.func.id == "super"
-                    and b.value.func.attr == "__init__"
-                ):
-                    if len(b.value.args) != expected_arg_count:
-                        self.add_error("B042", fun)
-                    elif fun.args.vararg:
-                        for arg in b.value.args:
-                            if isinstance(arg, ast.Starred):
-                                return
-                        else:
-                            # no Starred argument despite vararg
-                            self.add_error("B042", fun)
-                    return
-            else:
-                # no super().__init__() found
-                self.add_error("B042", fun)
-                return
-        # no `def __init__` found, which is fine
-
-    def check_for_b909(self, node: ast.For) -> None:
-        if isinstance(node.iter, ast.Name):
-            name = _to_name_str(node.iter)
-            key = _to_name_str(node.target)
-        elif isinstance(node.iter, ast.Attribute):
-            name = _to_name_str(node.iter)
-            key = _to_name_str(node.target)
-        else:
+        names = {
+            method.node.name
+            for method in summary.methods
+            if isinstance(method.node, ast.FunctionDef)
+        }
+        if "__str__" in names and not names.isdisjoint(B042_PICKLE_DUNDERS):
             return
 
-        if name is None or key is None:
+        fun = summary.init
+        if fun is None:
+            # no `def __init__` found, which is fine
+            return
+        if fun.args.kwonlyargs or fun.args.kwarg:
+            # kwargs cannot be passed to super().__init__()
+            self.add_error("B042", fun)
+            return
+        # -1 to exclude the `self` argument
+        expected_arg_count = (
+            len(fun.args.posonlyargs)
+            + len(fun.args.args)
+            - 1
+            + (1 if fun.args.vararg else 0)
+        )
+        if expected_arg_count == 0:
+            # no arguments, don't need to call super().__init__()
             return
 
-        checker = B909Checker(name, key)
-        checker.visit(node.body)
-        for mutation in itertools.chain.from_iterable(
-            m for m in checker.mutations.values()
+        call = summary.init_super_call
+        if call is None:
+            # no super().__init__() found
+            self.add_error("B042", fun)
+        elif len(call.args) != expected_arg_count:
+            self.add_error("B042", fun)
+        elif fun.args.vararg and not any(
+            isinstance(arg, ast.Starred) for arg in call.args
         ):
-            self.add_error("B909", mutation)
+            # no Starred argument despite vararg
+            self.add_error("B042", fun)
 
+    @register_check(ast.Call)
     def check_for_b910(self, node: ast.Call) -> None:
         if (
             isinstance(node.func, ast.Name)
@@ -1960,6 +2726,7 @@ class BugBearVisitor(ast.NodeVisitor):
         ):
             self.add_error("B910", node)
 
+    @register_check(ast.Call, triggers=("batched",))
     def check_for_b911(self, node: ast.Call) -> None:
         if (
             (isinstance(node.func, ast.Name) and node.func.id == "batched")
@@ -1973,14 +2740,23 @@ class BugBearVisitor(ast.NodeVisitor):
             self.add_error("B911", node)
 
 
+BugBearVisitor.registered_checks = collect_checks(BugBearVisitor)
+BugBearVisitor.dispatch_table = build_dispatch_table(BugBearVisitor.registered_checks)
+
+
 def compose_call_path(node: ast.expr) -> Iterator[str]:
-    if isinstance(node, ast.Attribute):
-        yield from compose_call_path(node.value)
-        yield node.attr
-    elif isinstance(node, ast.Call):
-        yield from compose_call_path(node.func)
-    elif isinstance(node, ast.Name):
+    attrs: list[str] = []
+    while True:
+        if isinstance(node, ast.Attribute):
+            attrs.append(node.attr)
+            node = node.value
+        elif isinstance(node, ast.Call):
+            node = node.func
+        else:
+            break
+    if isinstance(node, ast.Name):
         yield node.id
+    yield from reversed(attrs)
 
 
 def is_name(node: ast.expr, name: str) -> bool:
@@ -1993,144 +2769,850 @@ def is_name(node: ast.expr, name: str) -> bool:
         return node.attr == attr and is_name(node.value, rest)
 
 
-class B909Checker(ast.NodeVisitor):
-    # https://docs.python.org/3/library/stdtypes.html#mutable-sequence-types
-    MUTATING_FUNCTIONS = (
-        "append",
-        "sort",
-        "reverse",
-        "remove",
-        "clear",
-        "extend",
-        "insert",
-        "pop",
-        "popitem",
-        "setdefault",
-        "update",
-        "intersection_update",
-        "difference_update",
-        "symmetric_difference_update",
-        "add",
-        "discard",
+class StackNodeVisitor(ast.NodeVisitor):
+    """An `ast.NodeVisitor` that visits trees of any depth without recursing.
+
+    While a `visit_*` method runs, `visit()` and `generic_visit()` only schedule
+    the given nodes; they are visited after the method returns, in the order they
+    were scheduled.  State that has to wrap the visit of scheduled nodes is
+    updated from callbacks passed to `schedule()`.
+    """
+
+    _scheduled: list[ast.AST | Callable[[], None]] | None = None
+
+    def schedule(self, callback: Callable[[], None]) -> None:
+        """Calls `callback` once the nodes scheduled before it were visited."""
+        if self._scheduled is None:
+            callback()
+        else:
+            self._scheduled.append(callback)
+
+    def visit(self, node: ast.AST) -> None:
+        if self._scheduled is not None:
+            self._scheduled.append(node)
+            return
+
+        stack: list[ast.AST | Callable[[], None]] = [node]
+        try:
+            while stack:
+                item = stack.pop()
+                scheduled: list[ast.AST | Callable[[], None]] = []
+                self._scheduled = scheduled
+                if isinstance(item, ast.AST):
+                    method = "visit_" + item.__class__.__name__
+                    getattr(self, method, self.generic_visit)(item)
+                else:
+                    item()
+                stack.extend(reversed(scheduled))
+        finally:
+            self._scheduled = None
+
+
+class HandlerSummary:
+    """An `except` clause with what B013, B014, B029, B030 and B036 need."""
+
+    __slots__ = ("node", "names", "has_bad_types", "has_unchecked_types", "reraises")
+
+    def __init__(self, node: ast.ExceptHandler) -> None:
+        self.node = node
+        # the names of the caught exceptions, e.g. "ValueError" or "pkg.mod.error"
+        self.names: list[str] = []
+        # whether some caught expressions can't be exception classes, e.g.
+        # literals
+        self.has_bad_types = False
+        # whether some caught expressions are calls or starred expressions, or
+        # other attributes than name chains, which aren't checked
+        self.has_unchecked_types = False
+        # whether the body has a `raise` or `raise <name of the caught
+        # exception>`, not counting nested handlers
+        self.reraises = False
+
+
+class TrySummary(NamedTuple):
+    """What the checks of a `try` statement need to know about it."""
+
+    node: ast.Try | ast.TryStar
+    # "*" if the statement is in a `try`/`except*` or is one, for the messages
+    in_trystar: str
+    handlers: list[HandlerSummary]
+    # the names of the exceptions caught by the handlers, once per handler
+    caught: list[str]
+    # `return` statements, and `continue` and `break` statements outside
+    # loops, in the finally block
+    finally_escapes: list[ast.Return | ast.Continue | ast.Break]
+    # `raise <exception>` statements without `from` in the handlers, with the
+    # `in_trystar` marker for each.  Statements in nested functions and classes,
+    # or whose innermost handler belongs to a nested `try`, are left out.
+    raises_without_cause: list[tuple[ast.Raise, str]]
+
+
+def summarize_try(node: ast.Try | ast.TryStar, in_trystar: str) -> TrySummary:
+    """Summarizes a `try` statement in a single walk over its handlers and its
+    finally block.
+
+    `in_trystar` is the marker for the statements around `node`.
+    """
+    if not isinstance(node, ast.Try):
+        in_trystar = "*"
+    summary = TrySummary(
+        node,
+        in_trystar,
+        handlers=[],
+        caught=[],
+        finally_escapes=_find_finally_escapes(node.finalbody),
+        raises_without_cause=[],
     )
+    for handler in node.handlers:
+        summary.handlers.append(_summarize_handler(handler, summary))
+        if isinstance(handler.type, (ast.Name, ast.Attribute)):
+            summary.caught.append(".".join(compose_call_path(handler.type)))
+        elif isinstance(handler.type, ast.Tuple):
+            # to avoid checking the same as B014, remove duplicates per except
+            summary.caught.extend(
+                {".".join(compose_call_path(entry)) for entry in handler.type.elts}
+            )
+    return summary
+
+
+def _summarize_handler(node: ast.ExceptHandler, summary: TrySummary) -> HandlerSummary:
+    handler = HandlerSummary(node)
+    if node.type is not None:
+        _add_caught_types(handler, node.type)
+
+    # (node, in a nested scope, in a nested `try`/`except*`), in preorder
+    stack: list[tuple[ast.AST, bool, bool]] = [
+        (child, False, False) for child in reversed(node.body)
+    ]
+    while stack:
+        n, in_scope, in_trystar = stack.pop()
+        if isinstance(n, ast.ExceptHandler):
+            # raises in there are handled by the nested `try`
+            continue
 
-    def __init__(self, name: str, key: str) -> None:
-        self.name = name
-        self.key = key
-        self.mutations: dict[
-            int, list[ast.Assign | ast.AugAssign | ast.Delete | ast.Call]
-        ] = defaultdict(list)
-        self._conditional_block = 0
-
-    def visit_Assign(self, node: ast.Assign) -> None:
-        for target in node.targets:
-            if (
-                isinstance(target, ast.Subscript)
-                and _to_name_str(target.value) == self.name
-                and _to_name_str(target.slice) != self.key
-            ):
-                self.mutations[self._conditional_block].append(node)
-        self.generic_visit(node)
+        if isinstance(n, CONTEXTFUL_NODES):
+            in_scope = True
+        elif isinstance(n, TRYSTAR_NODES):
+            in_trystar = True
+        elif isinstance(n, ast.Raise):
+            if n.exc is None or (isinstance(n.exc, ast.Name) and n.exc.id == node.name):
+                handler.reraises = True
+            if n.exc is not None and n.cause is None and not in_scope:
+                summary.raises_without_cause.append(
+                    (n, "*" if in_trystar else summary.in_trystar)
+                )
+        stack.extend(
+            (child, in_scope, in_trystar)
+            for child in reversed(list(ast.iter_child_nodes(n)))
+        )
+    return handler
 
-    def visit_AugAssign(self, node: ast.AugAssign) -> None:
-        if _to_name_str(node.target) == self.name:
-            self.mutations[self._conditional_block].append(node)
-        self.generic_visit(node)
 
-    def visit_Delete(self, node: ast.Delete) -> None:
-        for target in node.targets:
-            if isinstance(target, ast.Subscript):
-                name = _to_name_str(target.value)
-            elif isinstance(target, (ast.Attribute, ast.Name)):
-                name = ""  # ignore "del foo"
+def _add_caught_types(handler: HandlerSummary, node: ast.expr) -> None:
+    for caught in _flatten_excepthandler(node):
+        if isinstance(caught, (ast.Name, ast.Attribute)):
+            name = _to_name_str(caught)
+            if name is None:
+                handler.has_unchecked_types = True
             else:
-                name = ""  # fallback
-                self.generic_visit(target)
+                handler.names.append(name)
+        elif isinstance(caught, (ast.Call, ast.Starred)):
+            handler.has_unchecked_types = True
+        else:
+            handler.has_bad_types = True
+
+
+def _find_finally_escapes(
+    finalbody: list[ast.stmt],
+) -> list[ast.Return | ast.Continue | ast.Break]:
+    escapes = []
+    # (node, in a nested loop), in preorder; continue/break only escape the
+    # finally block outside of nested loops
+    stack: list[tuple[ast.AST, bool]] = [
+        (child, False) for child in reversed(finalbody)
+    ]
+    while stack:
+        n, in_loop = stack.pop()
+        if isinstance(n, (ast.AsyncFunctionDef, ast.FunctionDef)):
+            continue
+
+        if isinstance(n, (ast.While, ast.For)):
+            in_loop = True
+        elif isinstance(n, ast.Return) or (
+            not in_loop and isinstance(n, (ast.Continue, ast.Break))
+        ):
+            escapes.append(n)  # type: ignore[arg-type]
+        stack.extend(
+            (child, in_loop) for child in reversed(list(ast.iter_child_nodes(n)))
+        )
+    return escapes
 
-            if name == self.name:
-                self.mutations[self._conditional_block].append(node)
 
-    def visit_Call(self, node: ast.Call) -> None:
-        if isinstance(node.func, ast.Attribute):
-            name = _to_name_str(node.func.value)
-            function_object = name
-            function_name = node.func.attr
+B042_PICKLE_DUNDERS = (
+    "__getnewargs_ex__",
+    "__getnewargs__",
+    "__getstate__",
+    "__setstate__",
+    "__reduce__",
+    "__reduce_ex__",
+)
 
+
+class Method(NamedTuple):
+    """A function defined directly in the body of a class."""
+
+    node: ast.FunctionDef | ast.AsyncFunctionDef
+    # the names of the decorators without their module or arguments, e.g.
+    # "abstractmethod" for `@abc.abstractmethod`
+    decorator_names: set[str]
+    # decorated with `@abstract*` or `@abc.abstract*`
+    has_abstract_decorator: bool
+    # decorated with `@overload` or `@typing.overload`
+    is_overload: bool
+    # the body consists solely of `pass`, `...` and/or (doc)string literals
+    empty_body: bool
+
+
+class ClassSummary(NamedTuple):
+    """What the class-level checks and the checks of methods need to know about a
+    class, from its bases and the statements directly in its body."""
+
+    node: ast.ClassDef
+    # the functions defined directly in the body, in order
+    methods: list[Method]
+    # the number of statements in the body, not counting a docstring
+    statement_count: int
+    # whether a class attribute is declared without a value, e.g. `x: int`
+    has_declared_attribute: bool
+    # whether the only base is `ABC` (or the only keyword `metaclass=ABCMeta`)
+    is_abc: bool
+    # whether a base is `type`, `ABCMeta` or `EnumMeta`
+    is_metaclass: bool
+    # whether the class or one of its bases is named like an exception
+    is_exception: bool
+    # the first `def __init__` in the body that isn't an overload
+    init: ast.FunctionDef | None
+    # the first `super().__init__(...)` statement directly in `init`'s body
+    init_super_call: ast.Call | None
+
+    def method(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> Method:
+        """Returns the method for `node`, which may be nested in a statement of the
+        body, e.g. an `if`, and so not in `methods`."""
+        for method in self.methods:
+            if method.node is node:
+                return method
+        return summarize_method(node)
+
+
+def summarize_class(node: ast.ClassDef) -> ClassSummary:
+    """Summarizes a class in a single pass over its bases and body."""
+    body = node.body
+    if (
+        body
+        and isinstance(body[0], ast.Expr)
+        and isinstance(body[0].value, ast.Constant)
+        and isinstance(body[0].value.value, str)
+    ):
+        body = body[1:]
+
+    methods = []
+    has_declared_attribute = False
+    init = None
+    for stmt in node.body:
+        if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            method = summarize_method(stmt)
+            methods.append(method)
             if (
-                function_object == self.name
-                and function_name in self.MUTATING_FUNCTIONS
+                init is None
+                and isinstance(stmt, ast.FunctionDef)
+                and stmt.name == "__init__"
+                and not method.is_overload
             ):
-                self.mutations[self._conditional_block].append(node)
+                init = stmt
+        elif isinstance(stmt, ast.AnnAssign) and stmt.value is None:
+            has_declared_attribute = True
+
+    bases_and_keywords: list[ast.expr | ast.keyword] = [*node.bases, *node.keywords]
+    base_names = {
+        b.id if isinstance(b, ast.Name) else b.attr
+        for b in node.bases
+        if isinstance(b, (ast.Name, ast.Attribute))
+    }
+    return ClassSummary(
+        node,
+        methods=methods,
+        statement_count=len(body),
+        has_declared_attribute=has_declared_attribute,
+        # don't check multiple inheritance
+        # https://github.com/PyCQA/flake8-bugbear/issues/277
+        is_abc=len(bases_and_keywords) == 1 and _is_abc_class(bases_and_keywords[0]),
+        is_metaclass=not base_names.isdisjoint(("type", "ABCMeta", "EnumMeta")),
+        # A class must inherit from a super class to be an exception, and we
+        # also require the class name or any of the base names to look like an
+        # exception name.
+        is_exception=(_is_exception_name(node.name) and bool(node.bases))
+        or any(
+            isinstance(base, ast.Name) and _is_exception_name(base.id)
+            for base in node.bases
+        ),
+        init=init,
+        init_super_call=None if init is None else _find_super_init_call(init),
+    )
 
-        self.generic_visit(node)
 
-    def visit_If(self, node: ast.If) -> None:
-        self._conditional_block += 1
-        self.visit(node.body)
-        self._conditional_block += 1
+def summarize_method(node: ast.FunctionDef | ast.AsyncFunctionDef) -> Method:
+    return Method(
+        node,
+        decorator_names={
+            name
+            for name in map(BugBearVisitor.find_decorator_name, node.decorator_list)
+            if name is not None
+        },
+        has_abstract_decorator=any(map(_is_abstract_decorator, node.decorator_list)),
+        is_overload=any(map(_is_overload, node.decorator_list)),
+        empty_body=_is_empty_body(node.body),
+    )
 
-    def visit(self, node: ast.AST | list[ast.stmt]) -> ast.AST | list[ast.stmt] | None:
-        """Like super-visit but supports iteration over lists."""
-        if not isinstance(node, list):
-            return super().visit(node)
 
-        for elem in node:
-            if isinstance(elem, ast.Break):
-                self.mutations[self._conditional_block].clear()
-            self.visit(elem)
-        return node
+def _is_abc_class(value: ast.expr | ast.keyword, name: str = "ABC") -> bool:
+    # class foo(metaclass = [abc.]ABCMeta)
+    if isinstance(value, ast.keyword):
+        return value.arg == "metaclass" and _is_abc_class(value.value, "ABCMeta")
+    # class foo(ABC)
+    # class foo(abc.ABC)
+    return (isinstance(value, ast.Name) and value.id == name) or (
+        isinstance(value, ast.Attribute)
+        and value.attr == name
+        and isinstance(value.value, ast.Name)
+        and value.value.id == "abc"
+    )
 
 
-@attr.s
-class NameFinder(ast.NodeVisitor):
-    """Finds a name within a tree of nodes.
+def _is_abstract_decorator(expr: ast.expr) -> bool:
+    return (isinstance(expr, ast.Name) and expr.id[:8] == "abstract") or (
+        isinstance(expr, ast.Attribute) and expr.attr[:8] == "abstract"
+    )
 
-    After `.visit(node)` is called, `found` is a dict with all name nodes inside,
-    key is name string, value is the node (useful for location purposes).
-    """
 
-    names: Dict[str, List[ast.Name]] = attr.ib(factory=dict)
+def _is_overload(expr: ast.expr) -> bool:
+    return (isinstance(expr, ast.Name) and expr.id == "overload") or (
+        isinstance(expr, ast.Attribute) and expr.attr == "overload"
+    )
+
+
+def _is_empty_body(body: list[ast.stmt]) -> bool:
+    # Function body consist solely of `pass`, `...`, and/or (doc)string literals
+    return all(
+        isinstance(stmt, ast.Pass)
+        or (
+            isinstance(stmt, ast.Expr)
+            and isinstance(stmt.value, ast.Constant)
+            and (stmt.value.value is Ellipsis or isinstance(stmt.value.value, str))
+        )
+        for stmt in body
+    )
+
+
+def _is_exception_name(name: str) -> bool:
+    return name.endswith(("Exception", "Error", "Warning", "ExceptionGroup"))
+
+
+def _find_super_init_call(init: ast.FunctionDef) -> ast.Call | None:
+    # We only check top-level nodes instead of doing an `ast.walk`.
+    # Small risk of false alarm if the user does something weird.
+    for b in init.body:
+        if (
+            isinstance(b, ast.Expr)
+            and isinstance(b.value, ast.Call)
+            and isinstance(b.value.func, ast.Attribute)
+            and isinstance(b.value.func.value, ast.Call)
+            and isinstance(b.value.func.value.func, ast.Name)
+            and b.value.func.value.func.id == "super"
+            and b.value.func.attr == "__init__"
+        ):
+            return b.value
+    return None
+
+
+class FunctionSummary:
+    """What B019, B037, B901 and B906 need to know about a `def`."""
+
+    __slots__ = (
+        "node",
+        "decorator_names",
+        "in_class",
+        "is_class_init",
+        "has_yield",
+        "value_returns",
+        "exits",
+        "visit_calls",
+    )
 
-    def visit_Name(  # noqa: B906 # names don't contain other names
-        self, node: ast.Name
+    def __init__(
+        self,
+        node: ast.FunctionDef | ast.AsyncFunctionDef,
+        decorator_names: list[str],
+        in_class: bool,
+        is_class_init: bool,
     ) -> None:
-        self.names.setdefault(node.id, []).append(node)
+        self.node = node
+        # the dotted names of the decorators, in order
+        self.decorator_names = decorator_names
+        # whether the function is defined directly in a class body
+        self.in_class = in_class
+        # whether the function is the `__init__` method of a class
+        self.is_class_init = is_class_init
+        # whether a `yield` statement is in the body, outside nested functions
+        self.has_yield = False
+        # `return` statements with a value, outside nested functions
+        self.value_returns: list[ast.Return] = []
+        # returns and yields of the function itself, outside any nested scope
+        self.exits: list[ast.Return | ast.Yield | ast.YieldFrom] = []
+        # calls of a name containing "visit", including in nested functions;
+        # only collected for `visit_*` methods
+        self.visit_calls: list[ast.Call] = []
+
+
+def summarize_function(
+    node: ast.FunctionDef | ast.AsyncFunctionDef, in_class: bool
+) -> FunctionSummary:
+    """Summarizes a function in a single walk over its body."""
+    summary = FunctionSummary(
+        node,
+        decorator_names=[
+            ".".join(compose_call_path(decorator)) for decorator in node.decorator_list
+        ],
+        in_class=in_class,
+        is_class_init=(
+            in_class and isinstance(node, ast.FunctionDef) and node.name == "__init__"
+        ),
+    )
+    want_visit_calls = node.name.startswith("visit_")
+    # (node, parent, in a nested function, in a nested scope), in preorder
+    stack: list[tuple[ast.AST, ast.AST, bool, bool]] = [
+        (child, node, False, False) for child in reversed(node.body)
+    ]
+    while stack:
+        x, parent, in_function, in_scope = stack.pop()
+        if isinstance(x, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if not want_visit_calls:
+                continue
+            in_function = True
+        elif isinstance(x, ast.Call):
+            if want_visit_calls and _is_visit_call(x):
+                summary.visit_calls.append(x)
+        elif isinstance(x, (ast.Return, ast.Yield, ast.YieldFrom)):
+            if not in_scope:
+                summary.exits.append(x)
+            if not in_function:
+                _add_function_exit(summary, x, parent)
+        if isinstance(x, CONTEXTFUL_NODES):
+            in_scope = True
+        stack.extend(
+            (child, x, in_function, in_scope)
+            for child in reversed(list(ast.iter_child_nodes(x)))
+        )
+    return summary
 
-    def visit(self, node):
-        """Like super-visit but supports iteration over lists."""
-        if not isinstance(node, list):
-            return super().visit(node)
 
-        for elem in node:
-            super().visit(elem)
-        return node
+def _add_function_exit(
+    summary: FunctionSummary,
+    node: ast.Return | ast.Yield | ast.YieldFrom,
+    parent: ast.AST,
+) -> None:
+    if isinstance(node, ast.Return):
+        if node.value is not None:
+            summary.value_returns.append(node)
+    # Only consider yield when it is part of an Expr statement.
+    elif isinstance(parent, ast.Expr):
+        summary.has_yield = True
 
 
-@attr.s
-class NamedExprFinder(ast.NodeVisitor):
-    """Finds names defined through an ast.NamedExpr.
+def _is_visit_call(node: ast.Call) -> bool:
+    return (isinstance(node.func, ast.Attribute) and "visit" in node.func.attr) or (
+        isinstance(node.func, ast.Name) and "visit" in node.func.id
+    )
+
+
+class LoopSummary(NamedTuple):
+    """What B007, B020 and B909 need to know about a `for` loop."""
 
-    After `.visit(node)` is called, `found` is a dict with all name nodes inside,
-    key is name string, value is the node (useful for location purposes).
+    # the first occurrence of each name in the target
+    targets: dict[str, ast.Name]
+    # target names that aren't used in the body
+    unused_targets: list[str]
+    # target names that the iterable refers to
+    iterable_targets: list[str]
+    # statements and calls that mutate the iterable
+    mutations: list[ast.stmt | ast.expr]
+
+
+def summarize_loop(
+    node: ast.For,
+    index_of: Callable[[ast.AST], AstIndex],
+    symbols_of: Callable[[ast.AST], SymbolTable],
+) -> LoopSummary:
+    """Summarizes a `for` loop.
+
+    The names in the loop are looked up in the index of the outermost loop
+    around it, which the loops nested in it share, so nested loops don't walk
+    their bodies again.  A symbol table is only asked for when a target name
+    shows up in the iterable, which B020 has to resolve.
+    """
+    index = index_of(node)
+    targets: dict[str, ast.Name] = {}
+    for target in index.walk_type(node.target, ast.Name):
+        targets.setdefault(target.id, target)
+    unused_targets = [
+        name
+        for name in sorted(targets)
+        if not name.startswith("_") and not index.has_name(node.body, name)
+    ]
+    iterable_targets = []
+    candidates = [name for name in sorted(targets) if index.has_name([node.iter], name)]
+    if candidates:
+        # Names local to a comprehension or lambda in the iterable don't count.
+        symbols = symbols_of(node)
+        for name in candidates:
+            scope = symbols.uses_in(node.target, name)[0].scope
+            if any(
+                symbols.resolves_to(use, scope)
+                for use in symbols.name_uses_in(node.iter, name)
+            ):
+                iterable_targets.append(name)
+    mutations: list[ast.stmt | ast.expr] = []
+    iterable = _to_name_str(node.iter)
+    if (
+        isinstance(node.iter, (ast.Name, ast.Attribute))
+        and iterable is not None
+        and index.has_name(node.body, iterable.partition(".")[0])
+    ):
+        mutations = _b909_mutations(index, node)
+    return LoopSummary(targets, unused_targets, iterable_targets, mutations)
+
+
+def b031_group_reuses(
+    loop_node: ast.For, symbols_of: Callable[[ast.AST], SymbolTable]
+) -> list[ast.Name]:
+    """Check that `itertools.groupby` isn't iterated over more than once.
+
+    We emit a warning when the generator returned by `groupby()` is used
+    more than once inside a loop body or when it's used in a nested loop.
     """
+    # for <loop_node.target> in <loop_node.iter>: ...
+    node = loop_node.iter
+    if not isinstance(node, ast.Call) or not (
+        (isinstance(node.func, ast.Name) and node.func.id in ("groupby",))
+        or (
+            isinstance(node.func, ast.Attribute)
+            and node.func.attr == "groupby"
+            and isinstance(node.func.value, ast.Name)
+            and node.func.value.id == "itertools"
+        )
+    ):
+        return []
+
+    # We have an invocation of groupby which is a simple unpacking
+    if isinstance(loop_node.target, ast.Tuple) and isinstance(
+        loop_node.target.elts[1], ast.Name
+    ):
+        group_name = loop_node.target.elts[1].id
+    else:
+        # Ignore any `groupby()` invocation that isn't unpacked
+        return []
+
+    symbols = symbols_of(loop_node)
+    reuses = []
+    # Handled nested loops
+    for loop in symbols.loops_in(loop_node.body):
+        if isinstance(loop.node, ast.For):
+            for use in symbols.uses_in(loop.node.body, group_name):
+                if use.kind == "load":
+                    reuses.append(use.node)
+
+    # Handle multiple uses. Count only loads: a store-context reference, such
+    # as an annotation target (`group: T`), is not a read of the generator
+    # (#465).
+    loads = [
+        use.node
+        for use in symbols.uses_in(loop_node.body, group_name)
+        if use.kind == "load"
+    ]
+    return reuses + loads[1:]
+
+
+# https://docs.python.org/3/library/stdtypes.html#mutable-sequence-types
+B909_MUTATING_FUNCTIONS = (
+    "append",
+    "sort",
+    "reverse",
+    "remove",
+    "clear",
+    "extend",
+    "insert",
+    "pop",
+    "popitem",
+    "setdefault",
+    "update",
+    "intersection_update",
+    "difference_update",
+    "symmetric_difference_update",
+    "add",
+    "discard",
+)
 
-    names: Dict[str, List[ast.Name]] = attr.ib(factory=dict)
 
-    def visit_NamedExpr(self, node: ast.NamedExpr) -> None:
-        self.names.setdefault(node.target.id, []).append(node.target)
-        self.generic_visit(node)
+def _b909_mutations(index: AstIndex, node: ast.For) -> list[ast.stmt | ast.expr]:
+    """Finds the mutations of the iterable in the body of a loop.
 
-    def visit(self, node):
-        """Like super-visit but supports iteration over lists."""
-        if not isinstance(node, list):
-            return super().visit(node)
+    Mutations in the `else` branch or the condition of an `if` are ignored, and
+    so are mutations followed by a `break` in the same block, i.e. a `break`
+    directly in the loop body or in the body of the same `if`, with no other
+    `if` in between.
+    """
+    if not isinstance(node.iter, (ast.Name, ast.Attribute)):
+        return []
+    name = _to_name_str(node.iter)
+    key = _to_name_str(node.target)
+    if name is None or key is None:
+        return []
+
+    # Every mutation refers to the iterable by name, so start from those names.
+    base = name.partition(".")[0]
+    loop_position = index.position[node]
+    mutations = []
+    for name_node in index.walk_type(node.body, ast.Name):
+        if name_node.id != base:
+            continue
+        for mutation in _b909_mutations_of(index, name_node, name, key):
+            block = _b909_block_of(index, mutation, loop_position)
+            if block is not None and not _b909_is_undone_by_break(
+                index, mutation, block, loop_position
+            ):
+                mutations.append(mutation)
+    mutations.sort(key=index.position.__getitem__)
+    return mutations
+
+
+def _b909_mutations_of(
+    index: AstIndex, name_node: ast.Name, name: str, key: str
+) -> list[ast.stmt | ast.expr]:
+    """Returns the mutations of `name` by the expression starting at `name_node`,
+    e.g. `name.append(...)` or `name[...] = ...`."""
+    mutations: list[ast.stmt | ast.expr] = []
+    child: ast.AST = name_node
+    parent = index.parent_of(child)
+    while (
+        (isinstance(parent, (ast.Attribute, ast.Subscript)) and parent.value is child)
+        or isinstance(parent, ast.Call)
+        and parent.func is child
+    ):
+        if (
+            isinstance(parent, ast.Call)
+            and isinstance(child, ast.Attribute)
+            and child.attr in B909_MUTATING_FUNCTIONS
+            and _to_name_str(child.value) == name
+        ):
+            mutations.append(parent)
+        child, parent = parent, index.parent_of(parent)
+
+    if isinstance(parent, ast.Assign):
+        if (
+            child in parent.targets
+            and isinstance(child, ast.Subscript)
+            and _to_name_str(child.value) == name
+            and _to_name_str(child.slice) != key
+        ):
+            mutations.append(parent)
+    elif isinstance(parent, ast.AugAssign):
+        if parent.target is child and _to_name_str(child) == name:  # type: ignore[arg-type]
+            mutations.append(parent)
+    elif isinstance(parent, ast.Delete):
+        if (
+            child in parent.targets
+            and isinstance(child, ast.Subscript)
+            and _to_name_str(child.value) == name
+        ):
+            mutations.append(parent)
+    return mutations
+
+
+def _b909_block_of(
+    index: AstIndex, node: ast.AST, loop_position: int
+) -> tuple[ast.For | ast.If, ast.AST] | None:
+    """Returns the innermost `if` around `node` inside the loop (or the loop) and
+    the statement of its body containing `node`.
+
+    Returns None if `node` is in the condition or `else` branch of an `if`, or
+    in the target of a `del` statement, which B909 doesn't look into.
+    """
+    block = None
+    i = index.position[node]
+    while i != loop_position:
+        parent_position = index.parent[i]
+        parent = index.nodes[parent_position]
+        child = index.nodes[i]
+        if isinstance(parent, ast.If) and (
+            child is parent.test or child in parent.orelse
+        ):
+            return None
+        if (
+            isinstance(parent, ast.Delete)
+            and child in parent.targets
+            and isinstance(child, (ast.Subscript, ast.Attribute, ast.Name))
+        ):
+            return None
+        if block is None and (
+            parent_position == loop_position or isinstance(parent, ast.If)
+        ):
+            block = (parent, child)
+        i = parent_position
+    return block  # type: ignore[return-value]
+
+
+def _b909_is_undone_by_break(
+    index: AstIndex,
+    mutation: ast.AST,
+    block: tuple[ast.For | ast.If, ast.AST],
+    loop_position: int,
+) -> bool:
+    body = block[0].body
+    following = body[body.index(block[1]) + 1 :]  # type: ignore[arg-type]
+    brk = next((stmt for stmt in following if isinstance(stmt, ast.Break)), None)
+    if brk is None:
+        return False
+
+    # an `if` between the mutation and the `break` starts a new block
+    if_code = node_type_code(ast.If)
+    i = index.position[mutation]
+    stop = index.position[brk]
+    while True:
+        try:
+            i = index.type_code.index(if_code, i + 1, stop)
+        except ValueError:
+            return True
+        if _b909_block_of(index, index.nodes[i], loop_position) is not None:
+            return False
+
+
+def b023_late_bindings(symbols: SymbolTable) -> dict[ast.AST, list[ast.Name]]:
+    """Finds the loop variables used in functions defined inside loops, for B023.
+
+    A function's loads of names it doesn't bind are handed to the innermost loop
+    around the function, and loops hand on the loads of names they don't
+    reassign to the loop around them.  Returns the loads each loop reassigns.
+
+    Functions passed to `filter()`, `map()`, `reduce()`, as `key=`, or returned
+    directly are considered to be called right away, so they are exempt.
+    """
+    pending = _b023_function_loads(symbols)
+    reassigned = _b023_reassigned_names(symbols)
+    late_bindings: dict[ast.AST, list[ast.Name]] = {}
+    for loop in reversed(symbols.loops):
+        for name in pending.pop(loop, ()):
+            if name.id in reassigned[loop]:
+                late_bindings.setdefault(loop.node, []).append(name)
+            elif loop.parent is not None:
+                pending[loop.parent].append(name)
+    for names in late_bindings.values():
+        names.sort(key=lambda n: (n.id, n.lineno, n.col_offset))
+    return late_bindings
+
+
+def _b023_reassigned_names(symbols: SymbolTable) -> dict[Loop, set[str]]:
+    # For comprehensions, the iteration variables are implicitly reassigned.
+    # Other loops reassign the names assigned anywhere inside of them, except in
+    # nested functions.
+    reassigned: dict[Loop, set[str]] = {}
+    for loop in symbols.loops:
+        names = reassigned[loop] = set()
+        if isinstance(loop.node, COMPREHENSION_NODES):
+            for generator in loop.node.generators:
+                if isinstance(generator.target, ast.Name):
+                    names.add(generator.target.id)
+                elif isinstance(generator.target, ast.Tuple):
+                    names.update(_get_names_from_tuple(generator.target))
+    for use in symbols.uses:
+        if use.kind in ("store", "augstore") and isinstance(
+            use.binder, B023_ASSIGNMENTS
+        ):
+            current = use.loop
+            while current is not None and current.function is use.function:
+                if not isinstance(current.node, COMPREHENSION_NODES):
+                    reassigned[current].add(use.name)
+                current = current.parent
+    return reassigned
+
+
+def _b023_function_loads(symbols: SymbolTable) -> dict[Loop, list[ast.Name]]:
+    """Returns the loads of names that functions don't bind, by the innermost
+    loop around the function."""
+    # Resolve the loads of functions, innermost first.  Loads of names that a
+    # function binds as arguments, or in a function that is called right away,
+    # are resolved by the function around it.  Names stored in a function are
+    # stored in every function around it too.
+    pending: dict[Loop, list[ast.Name]] = defaultdict(list)
+    loads: dict[Scope, list[NameUse]] = {}
+    stores: dict[Scope, set[str]] = {}
+    for scope in reversed(list(symbols.scopes.values())):
+        scope_loads = [use for use in scope.uses if use.kind == "load"]
+        scope_stores = {
+            use.name
+            for use in scope.uses
+            if use.kind in ("store", "augstore", "walrus")
+        }
+        for child in scope.children:
+            scope_loads.extend(loads.pop(child))
+            scope_stores |= stores.pop(child)
+        stores[scope] = scope_stores
+        if not isinstance(scope.node, FUNCTION_NODES):
+            loads[scope] = scope_loads
+            continue
 
-        for elem in node:
-            super().visit(elem)
-        return node
+        argnames = {
+            arg.arg for arg in symbols.index.walk_type(scope.node.args, ast.arg)
+        }
+        called = _b023_is_called_right_away(symbols.index, scope.node)
+        loads[scope] = []
+        for use in scope_loads:
+            if use.name in scope_stores:
+                continue
+            if use.name in argnames or called:
+                loads[scope].append(use)
+            elif scope.loop is not None:
+                pending[scope.loop].append(use.node)
+    return pending
+
+
+def _b023_is_called_right_away(index: AstIndex, node: ast.AST) -> bool:
+    parent = index.parent_of(node)
+    # mark `return lambda: x` as safe
+    # does not (currently) check inner lambdas in a returned expression
+    # e.g. `return (lambda: x, )
+    if isinstance(parent, ast.Return):
+        return True
+    # check for key=
+    if isinstance(parent, ast.keyword):
+        return parent.arg == "key" and isinstance(index.parent_of(parent), ast.Call)
+    # check for filter&reduce
+    return (
+        isinstance(parent, ast.Call)
+        and node in parent.args
+        and (
+            (
+                isinstance(parent.func, ast.Name)
+                and parent.func.id in ("filter", "reduce", "map")
+            )
+            or (
+                isinstance(parent.func, ast.Attribute)
+                and parent.func.attr == "reduce"
+                and isinstance(parent.func.value, ast.Name)
+                and parent.func.value.id == "functools"
+            )
+        )
+    )
 
 
-class FunctionDefDefaultsVisitor(ast.NodeVisitor):
+class FunctionDefDefaultsVisitor(StackNodeVisitor):
     """Used by B006, B008, and B039. B039 is essentially B006+B008 but for ContextVar."""
 
     def __init__(
@@ -2201,35 +3683,20 @@ class FunctionDefDefaultsVisitor(ast.NodeVisitor):
 
     def visit(self, node) -> None:
         """Like super-visit but supports iteration over lists."""
-        self.arg_depth += 1
+        self.schedule(self.enter_arg)
         if isinstance(node, list):
             for elem in node:
                 if elem is not None:
                     super().visit(elem)
         else:
             super().visit(node)
-        self.arg_depth -= 1
-
-
-class B020NameFinder(NameFinder):
-    """Ignore names defined within the local scope of a comprehension."""
-
-    def visit_GeneratorExp(self, node) -> None:
-        self.visit(node.generators)
-
-    def visit_ListComp(self, node) -> None:
-        self.visit(node.generators)
+        self.schedule(self.leave_arg)
 
-    def visit_DictComp(self, node) -> None:
-        self.visit(node.generators)
-
-    def visit_comprehension(self, node) -> None:
-        self.visit(node.iter)
+    def enter_arg(self) -> None:
+        self.arg_depth += 1
 
-    def visit_Lambda(self, node) -> None:
-        self.visit(node.body)
-        for lambda_arg in node.args.args:
-            self.names.pop(lambda_arg.arg, None)
+    def leave_arg(self) -> None:
+        self.arg_depth -= 1
 
 
 B005_METHODS = {"lstrip", "rstrip", "strip"}
@@ -2290,20 +3757,77 @@ B902_CLS = ["cls", "klass"]  # ditto.
 B902_METACLS = ["metacls", "metaclass", "typ", "mcs"]  # ditto.
 
 
-class error(NamedTuple):
-    lineno: int
-    col: int
-    message: str
-    type: type
-    vars: tuple[object, ...]
+class error:
+    """A reported error.
+
+    Files can have thousands of errors, so the record is kept small: it refers
+    to its `Error` by index, and the message is only formatted by
+    `format_message()` when something asks for it.
+    """
+
+    __slots__ = ("lineno", "col", "error_index", "vars")
+
+    def __init__(
+        self, lineno: int, col: int, error_index: int, vars: tuple[object, ...] = ()
+    ) -> None:
+        self.lineno = lineno
+        self.col = col
+        self.error_index = error_index
+        self.vars = vars
+
+    @property
+    def code(self) -> str:
+        return _errors[self.error_index].code
+
+    @property
+    def message(self) -> str:
+        """The message, with `{}` placeholders for `vars`."""
+        return _errors[self.error_index].message
+
+    @property
+    def type(self) -> type:
+        return BugBearChecker
+
+    def format_message(self) -> str:
+        template = _errors[self.error_index]
+        if not template.has_placeholders:
+            return template.message
+        return template.message.format(*self.vars)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, error):
+            return NotImplemented
+        return (self.lineno, self.col, self.error_index, self.vars) == (
+            other.lineno,
+            other.col,
+            other.error_index,
+            other.vars,
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.lineno, self.col, self.error_index, self.vars))
+
+    def __repr__(self) -> str:
+        return (
+            f"error(lineno={self.lineno!r}, col={self.col!r}, code={self.code!r},"
+            f" vars={self.vars!r})"
+        )
+
+
+# every `Error`, in the order they were created; `error.error_index` refers to it
+_errors: list[Error] = []
 
 
 class Error:
     def __init__(self, message: str):
         self.message = message
+        self.code = message[:4]
+        self.has_placeholders = "{" in message
+        self.index = len(_errors)
+        _errors.append(self)
 
     def __call__(self, lineno: int, col: int, vars: tuple[object, ...] = ()) -> error:
-        return error(lineno, col, self.message, BugBearChecker, vars=vars)
+        return error(lineno, col, self.index, vars)
 
 
 error_codes = {
@@ -2629,6 +4153,11 @@ error_codes = {
     "B950": Error(message="B950 line too long ({} > {} characters)"),
 }
 
+# Checks for features that do not exist on older interpreters would flag valid code.
+CODES_MIN_PYTHON_VERSION = {
+    # `map(strict=...)` was added in Python 3.14
+    "B912": (3, 14),
+}
 
 disabled_by_default = [
     "B901",
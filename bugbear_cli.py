@@ -0,0 +1,1209 @@
+"""Runs the flake8-bugbear checks without flake8.
+
+This module has what only tools that run Bugbear without flake8 need: checking
+many files at once or from asyncio code, checking only the changed definitions
+of a file again, a server, a language server, and `main()`, which the `bugbear`
+command in `bugbear_client` runs.  The flake8 plugin only imports the checks in
+`bugbear`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import os
+import re
+import sys
+import threading
+import time
+import tokenize
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import suppress
+from fnmatch import fnmatch
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    BinaryIO,
+    Callable,
+    ClassVar,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TypeVar,
+)
+
+import attr  # type: ignore
+from flake8.defaults import EXCLUDE, NOQA_FILE, NOQA_INLINE_REGEXP
+from flake8.exceptions import PluginExecutionFailed
+from flake8.utils import parse_comma_separated_list, stdin_get_value
+
+import bugbear_client
+from bugbear import (
+    LOG,
+    B902_default_decorators,
+    BugBearChecker,
+    SourceLines,
+    __version__,
+    b005_import_names,
+    disabled_by_default,
+    error,
+    read_source,
+    source_text,
+)
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+
+class FileErrors(NamedTuple):
+    """The result of checking a file with `check_paths()` or `check_sources()`."""
+
+    filename: str
+    errors: list[error]
+    # "E902 ..." if the file couldn't be read or "E999 ..." if it couldn't be
+    # parsed, as `(lineno, col, message)`; no checks ran then
+    failure: tuple[int, int, str] | None = None
+
+
+# What a worker sends back for a file: the filename, `(lineno, col,
+# error_index, vars)` for each error, and the failure.
+_WireResult = tuple[
+    str, list[tuple[int, int, int, tuple[object, ...]]], Optional[tuple[int, int, str]]
+]
+
+
+class _Worker:
+    """Checks files with the same options, in this process or a pool worker."""
+
+    # the worker of a pool process, set up by `_init_worker()`
+    current: ClassVar[_Worker | None] = None
+
+    def __init__(self, options: Any, noqa: bool = False) -> None:
+        self.options = options
+        # whether to leave out the errors silenced with `# noqa` comments
+        self.noqa = noqa
+        self.max_line_length = getattr(options, "max_line_length", 79)
+        # The codes depend on the options only, so they're decided once.
+        self.enabled_codes = BugBearChecker(options=options).enabled_codes()
+
+    def check(self, filename: str, source: str | None) -> _WireResult:
+        checker = BugBearChecker(
+            filename=filename,
+            options=self.options,
+            max_line_length=self.max_line_length,
+        )
+        checker._enabled_codes = self.enabled_codes
+        if source is not None:
+            if not source:
+                # `load_file()` would take no lines for missing ones and read
+                # the file, and there's nothing to check anyway
+                return filename, [], None
+            checker.lines = SourceLines(source)
+        try:
+            errors = _run_checks(checker, checker.collect_errors)
+        except FILE_FAILURES as exc:
+            return filename, [], _failure(exc)
+        if self.noqa and errors:
+            # the lines the errors were found in, which were read already
+            errors = _without_noqa(checker.lines, errors)
+        return (
+            filename,
+            [(e.lineno, e.col, e.error_index, e.vars) for e in errors],
+            None,
+        )
+
+
+# the exceptions of reading or parsing a file that fail the check of the file,
+# rather than of all of them; a RecursionError or MemoryError comes from code
+# too deeply nested to parse.  An exception from a check is raised as a
+# `PluginExecutionFailed` instead, like flake8 does.
+FILE_FAILURES = (OSError, SyntaxError, ValueError, RecursionError, MemoryError)
+
+
+def _run_checks(checker: BugBearChecker, run: Callable[[], list[error]]) -> list[error]:
+    """Returns the errors `run` finds with `checker`, and raises an exception of
+    a check as a `PluginExecutionFailed`.
+
+    The exceptions in `FILE_FAILURES` of reading or parsing the file, before
+    `checker.tree` is set, are raised as they are.
+    """
+    try:
+        return run()
+    except PluginExecutionFailed:
+        raise
+    except Exception as exc:
+        if checker.tree is None and isinstance(exc, FILE_FAILURES):
+            raise
+        raise PluginExecutionFailed(checker.filename, checker.name, exc) from exc
+
+
+def _failure(exc: Exception) -> tuple[int, int, str]:
+    """Returns the `FileErrors.failure` for a file that couldn't be read or
+    parsed."""
+    if isinstance(exc, (OSError, UnicodeError)):
+        return 0, 1, f"E902 {type(exc).__name__}: {exc}"
+    if isinstance(exc, SyntaxError):
+        return (
+            exc.lineno or 1,
+            exc.offset or 1,
+            f"E999 {type(exc).__name__}: {exc.msg}",
+        )
+    # e.g. source code containing null bytes, or nested too deeply
+    return 1, 1, f"E999 {type(exc).__name__}: {exc}"
+
+
+def _init_worker(options: Any, noqa: bool) -> None:
+    _Worker.current = _Worker(options, noqa)
+
+
+def _check_with_options(options: Any, filename: str, source: str) -> _WireResult:
+    """Checks a file in an executor's thread or process, with the worker of the
+    last options it was called with if they're the same."""
+    worker = _Worker.current
+    if worker is None or worker.options != options:
+        worker = _Worker.current = _Worker(options)
+    return worker.check(filename, source)
+
+
+def _check_in_worker(task: tuple[str, str | None]) -> _WireResult:
+    assert _Worker.current is not None
+    return _Worker.current.check(*task)
+
+
+def _to_file_errors(result: _WireResult) -> FileErrors:
+    filename, errors, failure = result
+    return FileErrors(
+        filename,
+        [error(lineno, col, i, vars) for lineno, col, i, vars in errors],
+        failure,
+    )
+
+
+def check_sources(
+    sources: Iterable[tuple[str, str]],
+    options: Any = None,
+    *,
+    jobs: int | None = 1,
+    chunksize: int = 8,
+    ordered: bool = True,
+    progress: Callable[[int, int], None] | None = None,
+    mp_context: Any = None,
+    noqa: bool = False,
+) -> Iterator[FileErrors]:
+    """Checks `(filename, source text)` pairs and yields their errors.
+
+    `options` is what flake8 would pass to the plugin, e.g. an
+    `argparse.Namespace` with `select`, `ignore`, `extend_select`,
+    `extend_immutable_calls`, `classmethod_decorators` and `max_line_length`
+    attributes; any of them can be left out.
+
+    With `jobs` other than 1, the files are checked in a pool of that many
+    processes (`None` for one per CPU), created from `mp_context` if given.
+    The options are sent to each process once, and the files in chunks of
+    `chunksize`.  Results are yielded as they come in: in the order of
+    `sources` if `ordered`, or as soon as each is done otherwise.  `progress`
+    is called with the number of files done and the total after each file.
+
+    With `noqa`, the errors silenced with `# noqa` comments are left out, as
+    flake8 would.
+    """
+    return _check_tasks(
+        [(filename, source) for filename, source in sources],
+        options,
+        jobs,
+        chunksize,
+        ordered,
+        progress,
+        mp_context,
+        noqa,
+    )
+
+
+def check_paths(
+    paths: Iterable[str | os.PathLike[str]],
+    options: Any = None,
+    *,
+    jobs: int | None = 1,
+    chunksize: int = 8,
+    ordered: bool = True,
+    progress: Callable[[int, int], None] | None = None,
+    mp_context: Any = None,
+    noqa: bool = False,
+) -> Iterator[FileErrors]:
+    """Checks files and yields their errors, see `check_sources()`.
+
+    Each file is read by the process that checks it.
+    """
+    return _check_tasks(
+        [(os.fspath(path), None) for path in paths],
+        options,
+        jobs,
+        chunksize,
+        ordered,
+        progress,
+        mp_context,
+        noqa,
+    )
+
+
+def _check_tasks(
+    tasks: list[tuple[str, str | None]],
+    options: Any,
+    jobs: int | None,
+    chunksize: int,
+    ordered: bool,
+    progress: Callable[[int, int], None] | None,
+    mp_context: Any,
+    noqa: bool,
+) -> Iterator[FileErrors]:
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(tasks))
+    if jobs <= 1:
+        worker = _Worker(options, noqa)
+        results: Iterable[_WireResult] = (worker.check(*task) for task in tasks)
+        yield from _report_progress(results, len(tasks), progress)
+        return
+
+    if mp_context is None:
+        # only imported when there's a pool to start
+        import multiprocessing
+
+        mp_context = multiprocessing.get_context()
+    with mp_context.Pool(
+        jobs, initializer=_init_worker, initargs=(options, noqa)
+    ) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        yield from _report_progress(
+            imap(_check_in_worker, tasks, chunksize), len(tasks), progress
+        )
+
+
+def _report_progress(
+    results: Iterable[_WireResult],
+    total: int,
+    progress: Callable[[int, int], None] | None,
+) -> Iterator[FileErrors]:
+    for done, result in enumerate(results, start=1):
+        yield _to_file_errors(result)
+        if progress is not None:
+            progress(done, total)
+
+
+async def check_source(
+    source: str,
+    filename: str = "stdin",
+    options: Any = None,
+    *,
+    executor: Executor | None = None,
+) -> FileErrors:
+    """Checks source text in `executor` and returns its errors, without
+    blocking the event loop.
+
+    `options` are as for `check_sources()`.  `executor` is any
+    `concurrent.futures.Executor`, e.g. a thread, process or (on Python 3.14+)
+    interpreter pool, or None for the event loop's default executor.  If
+    cancelled, a check that hasn't started won't be, but one that has runs to
+    the end.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        executor, _check_with_options, options, filename, source
+    )
+    return _to_file_errors(result)
+
+
+async def check_many(
+    sources: Iterable[tuple[str, str]] | AsyncIterable[tuple[str, str]],
+    options: Any = None,
+    *,
+    executor: Executor | None = None,
+    limit: int = 8,
+    ordered: bool = True,
+) -> AsyncIterator[FileErrors]:
+    """Checks `(filename, source text)` pairs in `executor` and yields their
+    errors, see `check_source()`.
+
+    At most `limit` files are checked or waiting for the executor at once, and
+    `sources` can be an async iterable that's read as they're done.  Results
+    are yielded in the order of `sources` if `ordered`, or as soon as each is
+    done otherwise.  The checks that haven't started are cancelled when the
+    iteration is, or when it's closed early.
+    """
+    import asyncio
+    from collections import deque
+
+    loop = asyncio.get_running_loop()
+    in_flight: deque[asyncio.Future[_WireResult]] = deque()
+
+    async def next_result() -> FileErrors:
+        if ordered or len(in_flight) == 1:
+            future = in_flight.popleft()
+        else:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            future = next(f for f in in_flight if f in done)
+            in_flight.remove(future)
+        return _to_file_errors(await future)
+
+    try:
+        async for filename, source in _async_iter(sources):
+            if len(in_flight) >= limit:
+                yield await next_result()
+            in_flight.append(
+                loop.run_in_executor(
+                    executor, _check_with_options, options, filename, source
+                )
+            )
+        while in_flight:
+            yield await next_result()
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+Item = TypeVar("Item")
+
+
+async def _async_iter(
+    items: Iterable[Item] | AsyncIterable[Item],
+) -> AsyncIterator[Item]:
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+DEFINITION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+class Definition(NamedTuple):
+    """What `IncrementalChecker` keeps of a checked top-level function or class."""
+
+    # `(lineno, col, error_index, vars)` for each error, with line numbers
+    # relative to the first line of the definition
+    errors: list[tuple[int, int, int, tuple[object, ...]]]
+    # The names the checks of the definition could have looked up in
+    # `_b005_imports`, and those of them that were in it.  The definition's
+    # results still hold if the same ones are in it now.
+    names: frozenset[str]
+    imported_names: frozenset[str]
+    # what the imports in the definition add to `_b005_imports`
+    imports: frozenset[str]
+
+
+def _names_and_imports(node: ast.AST) -> tuple[frozenset[str], frozenset[str]]:
+    """Returns the names used in `node` and what its imports add to
+    `_b005_imports`, see `Definition`."""
+    # `pytest.raises` is looked up by B017
+    names = {"pytest.raises"}
+    imports: set[str] = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name):
+            names.add(child.id)
+        elif isinstance(child, (ast.Import, ast.ImportFrom)):
+            imports.update(b005_import_names(child))
+    return frozenset(names), frozenset(imports)
+
+
+@attr.define
+class IncrementalChecker:
+    """Checks files again and again as they're edited, e.g. in an editor.
+
+    The results of the top-level functions and classes of each file are kept
+    by their source code, and only the ones whose code changed are checked
+    again.  Imports anywhere in a module are module-level state for B005 and
+    B017 (see `_b005_imports`), so a definition is also checked again if the
+    imports before it changed any of the names it uses.  The other top-level
+    statements, and the lines for B950, are checked every time.
+    """
+
+    options: Any = None
+    max_line_length: int = 79
+    _enabled_codes: frozenset[str] = attr.ib(init=False)
+    # the definitions of the last version of each file, by their source code
+    _definitions: dict[str, dict[str, Definition]] = attr.ib(factory=dict, init=False)
+
+    def __attrs_post_init__(self) -> None:
+        self._enabled_codes = BugBearChecker(options=self.options).enabled_codes()
+
+    def check(self, filename: str, source: str) -> list[error]:
+        """Returns the errors in `source`, the current text of `filename`,
+        sorted by position.
+
+        Raises `SyntaxError` if the source can't be parsed, and
+        `PluginExecutionFailed` if a check fails.
+        """
+        if "\r" in source:
+            source = source.replace("\r\n", "\n").replace("\r", "\n")
+        tree = ast.parse(source)
+        if not source:
+            self._definitions.pop(filename, None)
+            return []
+        lines = SourceLines(source)
+        known = self._definitions.get(filename, {})
+        definitions: dict[str, Definition] = {}
+        body: list[ast.stmt] = []
+        errors: list[error] = []
+        # the definitions that are checked again, by where they start and end
+        changed: list[tuple[int, int, Definition]] = []
+        imported: set[str] = set()
+        for node, start, end, text in self._top_level_statements(tree, lines):
+            if not isinstance(node, DEFINITION_NODES):
+                # checked every time
+                body.append(node)
+                if "import" in text:
+                    imported |= _names_and_imports(node)[1]
+                continue
+
+            definition = known.get(text)
+            if definition is not None and (
+                definition.imported_names == imported & definition.names
+            ):
+                errors.extend(
+                    error(start + lineno, col, error_index, vars)
+                    for lineno, col, error_index, vars in definition.errors
+                )
+                if definition.imports:
+                    # stands in for the imports of the definition
+                    aliases = [ast.alias(name) for name in sorted(definition.imports)]
+                    body.append(ast.copy_location(ast.Import(aliases), node))
+            else:
+                names, imports = _names_and_imports(node)
+                definition = Definition([], names, frozenset(imported & names), imports)
+                changed.append((start, end, definition))
+                body.append(node)
+            definitions[text] = definition
+            imported |= definition.imports
+
+        checker = BugBearChecker(
+            tree=ast.Module(body, type_ignores=[]),
+            filename=filename,
+            lines=lines,
+            options=self.options,
+            max_line_length=self.max_line_length,
+        )
+        checker._enabled_codes = self._enabled_codes
+        starts = [start for start, _, _ in changed]
+        for e in _run_checks(checker, checker.find_errors):
+            errors.append(e)
+            i = bisect_right(starts, e.lineno) - 1
+            # B950 is checked on all lines every time anyway
+            if i >= 0 and e.lineno <= changed[i][1] and e.code != "B950":
+                start, _, definition = changed[i]
+                definition.errors.append(
+                    (e.lineno - start, e.col, e.error_index, e.vars)
+                )
+        self._definitions[filename] = definitions
+        errors.sort(key=lambda e: (e.lineno, e.col))
+        return errors
+
+    @staticmethod
+    def _top_level_statements(
+        tree: ast.Module, lines: SourceLines
+    ) -> Iterator[tuple[ast.stmt, int, int, str]]:
+        """Yields the top-level statements with their first and last lines and
+        source code, including the decorators of definitions."""
+        text, offsets = lines.text, lines.offsets
+        for node in tree.body:
+            start = node.lineno
+            if isinstance(node, DEFINITION_NODES):
+                start = min([start] + [d.lineno for d in node.decorator_list])
+            end = node.end_lineno or node.lineno
+            yield node, start, end, text[offsets[start - 1] : offsets[end]]
+
+    def forget(self, filename: str) -> None:
+        """Drops what's kept of `filename`, e.g. when it's closed."""
+        self._definitions.pop(filename, None)
+
+
+# what both inline and file-level `noqa` comments contain
+NOQA_ANYWHERE = re.compile("noqa", re.IGNORECASE)
+
+
+def _noqa_line_mapping(lines: Sequence[str]) -> dict[int, str]:
+    """Maps line numbers to the text their `# noqa` comments are found in.
+
+    Like flake8, a comment at the end of a multi-line string also applies to
+    its other lines.
+    """
+    mapping = {}
+    first, last = len(lines) + 1, 0
+    try:
+        for token in tokenize.generate_tokens(iter(lines).__next__):
+            if token.type in (tokenize.ENDMARKER, tokenize.DEDENT):
+                continue
+            first = min(first, token.start[0])
+            last = max(last, token.end[0])
+            if token.type in (tokenize.NL, tokenize.NEWLINE):
+                text = "".join(lines[first - 1 : last])
+                mapping.update(dict.fromkeys(range(first, last + 1), text))
+                first, last = len(lines) + 1, 0
+    except (tokenize.TokenError, SyntaxError):
+        pass
+    return mapping
+
+
+def _without_noqa(lines: Sequence[str], errors: list[error]) -> list[error]:
+    """Drops the errors silenced with `# noqa` comments, as flake8 would."""
+    if NOQA_ANYWHERE.search(source_text(lines)) is None:
+        # most files have none, which is much faster to find than the lines
+        # the comments apply to
+        return errors
+    if any(NOQA_FILE.match(line) for line in lines):
+        return []
+    mapping = _noqa_line_mapping(lines)
+    kept = []
+    for e in errors:
+        text = mapping.get(e.lineno)
+        if text is None:
+            text = lines[e.lineno - 1] if e.lineno <= len(lines) else ""
+        match = NOQA_INLINE_REGEXP.search(text)
+        if match is None:
+            kept.append(e)
+        elif match.group("codes"):
+            codes = tuple(parse_comma_separated_list(match.group("codes").upper()))
+            if not e.code.startswith(codes):
+                kept.append(e)
+    return kept
+
+
+def _python_files(paths: Iterable[str]) -> Iterator[str]:
+    """Yields the given files, and the Python files in the given directories."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(
+                d for d in dirnames if not any(fnmatch(d, p) for p in EXCLUDE)
+            )
+            yield from (
+                os.path.join(dirpath, f) for f in sorted(filenames) if f.endswith(".py")
+            )
+
+
+def _jobs(value: str) -> int | None:
+    if value == "auto":
+        return None
+    jobs = int(value)
+    if jobs < 1:
+        raise ValueError(value)
+    return jobs
+
+
+# the options that `--config` reads from the `[flake8]` section
+CONFIG_OPTIONS = frozenset(
+    (
+        "select",
+        "ignore",
+        "extend-select",
+        "extend-ignore",
+        "extend-immutable-calls",
+        "classmethod-decorators",
+        "max-line-length",
+    )
+)
+
+
+def _config_args(filename: str) -> list[str]:
+    """Returns the options in the `[flake8]` section of a config file as
+    command line arguments."""
+    import configparser
+
+    config = configparser.RawConfigParser()
+    config.read(filename)
+    if not config.has_section("flake8"):
+        return []
+    args = []
+    for key, value in config.items("flake8"):
+        option = key.replace("_", "-")
+        if option in CONFIG_OPTIONS:
+            args.append(f"--{option}={value.strip()}")
+    return args
+
+
+def _parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="bugbear",
+        description="Runs the flake8-bugbear checks without flake8.",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        default=["."],
+        help="files and directories to check, or - for stdin",
+    )
+    for option in ("select", "ignore"):
+        parser.add_argument(
+            f"--{option}", type=parse_comma_separated_list, metavar="CODES"
+        )
+        parser.add_argument(
+            f"--extend-{option}",
+            type=parse_comma_separated_list,
+            default=[],
+            metavar="CODES",
+        )
+    parser.add_argument(
+        "--extend-immutable-calls",
+        type=parse_comma_separated_list,
+        default=[],
+        help="Skip B008 test for additional immutable calls.",
+    )
+    parser.add_argument(
+        "--classmethod-decorators",
+        type=parse_comma_separated_list,
+        default=B902_default_decorators,
+        help="List of method decorators that should be treated as classmethods"
+        " by B902",
+    )
+    parser.add_argument("--max-line-length", type=int, default=79)
+    parser.add_argument(
+        "--bugbear-cache-dir",
+        metavar="DIR",
+        help="directory to cache the results in, by file contents",
+    )
+    parser.add_argument(
+        "--bugbear-cache-max-size",
+        type=int,
+        default=64,
+        metavar="MIB",
+        help="size above which the least recently used results are dropped"
+        " from the cache",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=_jobs,
+        default=None,
+        help='number of processes to check files in, or "auto" for one per CPU',
+    )
+    parser.add_argument(
+        "--config",
+        metavar="FILE",
+        help="read the options above from the [flake8] section of FILE, unless"
+        " they're given as arguments",
+    )
+    server = parser.add_mutually_exclusive_group()
+    server.add_argument(
+        "--serve",
+        metavar="SOCKET",
+        help="keep running and check the files that clients of the Unix domain"
+        " socket SOCKET ask for",
+    )
+    server.add_argument(
+        "--connect",
+        metavar="SOCKET",
+        help="have the server on SOCKET check the files",
+    )
+    server.add_argument(
+        "--lsp",
+        action="store_true",
+        help="run a Language Server Protocol server on stdin and stdout",
+    )
+    args = parser.parse_args(argv)
+    if args.config:
+        args = parser.parse_args([*_config_args(args.config), *argv])
+    if "-" in args.paths and len(args.paths) > 1:
+        parser.error("- can't be combined with other paths")
+    # what flake8 would pass to the plugin with these options
+    args.extended_default_select = ["B"]
+    args.extended_default_ignore = disabled_by_default
+    return args
+
+
+def _mp_context() -> Any:
+    """A forkserver context whose processes start with the checks imported."""
+    import multiprocessing
+
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return None
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["bugbear_cli"])
+    return context
+
+
+@attr.define
+class Server:
+    """Checks files for the clients of `bugbear --serve`.
+
+    The options are the command line arguments `argv`, and they're read again
+    when the `--config` file changes.  The results are kept by a hash of the
+    source code, and `IncrementalChecker` only checks the changed definitions
+    of files it checked before again.
+    """
+
+    argv: list[str]
+    options: argparse.Namespace = attr.ib(init=False)
+    config_mtime: int | None = attr.ib(init=False)
+    checker: IncrementalChecker = attr.ib(init=False)
+    # the errors that aren't silenced with `# noqa`, by the hash of the source
+    results: OrderedDict[bytes, list[error]] = attr.ib(factory=OrderedDict, init=False)
+    # the files that the checker keeps definitions of, least recently used first
+    files: OrderedDict[str, None] = attr.ib(factory=OrderedDict, init=False)
+    lock: threading.Lock = attr.ib(factory=threading.Lock, init=False)
+
+    MAX_RESULTS: ClassVar[int] = 4096
+    MAX_FILES: ClassVar[int] = 256
+
+    def __attrs_post_init__(self) -> None:
+        self.load_options()
+
+    def load_options(self) -> None:
+        self.options = _parse_args(self.argv)
+        self.config_mtime = self.config_file_mtime()
+        self.checker = IncrementalChecker(self.options, self.options.max_line_length)
+        self.results.clear()
+        self.files.clear()
+
+    def config_file_mtime(self) -> int | None:
+        if not self.options.config:
+            return None
+        try:
+            return os.stat(self.options.config).st_mtime_ns
+        except OSError:
+            return None
+
+    def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Answers a request: either `{"paths": [...], "cwd": ...}` with the
+        paths of files and directories to check, or `{"filename": ...,
+        "source": ...}` with a file's text."""
+        with self.lock:
+            if self.config_file_mtime() != self.config_mtime:
+                try:
+                    self.load_options()
+                except (Exception, SystemExit) as exc:
+                    # keep going with the old options
+                    LOG.warning("Can't read %s: %s", self.options.config, exc)
+                    self.config_mtime = self.config_file_mtime()
+            if "source" in request:
+                filename = request.get("filename", "stdin")
+                return {"results": [self.check(filename, request["source"])]}
+            return {"results": self.check_paths(request["paths"], request.get("cwd"))}
+
+    def check_paths(self, paths: list[str], cwd: str | None) -> list[dict[str, Any]]:
+        """Checks the given files, and the Python files in the given
+        directories.  Relative paths are relative to `cwd`, and the results are
+        named like the paths."""
+        results = []
+        for path in paths:
+            top = os.path.join(cwd or "", path)
+            for filename in _python_files([top]):
+                result = self.check_path(filename)
+                result["filename"] = path + filename[len(top) :]
+                results.append(result)
+        return results
+
+    def check_path(self, filename: str) -> dict[str, Any]:
+        try:
+            source = read_source(filename)
+        except (OSError, UnicodeError) as exc:
+            return {"filename": filename, "errors": [], "failure": _failure(exc)}
+        return self.check(filename, source)
+
+    def check(self, filename: str, source: str) -> dict[str, Any]:
+        import hashlib
+
+        key = hashlib.blake2b(source.encode("utf-8", "surrogatepass")).digest()
+        errors = self.results.get(key)
+        if errors is not None:
+            self.results.move_to_end(key)
+        else:
+            try:
+                errors = self.checker.check(filename, source)
+            except FILE_FAILURES as exc:
+                return {"filename": filename, "errors": [], "failure": _failure(exc)}
+            self.files[filename] = None
+            self.files.move_to_end(filename)
+            if len(self.files) > self.MAX_FILES:
+                self.checker.forget(self.files.popitem(last=False)[0])
+            if errors:
+                errors = _without_noqa(SourceLines(source), errors)
+            self.results[key] = errors
+            if len(self.results) > self.MAX_RESULTS:
+                self.results.popitem(last=False)
+        return {
+            "filename": filename,
+            "errors": [(e.lineno, e.col + 1, e.format_message()) for e in errors],
+            "failure": None,
+        }
+
+
+def serve(path: str, argv: list[str]) -> None:
+    """Answers the requests of clients of the Unix domain socket at `path`.
+
+    Each request is a line with a JSON object, see `Server.handle()`, and is
+    answered with a line with a JSON object with the `"results"`: a
+    `{"filename": ..., "errors": [[lineno, col, message], ...], "failure":
+    ...}` object for each file, where `failure` is `[lineno, col, message]` if
+    the file couldn't be read or parsed.  `{"shutdown": true}` stops the
+    server.
+    """
+    import json
+    import socket
+    import socketserver
+
+    server = Server(argv)
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            for line in self.rfile:
+                response: dict[str, Any]
+                try:
+                    request = json.loads(line)
+                    if request.get("shutdown"):
+                        threading.Thread(target=unix_server.shutdown).start()
+                        response = {"results": []}
+                    else:
+                        response = server.handle(request)
+                except PluginExecutionFailed as exc:
+                    LOG.exception("Can't check %s", exc.filename)
+                    response = {"error": str(exc)}
+                except (ValueError, LookupError, TypeError, AttributeError) as exc:
+                    response = {"error": f"{type(exc).__name__}: {exc}"}
+                self.wfile.write(json.dumps(response).encode() + b"\n")
+                self.wfile.flush()
+
+    # a socket file of a server that's gone is in the way
+    with socket.socket(socket.AF_UNIX) as probe:
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        else:
+            raise OSError(f"a server is already running on {path}")
+    # only the user can connect, since the server reads any file they ask for
+    umask = os.umask(0o177)
+    try:
+        unix_server = socketserver.ThreadingUnixStreamServer(path, RequestHandler)
+    finally:
+        os.umask(umask)
+    unix_server.daemon_threads = True
+    try:
+        unix_server.serve_forever()
+    finally:
+        unix_server.server_close()
+        with suppress(OSError):
+            os.unlink(path)
+
+
+# the line ends of the Language Server Protocol
+LSP_LINE_END = re.compile(r"\r\n|\r|\n")
+
+
+def _utf16_length(text: str) -> int:
+    if text.isascii():
+        return len(text)
+    return len(text) + sum(ord(c) > 0xFFFF for c in text)
+
+
+def _from_utf16(line: str, units: int) -> int:
+    """Returns the index in `line` of a position counted in UTF-16 code units,
+    like LSP counts them."""
+    if line.isascii():
+        return min(units, len(line))
+    for index, c in enumerate(line):
+        units -= 2 if ord(c) > 0xFFFF else 1
+        if units < 0:
+            return index
+    return len(line)
+
+
+def _offset(text: str, position: dict[str, int]) -> int:
+    """Returns the index in `text` of an LSP position."""
+    start = 0
+    for _ in range(position["line"]):
+        match = LSP_LINE_END.search(text, start)
+        if match is None:
+            return len(text)
+        start = match.end()
+    match = LSP_LINE_END.search(text, start)
+    line = text[start : match.start() if match else len(text)]
+    return start + _from_utf16(line, position["character"])
+
+
+def _read_message(stream: BinaryIO) -> dict[str, Any] | None:
+    """Reads a JSON-RPC message framed with LSP's headers, or returns None at
+    the end of the stream."""
+    import json
+
+    length = None
+    while line := stream.readline():
+        if not line.strip():
+            if length is None:
+                raise ValueError("message without a Content-Length header")
+            message: dict[str, Any] = json.loads(stream.read(length))
+            return message
+        name, _, value = line.decode("ascii").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return None
+
+
+class Document(NamedTuple):
+    """The text of a document open in an LSP client."""
+
+    version: int
+    text: str
+
+
+@attr.define
+class LanguageServer:
+    """Publishes diagnostics for the documents an editor has open, for `python
+    -m bugbear --lsp`.
+
+    The documents are kept in memory and synced incrementally.  They're checked
+    on another thread once they haven't changed for `DEBOUNCE` seconds, so a
+    burst of changes is checked once, and the most recently changed document,
+    which is likely the one being edited, goes first.  The results of checks
+    that a newer change made stale are dropped instead of published.
+    `IncrementalChecker` only checks the changed definitions again, and
+    diagnostics are kept as they are while a document doesn't parse.
+
+    The time comes from `clock`, which tests can replace.
+    """
+
+    argv: list[str]
+    stdin: BinaryIO
+    stdout: BinaryIO
+    checker: IncrementalChecker = attr.ib(init=False)
+    documents: dict[str, Document] = attr.ib(factory=dict, init=False)
+    # when the documents to check are due, the most recently changed last
+    pending: dict[str, float] = attr.ib(factory=dict, init=False)
+    condition: threading.Condition = attr.ib(factory=threading.Condition, init=False)
+    write_lock: threading.Lock = attr.ib(factory=threading.Lock, init=False)
+    shut_down: bool = attr.ib(default=False, init=False)
+    exiting: bool = attr.ib(default=False, init=False)
+    clock: Callable[[], float] = attr.ib(default=time.monotonic, kw_only=True)
+
+    DEBOUNCE: ClassVar[float] = 0.02
+    NOTIFICATIONS: ClassVar[dict[str, str]] = {
+        "textDocument/didOpen": "did_open",
+        "textDocument/didChange": "did_change",
+        "textDocument/didClose": "did_close",
+    }
+
+    def __attrs_post_init__(self) -> None:
+        options = _parse_args(self.argv)
+        self.checker = IncrementalChecker(options, options.max_line_length)
+
+    def run(self) -> int:
+        """Handles messages until the client exits, and returns the exit
+        status LSP asks for."""
+        thread = threading.Thread(target=self.check_pending, daemon=True)
+        thread.start()
+        try:
+            while not self.exiting:
+                message = _read_message(self.stdin)
+                if message is None:
+                    break
+                self.handle(message)
+        finally:
+            with self.condition:
+                self.exiting = True
+                self.condition.notify()
+            thread.join()
+        return 0 if self.shut_down else 1
+
+    def handle(self, message: dict[str, Any]) -> None:
+        method = message.get("method")
+        params = message.get("params") or {}
+        if "id" not in message:
+            if method == "exit":
+                self.exiting = True
+            elif method in self.NOTIFICATIONS:
+                getattr(self, self.NOTIFICATIONS[method])(params)
+        elif method == "initialize":
+            capabilities = {"textDocumentSync": {"openClose": True, "change": 2}}
+            self.respond(
+                message["id"],
+                result={
+                    "capabilities": capabilities,
+                    "serverInfo": {"name": "flake8-bugbear", "version": __version__},
+                },
+            )
+        elif method == "shutdown":
+            self.shut_down = True
+            self.respond(message["id"], result=None)
+        elif method is not None:
+            self.respond(
+                message["id"],
+                error={"code": -32601, "message": f"Unsupported method {method}"},
+            )
+
+    def did_open(self, params: dict[str, Any]) -> None:
+        document = params["textDocument"]
+        self.update(document["uri"], Document(document["version"], document["text"]))
+
+    def did_change(self, params: dict[str, Any]) -> None:
+        document = params["textDocument"]
+        if document["uri"] not in self.documents:
+            return
+        text = self.documents[document["uri"]].text
+        for change in params["contentChanges"]:
+            if "range" in change:
+                start = _offset(text, change["range"]["start"])
+                end = _offset(text, change["range"]["end"])
+                text = text[:start] + change["text"] + text[end:]
+            else:
+                text = change["text"]
+        self.update(document["uri"], Document(document["version"], text))
+
+    def did_close(self, params: dict[str, Any]) -> None:
+        # the checker's thread forgets the document and clears its diagnostics
+        self.update(params["textDocument"]["uri"], None)
+
+    def update(self, uri: str, document: Document | None) -> None:
+        with self.condition:
+            if document is None:
+                self.documents.pop(uri, None)
+            else:
+                self.documents[uri] = document
+            self.pending.pop(uri, None)
+            self.pending[uri] = self.clock() + self.DEBOUNCE
+            self.condition.notify()
+
+    def next_pending(self) -> tuple[str, Document | None] | None:
+        """Waits for a document to be due for a check, and returns it, or None
+        when the server exits."""
+        with self.condition:
+            while not self.exiting:
+                now = self.clock()
+                due = [uri for uri, when in self.pending.items() if when <= now]
+                if due:
+                    del self.pending[due[-1]]
+                    return due[-1], self.documents.get(due[-1])
+                timeout = min(self.pending.values()) - now if self.pending else None
+                self.condition.wait(timeout)
+        return None
+
+    def check_pending(self) -> None:
+        while (pending := self.next_pending()) is not None:
+            uri, document = pending
+            try:
+                self.check(uri, document)
+            except Exception:
+                # a bug in a check shouldn't stop the checks of other documents
+                LOG.exception("Can't check %s", uri)
+
+    def check(self, uri: str, document: Document | None) -> None:
+        filename = _uri_filename(uri)
+        if document is None:
+            self.checker.forget(filename)
+            self.publish(uri, None, [])
+            return
+        source = document.text
+        if "\r" in source:
+            source = source.replace("\r\n", "\n").replace("\r", "\n")
+        try:
+            errors = self.checker.check(filename, source)
+        except FILE_FAILURES:
+            return
+        if errors:
+            errors = _without_noqa(SourceLines(source), errors)
+        with self.condition:
+            if self.documents.get(uri) is not document:
+                # a newer version is already on its way
+                return
+        self.publish(uri, document.version, _diagnostics(source, errors))
+
+    def publish(
+        self, uri: str, version: int | None, diagnostics: list[dict[str, Any]]
+    ) -> None:
+        params: dict[str, Any] = {"uri": uri, "diagnostics": diagnostics}
+        if version is not None:
+            params["version"] = version
+        self.send({"method": "textDocument/publishDiagnostics", "params": params})
+
+    def respond(self, id: int | str, **result: Any) -> None:
+        self.send({"id": id, **result})
+
+    def send(self, message: dict[str, Any]) -> None:
+        import json
+
+        body = json.dumps({"jsonrpc": "2.0", **message}).encode()
+        with self.write_lock:
+            self.stdout.write(b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+            self.stdout.flush()
+
+
+def _uri_filename(uri: str) -> str:
+    if not uri.startswith("file:"):
+        return uri
+    from urllib.parse import unquote, urlsplit
+    from urllib.request import url2pathname
+
+    return url2pathname(unquote(urlsplit(uri).path))
+
+
+def _diagnostics(source: str, errors: list[error]) -> list[dict[str, Any]]:
+    """Returns LSP diagnostics for the errors in `source`."""
+    lines = source.split("\n")
+    diagnostics = []
+    for e in errors:
+        lineno = max(e.lineno - 1, 0)
+        line = lines[lineno] if lineno < len(lines) else ""
+        # the column is in UTF-8 bytes, like `ast` counts them
+        start = line.encode()[: e.col].decode(errors="ignore")
+        code, _, message = e.format_message().partition(" ")
+        diagnostics.append(
+            {
+                "range": {
+                    "start": {"line": lineno, "character": _utf16_length(start)},
+                    "end": {"line": lineno, "character": _utf16_length(line)},
+                },
+                "severity": 2,
+                "code": code,
+                "source": "flake8-bugbear",
+                "message": message,
+            }
+        )
+    return diagnostics
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Checks files like flake8 with only Bugbear enabled would.
+
+    The errors are printed in flake8's default format, and the exit status is
+    1 if there were any.
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = _parse_args(argv)
+    if args.serve:
+        serve(args.serve, argv)
+        return 0
+    if args.connect:
+        return bugbear_client.check_with_server(args.connect, args.paths)
+    if args.lsp:
+        return LanguageServer(argv, sys.stdin.buffer, sys.stdout.buffer).run()
+    if args.paths == ["-"]:
+        results = check_sources([("stdin", stdin_get_value())], args, noqa=True)
+    else:
+        paths = list(_python_files(args.paths))
+        # a single file is checked in this process, without a pool
+        mp_context = _mp_context() if len(paths) > 1 and args.jobs != 1 else None
+        results = check_paths(
+            paths, args, jobs=args.jobs, mp_context=mp_context, noqa=True
+        )
+
+    found = False
+    for filename, errors, failure in results:
+        if failure is not None:
+            lineno, col, message = failure
+            print(f"{filename}:{lineno}:{col}: {message}")
+            found = True
+            continue
+        for e in errors:
+            print(f"{filename}:{e.lineno}:{e.col + 1}: {e.format_message()}")
+            found = True
+    return int(found)
@@ -0,0 +1,97 @@
+"""The `bugbear` command, which `python -m bugbear` runs too.
+
+Editors and hooks run `bugbear --connect SOCKET paths...` on every save, and
+the server they connect to has the checks imported already, so this module
+only imports what talking to it takes.  Everything else runs
+`bugbear_cli.main()`, which imports the checks.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+
+
+def _connect_args(argv: list[str]) -> tuple[str, list[str]] | None:
+    """Returns the socket and the paths of `--connect SOCKET paths...`, or None
+    for any other arguments, which `bugbear_cli` parses."""
+    socket_path = None
+    paths = []
+    args = iter(argv)
+    for arg in args:
+        if arg == "--connect":
+            socket_path = next(args, None)
+            if socket_path is None:
+                return None
+        elif arg.startswith("--connect="):
+            socket_path = arg.removeprefix("--connect=")
+        elif arg.startswith("-") and arg != "-":
+            return None
+        else:
+            paths.append(arg)
+    if socket_path is None or ("-" in paths and len(paths) > 1):
+        return None
+    return socket_path, paths or ["."]
+
+
+def _read_stdin() -> str:
+    """Reads stdin like `flake8.utils.stdin_get_value()`."""
+    import io
+    import tokenize
+
+    data = sys.stdin.buffer.read()
+    try:
+        encoding, _ = tokenize.detect_encoding(io.BytesIO(data).readline)
+        return data.decode(encoding)
+    except (LookupError, SyntaxError, UnicodeError):
+        return data.decode("utf-8")
+
+
+def request(socket_path: str, request: dict) -> dict:
+    """Sends a request to the server on the Unix domain socket at
+    `socket_path`, see `bugbear_cli.serve()`."""
+    import json
+    import socket
+
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            response: dict = json.loads(f.readline())
+    if "error" in response:
+        raise ValueError(response["error"])
+    return response
+
+
+def check_with_server(socket_path: str, paths: list[str]) -> int:
+    """Checks files like `bugbear_cli.main()`, but has the server on
+    `socket_path` check them, with the options it was started with."""
+    message: dict
+    if paths == ["-"]:
+        message = {"filename": "stdin", "source": _read_stdin()}
+    else:
+        message = {"paths": paths, "cwd": os.getcwd()}
+    found = False
+    for result in request(socket_path, message)["results"]:
+        for lineno, col, text in [
+            *([result["failure"]] if result["failure"] else []),
+            *result["errors"],
+        ]:
+            print(f"{result['filename']}:{lineno}:{col}: {text}")
+            found = True
+    return int(found)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Runs the `bugbear` command with the arguments `argv`."""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    connect_args = _connect_args(argv)
+    if connect_args is not None:
+        return check_with_server(*connect_args)
+    import bugbear_cli
+
+    return bugbear_cli.main(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
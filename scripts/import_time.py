@@ -0,0 +1,49 @@
+"""Measures how long `import bugbear` takes.
+
+Every flake8 worker and editor run pays for the import.  How long it takes
+depends on the machine, so CI records the times in the job summary to compare
+between runs instead of failing on a fixed budget.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RUNS = 20
+
+
+def import_times(env: dict[str, str]) -> tuple[int, int]:
+    """Returns the self and cumulative time of importing bugbear, in µs."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import bugbear"],
+        capture_output=True,
+        check=True,
+        env=env,
+        text=True,
+    )
+    for line in proc.stderr.splitlines()[1:]:
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        if name.strip() == "bugbear":
+            return int(self_us), int(cumulative_us)
+    raise RuntimeError(f"bugbear wasn't imported:\n{proc.stderr}")
+
+
+def main():
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env["PYTHONPYCACHEPREFIX"] = tmpdir
+        import_times(env)  # the first run compiles the bytecode
+        times = [import_times(env) for _ in range(RUNS)]
+
+    self_ms = statistics.median(self_us for self_us, _ in times) / 1000
+    cumulative_ms = statistics.median(cumulative for _, cumulative in times) / 1000
+    print(
+        f"`import bugbear` on Python {sys.version.split()[0]}: {self_ms:.1f} ms,"
+        f" {cumulative_ms:.1f} ms with its imports (median of {RUNS} runs)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -38,3 +38,16 @@ for vars in [i for i in vars]:  # B020: 4, "vars"
 
 for var in sorted(range(10), key=lambda var: var.real):
     print(var)
+
+for var in {var for var in range(10)}:
+    print(var)
+
+for t in [t for s in ["a[b", "c"] for t in s.split("[")]:
+    print(t)
+
+# Names in a comprehension that it doesn't bind refer to the loop variable.
+for vars in [vars for _ in range(10)]:  # B020: 4, "vars"
+    print(vars)
+
+for var in map(lambda x=var: x, range(10)):  # B020: 4, "var"
+    print(var)
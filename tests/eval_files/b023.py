@@ -1,6 +1,6 @@
 """
 Should emit:
-B023 - on lines 12, 13, 16, 28, 29, 30, 31, 40, 42, 50, 51, 52, 53, 61, 68.
+B023 - on lines 12, 13, 16, 28, 29, 30, 31, 40, 42, 50, 51, 52, 53, 61, 68, 180, 183.
 """
 
 from functools import reduce
@@ -169,4 +169,15 @@ def iter_f(names):
             return [lambda: name]  # known false alarm  # B023: 28, "name"
 
         if False:
-            return [lambda: i for i in range(3)]  # error  # B023: 28, "i"
\ No newline at end of file
+            return [lambda: i for i in range(3)]  # error  # B023: 28, "i"
+
+# The innermost loop reassigning the variable counts, even if outer loops don't.
+for _a in range(2):
+
+    def f_inner_loop():
+        x = 1
+        for x in range(3):
+            functions.append(lambda: x)  # error  # B023: 37, "x"
+
+
+_ = [[lambda: y for y in range(2)] for z in range(2)]  # error  # B023: 14, "y"
@@ -31,3 +31,14 @@ class D(C):
 class E:
     def __init__(self) -> None:
         yield "a" # B037: 8
+
+
+class F:
+    def __init__(self) -> None:
+        def helper():
+            return 1  # ok
+
+        class Inner:
+            def method(self):
+                yield  # ok
+        self.f = lambda: (yield)  # ok
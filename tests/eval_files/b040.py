@@ -125,6 +125,18 @@ except Exception as e: # B040: 0
     e.add_note("")
     e = ValueError()
 
+# the call that adds the note is itself used
+try:
+    ...
+except Exception as e:  # safe
+    arbitrary_fun(e.add_note(""))
+
+# only nested calls in the `add_note` call use it
+try:
+    ...
+except Exception as e:  # error # B040: 0
+    e.add_note(str(e), arbitrary_fun(str(e)))
+
 # *** unhandled cases ***
 
 
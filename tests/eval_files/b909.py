@@ -150,3 +150,9 @@ for key in some_dict:
 
 for key in some_dict.keys():
     some_dict[key] = 3 # no error
+
+# nested loops are checked on their own
+for outer in foo:
+    for inner in bar:
+        foo.append(inner) # B909: 8
+        bar.append(outer) # B909: 8
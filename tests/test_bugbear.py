@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import ast
+import gc
 import itertools
 import os
 import re
 import site
 import subprocess
 import sys
+import tracemalloc
 import unittest
 import warnings
 from argparse import Namespace
@@ -16,10 +18,23 @@ import pytest
 from flake8.exceptions import PluginExecutionFailed
 
 from bugbear import (
+    AstIndex,
     BugBearChecker,
     BugBearVisitor,
+    ResultCache,
+    SymbolTable,
     error,
     error_codes,
+    walk_preorder,
+)
+from bugbear_cli import (
+    FileErrors,
+    IncrementalChecker,
+    check_many,
+    check_paths,
+    check_source,
+    check_sources,
+    main,
 )
 
 EVAL_FILES_DIR = Path(__file__).parent / "eval_files"
@@ -102,6 +117,46 @@ def _parse_eval_file(test: str, content: str) -> tuple[list[error], Namespace |
     return expected, options
 
 
+def node_touches(code: str) -> float:
+    """Returns how many times the checks touch each node of `code` on average,
+    with every check enabled.
+
+    A node is touched when its children are looked up, which every walk, index
+    and symbol table does through `push_children()` or `ast.iter_fields()`.
+    """
+    from unittest.mock import patch
+
+    import bugbear
+
+    tree = ast.parse(code)
+    touches = 0
+    push_children = bugbear.push_children
+    iter_fields = ast.iter_fields
+
+    def counting_push_children(stack, node):
+        nonlocal touches
+        touches += 1
+        push_children(stack, node)
+
+    def counting_iter_fields(node):
+        nonlocal touches
+        touches += 1
+        return iter_fields(node)
+
+    bbc = BugBearChecker(
+        tree=tree,
+        filename="<string>",
+        lines=code.splitlines(True),
+        options=Namespace(select=["B"]),
+    )
+    with (
+        patch("bugbear.push_children", counting_push_children),
+        patch("ast.iter_fields", counting_iter_fields),
+    ):
+        list(bbc.run())
+    return touches / sum(1 for _ in ast.walk(tree))
+
+
 class BugbearTestCase(unittest.TestCase):
     maxDiff = None
 
@@ -202,6 +257,611 @@ class BugbearTestCase(unittest.TestCase):
             ),
         )
 
+    def test_collect_errors_skips_formatting(self):
+        filename = EVAL_FILES_DIR / "b950.py"
+
+        mock_options = Namespace(select=["B950"])
+        bbc = BugBearChecker(filename=str(filename), options=mock_options)
+        records = bbc.collect_errors()
+        self.assertEqual(
+            [(e.code, e.lineno, e.col) for e in records],
+            [
+                ("B950", 7, 113),
+                ("B950", 12, 125),
+                ("B950", 14, 125),
+                ("B950", 21, 118),
+                ("B950", 36, 132),
+                ("B950", 37, 140),
+            ],
+        )
+        self.assertEqual(records[0].vars, (113, 79))
+        self.assertEqual(records[0], error_codes["B950"](7, 113, vars=(113, 79)))
+        self.assertEqual(list(bbc.run()), self.errors(*records))
+
+    def test_load_file_matches_pycodestyle(self):
+        import tempfile
+
+        import pycodestyle
+
+        sources = [
+            b"x = 1\r\ny = 2\rz = 3\n",
+            b"\xef\xbb\xbfx = '\xc3\xa9'\n",
+            b"# -*- coding: latin-1 -*-\nx = '\xe9'\n",
+            # an unknown or wrong encoding falls back to Latin-1
+            b"# -*- coding: bogus -*-\nx = '\xe9'\n",
+            b"x = '\xff'\n",
+            b"x = 1",
+        ]
+        for source in sources:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                filename = os.path.join(tmpdir, "t.py")
+                with open(filename, "wb") as f:
+                    f.write(source)
+                bbc = BugBearChecker(filename=filename)
+                bbc.load_file()
+                expected = pycodestyle.readlines(filename)
+            self.assertEqual(list(bbc.lines), expected)
+            self.assertEqual(len(bbc.lines), len(expected))
+            self.assertEqual(bbc.lines[-1], expected[-1])
+            self.assertEqual(ast.dump(bbc.tree), ast.dump(ast.parse("".join(expected))))
+
+    def test_check_paths_matches_checker(self):
+        filenames = sorted(str(f) for _, f in test_files)[:20]
+        expected = [
+            FileErrors(f, BugBearChecker(filename=f).collect_errors())
+            for f in filenames
+        ]
+        self.assertEqual(list(check_paths(filenames)), expected)
+
+        done = []
+        results = check_paths(
+            filenames,
+            jobs=2,
+            chunksize=3,
+            progress=lambda n, total: done.append((n, total)),
+        )
+        self.assertEqual(list(results), expected)
+        self.assertEqual(done, [(n, 20) for n in range(1, 21)])
+
+        results = check_paths(filenames, jobs=2, ordered=False)
+        self.assertEqual(sorted(results), expected)
+
+    def test_check_sources(self):
+        options = Namespace(
+            select=None,
+            extend_select=None,
+            ignore=None,
+            extend_ignore=["B011"],
+            extended_default_select=["B"],
+            extended_default_ignore=[],
+        )
+        results = check_sources(
+            [
+                ("a.py", "try:\n    pass\nexcept:\n    assert False\n"),
+                ("b.py", "def f(:\n"),
+                ("c.py", ""),
+                # too deeply nested for the parser, which fails this file only
+                ("d.py", "x = " + " + ".join(["a"] * 200_000)),
+                ("e.py", "x = 1\n"),
+            ],
+            options,
+        )
+        checked = list(results)
+        failure = checked.pop(3).failure
+        assert failure is not None
+        self.assertTrue(failure[2].startswith("E999 "), failure)
+        self.assertEqual(
+            checked,
+            [
+                FileErrors("a.py", [error_codes["B001"](3, 0)]),
+                FileErrors("b.py", [], (1, 7, "E999 SyntaxError: invalid syntax")),
+                FileErrors("c.py", []),
+                FileErrors("e.py", []),
+            ],
+        )
+
+        (result,) = check_paths([EVAL_FILES_DIR / "missing.py"])
+        self.assertEqual(result.errors, [])
+        assert result.failure is not None
+        self.assertTrue(result.failure[2].startswith("E902 FileNotFoundError"))
+
+        # a bug in a check isn't a failure to parse the file
+        from unittest.mock import patch
+
+        with patch.object(BugBearVisitor, "visit", side_effect=ValueError("bug")):
+            with self.assertRaises(PluginExecutionFailed) as excinfo:
+                list(check_sources([("a.py", "x = 1\n")]))
+        self.assertEqual(excinfo.exception.filename, "a.py")
+        self.assertIsInstance(excinfo.exception.original_exception, ValueError)
+
+    def test_check_many(self):
+        import asyncio
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        options = Namespace(extend_ignore=["B011"])
+        sources = [
+            ("a.py", "try:\n    pass\nexcept:\n    assert False\n"),
+            ("b.py", "def f(:\n"),
+            ("c.py", 'getattr(x, "a")\n' * 200),
+        ]
+        expected = list(check_sources(sources, options))
+        # the options that aren't given get flake8's defaults
+        self.assertEqual(expected[0], FileErrors("a.py", [error_codes["B001"](3, 0)]))
+
+        async def agen():
+            for source in sources:
+                await asyncio.sleep(0)
+                yield source
+
+        async def check():
+            result = await check_source(sources[0][1], "a.py", options)
+            self.assertEqual(result, expected[0])
+
+            results = [r async for r in check_many(sources, options, limit=2)]
+            self.assertEqual(results, expected)
+            with ThreadPoolExecutor(2) as executor:
+                results = [
+                    r
+                    async for r in check_many(
+                        agen(), options, executor=executor, ordered=False
+                    )
+                ]
+            self.assertCountEqual(results, expected)
+
+            # cancelling the iteration cancels the checks that are waiting
+            submitted = []
+
+            class Executor(ThreadPoolExecutor):
+                def submit(self, *args, **kwargs):
+                    submitted.append(super().submit(*args, **kwargs))
+                    return submitted[-1]
+
+            release = threading.Event()
+            with Executor(1) as executor:
+                executor.submit(release.wait)
+                results = check_many(sources * 10, options, executor=executor)
+                task = asyncio.ensure_future(anext(results))
+                while len(submitted) < 1 + 8:
+                    await asyncio.sleep(0)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+                release.set()
+            self.assertTrue(all(f.cancelled() for f in submitted[1:]))
+
+        asyncio.run(check())
+
+    def test_main(self):
+        import io
+        import tempfile
+        from contextlib import redirect_stdout
+        from unittest.mock import patch
+
+        import bugbear
+
+        source = (
+            "try:\n"
+            "    pass\n"
+            "except:  # noqa: B001\n"
+            "    pass\n"
+            "try:\n"
+            "    pass\n"
+            "except:\n"
+            '    x = """\n'
+            '"""  # noqa\n'
+            'getattr(x, "a")  # noqa: E501\n'
+        )
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "t.py")
+            with open(filename, "w") as f:
+                f.write(source)
+            with redirect_stdout(io.StringIO()) as stdout:
+                status = main(["--extend-ignore", "B00", "--jobs", "1", tmpdir])
+            self.assertEqual(status, 0)
+            self.assertEqual(stdout.getvalue(), "")
+
+            # the file is only read by the check, which leaves out the errors
+            # silenced with `# noqa`
+            read_source = patch("bugbear.read_source", wraps=bugbear.read_source)
+            with (
+                redirect_stdout(io.StringIO()) as stdout,
+                read_source as reads,
+                patch("bugbear_cli.read_source", reads),
+            ):
+                status = main([filename])
+            reads.assert_called_once_with(filename)
+        self.assertEqual(status, 1)
+        self.assertEqual(
+            stdout.getvalue().splitlines(),
+            [
+                f"{filename}:7:1: {error_codes['B001'].message}",
+                f"{filename}:10:1: {error_codes['B009'].message}",
+            ],
+        )
+
+    def test_module_entry_point(self):
+        # two files, so they're checked in a pool
+        filenames = [str(EVAL_FILES_DIR / f) for f in ("b001.py", "b009_b010.py")]
+        proc = subprocess.run(
+            [sys.executable, "-m", "bugbear", "--jobs", "2", *filenames],
+            capture_output=True,
+            cwd=Path(__file__).parent.parent,
+            timeout=60,
+        )
+        self.assertEqual(proc.returncode, 1, proc.stderr.decode("utf8"))
+        expected = [
+            f"{f}:{lineno}:{col + 1}: {message}"
+            for f in filenames
+            for lineno, col, message, _ in BugBearChecker(filename=f).run()
+        ]
+        self.assertEqual(proc.stdout.decode("utf8").splitlines(), expected)
+
+    def test_result_cache(self):
+        import tempfile
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest.mock import patch
+
+        filename = str(EVAL_FILES_DIR / "b006_b008.py")
+        options = Namespace(extend_immutable_calls=[])
+        expected = BugBearChecker(filename=filename, options=options).collect_errors()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            options.bugbear_cache_dir = tmpdir
+            errors = BugBearChecker(filename=filename, options=options).collect_errors()
+            self.assertEqual(errors, expected)
+
+            with patch.object(BugBearChecker, "find_errors") as find_errors:
+                bbc = BugBearChecker(filename=filename, options=options)
+                self.assertEqual(bbc.collect_errors(), expected)
+                self.assertEqual(bbc.run().__next__()[2], expected[0].format_message())
+                find_errors.assert_not_called()
+
+                # the connection is shared with other threads
+                with ThreadPoolExecutor(1) as executor:
+                    bbc = BugBearChecker(filename=filename, options=options)
+                    self.assertEqual(
+                        executor.submit(bbc.collect_errors).result(), expected
+                    )
+                find_errors.assert_not_called()
+
+                # other options give other results
+                options.extend_immutable_calls = ["foo"]
+                BugBearChecker(filename=filename, options=options).collect_errors()
+                find_errors.assert_called_once()
+
+    def test_result_cache_eviction(self):
+        import tempfile
+
+        errors = [error_codes["B001"](i, 0) for i in range(1, 21)]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ResultCache(tmpdir, max_size=1000)
+            keys = [cache.key(f"x = {i}\n", b"") for i in range(20)]
+            for i, key in enumerate(keys):
+                cache.connection.execute("UPDATE results SET used = used - 10")
+                cache.put(key, errors[: i + 1])
+                self.assertEqual(cache.get(key), errors[: i + 1])
+
+            (total,) = cache.connection.execute("SELECT total FROM size").fetchone()
+            (size,) = cache.connection.execute(
+                "SELECT sum(length(key) + length(errors)) FROM results"
+            ).fetchone()
+            self.assertEqual(total, size)
+            self.assertLessEqual(total, 1000)
+            # the least recently used entries were dropped
+            self.assertIsNone(cache.get(keys[0]))
+            self.assertIsNotNone(cache.get(keys[-1]))
+            cache.connection.close()
+
+    def test_incremental_checker(self):
+        from unittest.mock import patch
+
+        checker = IncrementalChecker()
+        checked = []
+        find_errors = BugBearChecker.find_errors
+
+        def check(source):
+            def record_checked(bbc):
+                checked[:] = [getattr(n, "name", "import") for n in bbc.tree.body]
+                return find_errors(bbc)
+
+            with patch.object(BugBearChecker, "find_errors", record_checked):
+                errors = checker.check("t.py", source)
+            expected = BugBearChecker(
+                tree=ast.parse(source), lines=source.splitlines(True)
+            ).collect_errors()
+            self.assertEqual(errors, sorted(expected, key=lambda e: (e.lineno, e.col)))
+            return [(e.lineno, e.code) for e in errors]
+
+        source = (
+            "import os\n"
+            "def f(s):\n"
+            '    return s.strip("aab")\n'
+            "def g():\n"
+            '    return os.strip("aab")\n'
+            "class C:\n"
+            "    def h(self):\n"
+            '        return getattr(self, "a")\n'
+        )
+        self.assertEqual(check(source), [(3, "B005"), (8, "B009")])
+        self.assertEqual(checked, ["import", "f", "g", "C"])
+
+        # only the changed function is checked again
+        source = "# moved\n" + source.replace(" s.strip", " s.lstrip")
+        self.assertEqual(check(source), [(4, "B005"), (9, "B009")])
+        self.assertEqual(checked, ["import", "f"])
+
+        # without the import, `os.strip()` is a B005
+        source = source.replace("import os\n", "")
+        self.assertEqual(check(source), [(3, "B005"), (5, "B005"), (8, "B009")])
+        self.assertEqual(checked, ["g"])
+
+        # the imports of functions that aren't checked again still count
+        source = "def i():\n    import os\n" + source
+        self.assertEqual(check(source), [(5, "B005"), (10, "B009")])
+        self.assertEqual(checked, ["i", "g"])
+        source = source.replace("os.strip", "os.rstrip")
+        self.assertEqual(check(source), [(5, "B005"), (10, "B009")])
+        self.assertEqual(checked, ["import", "g"])
+
+        # only the source failing to parse raises a `SyntaxError`
+        with self.assertRaises(SyntaxError):
+            checker.check("t.py", "def f(:\n")
+        with patch.object(BugBearVisitor, "visit", side_effect=SyntaxError("bug")):
+            with self.assertRaises(PluginExecutionFailed) as excinfo:
+                checker.check("t.py", "x = 1\n")
+        self.assertIsInstance(excinfo.exception.original_exception, SyntaxError)
+
+    def test_server(self):
+        import io
+        import json
+        import socket
+        import tempfile
+        import threading
+        import time
+        from contextlib import redirect_stdout
+
+        from bugbear_cli import Server, serve
+
+        source = 'getattr(x, "a")\ngetattr(x, "b")  # noqa: B009\nx == x\n'
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config = os.path.join(tmpdir, "setup.cfg")
+            with open(config, "w") as f:
+                f.write("[flake8]\nextend-ignore = B015\n")
+            filename = os.path.join(tmpdir, "t.py")
+            with open(filename, "w") as f:
+                f.write(source)
+
+            server = Server(["--config", config])
+            message = error_codes["B009"].message
+            expected = {"filename": filename, "errors": [[1, 1, message]]}
+            response = server.handle({"filename": filename, "source": source})
+            self.assertEqual(
+                json.loads(json.dumps(response)),
+                {"results": [{**expected, "failure": None}]},
+            )
+            response = server.handle({"paths": [filename, filename + "x"]})
+            self.assertEqual(response["results"][0]["errors"], [(1, 1, message)])
+            self.assertEqual(response["results"][1]["failure"][2][:4], "E902")
+
+            # the options are read again when the config file changes
+            with open(config, "w") as f:
+                f.write("[flake8]\nextend-ignore = B009\n")
+            os.utime(config, ns=(0, 0))
+            response = server.handle({"filename": filename, "source": source})
+            self.assertEqual(
+                response["results"][0]["errors"],
+                [(3, 1, error_codes["B015"].message)],
+            )
+
+            path = os.path.join(tmpdir, "s.sock")
+            thread = threading.Thread(target=serve, args=(path, []))
+            thread.start()
+            try:
+                for _ in range(500):
+                    if os.path.exists(path):
+                        break
+                    time.sleep(0.01)
+                with redirect_stdout(io.StringIO()) as stdout:
+                    status = main(["--connect", path, tmpdir])
+                self.assertEqual(status, 1)
+                self.assertEqual(
+                    stdout.getvalue().splitlines(),
+                    [
+                        f"{filename}:1:1: {message}",
+                        f"{filename}:3:1: {error_codes['B015'].message}",
+                    ],
+                )
+
+                # the `bugbear` command asks the server without importing the
+                # checks, and names the files like it was given them
+                root = Path(__file__).parent.parent
+                relative = os.path.relpath(filename, root)
+                proc = subprocess.run(
+                    [
+                        sys.executable,
+                        *("-X", "importtime", "-m", "bugbear"),
+                        f"--connect={path}",
+                        relative,
+                    ],
+                    capture_output=True,
+                    cwd=root,
+                    text=True,
+                    timeout=60,
+                )
+                self.assertEqual(proc.returncode, 1, proc.stderr)
+                self.assertEqual(
+                    proc.stdout.splitlines(),
+                    [
+                        f"{relative}:1:1: {message}",
+                        f"{relative}:3:1: {error_codes['B015'].message}",
+                    ],
+                )
+                imported = {
+                    line.rpartition("|")[2].strip() for line in proc.stderr.splitlines()
+                }
+                self.assertIn("bugbear_client", imported)
+                self.assertIn("socket", imported)
+                for module in ("bugbear", "bugbear_cli", "attr", "flake8"):
+                    self.assertNotIn(module, imported)
+            finally:
+                with socket.socket(socket.AF_UNIX) as sock:
+                    sock.connect(path)
+                    sock.sendall(b'{"shutdown": true}\n')
+                    sock.recv(1024)
+                thread.join(10)
+            self.assertFalse(thread.is_alive())
+            self.assertFalse(os.path.exists(path))
+
+    def test_language_server(self):
+        import json
+        import threading
+        from unittest.mock import patch
+
+        from bugbear_cli import LanguageServer, _read_message
+
+        def pipe():
+            read_fd, write_fd = os.pipe()
+            return os.fdopen(read_fd, "rb"), os.fdopen(write_fd, "wb")
+
+        client_in, server_out = pipe()
+        server_in, client_out = pipe()
+        # time only passes when the test says so
+        now = [0.0]
+        server = LanguageServer([], server_in, server_out, clock=lambda: now[0])
+        status = []
+        thread = threading.Thread(target=lambda: status.append(server.run()))
+        thread.start()
+
+        def send(**message):
+            body = json.dumps({"jsonrpc": "2.0", **message}).encode()
+            client_out.write(b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+            client_out.flush()
+
+        def diagnostics():
+            message = _read_message(client_in)
+            self.assertEqual(message["method"], "textDocument/publishDiagnostics")
+            params = message["params"]
+            return params.get("version"), [
+                (
+                    d["range"]["start"]["line"],
+                    d["range"]["start"]["character"],
+                    d["code"],
+                )
+                for d in params["diagnostics"]
+            ]
+
+        def debounce():
+            # The server answers requests in order, so once it answered this
+            # one, the changes sent before it are pending.
+            send(id="sync", method="test/sync", params={})
+            self.assertEqual(_read_message(client_in)["id"], "sync")
+            with server.condition:
+                now[0] += LanguageServer.DEBOUNCE
+                server.condition.notify()
+
+        try:
+            send(id=1, method="initialize", params={})
+            response = _read_message(client_in)
+            self.assertEqual(response["id"], 1)
+            self.assertEqual(
+                response["result"]["capabilities"]["textDocumentSync"]["change"], 2
+            )
+
+            uri = "file:///tmp/t.py"
+            text = 'getattr(x, "a")\nx = "\U0001f600"; getattr(x, "b")\n'
+            document = {"uri": uri, "version": 1, "text": text}
+            send(method="textDocument/didOpen", params={"textDocument": document})
+            debounce()
+            # the column is in UTF-16 code units
+            self.assertEqual(diagnostics(), (1, [(0, 0, "B009"), (1, 10, "B009")]))
+
+            # a burst of changes is checked once
+            for version in range(2, 5):
+                change = {
+                    "range": {
+                        "start": {"line": 0, "character": 0},
+                        "end": {"line": 0, "character": 0},
+                    },
+                    "text": "\n",
+                }
+                send(
+                    method="textDocument/didChange",
+                    params={
+                        "textDocument": {"uri": uri, "version": version},
+                        "contentChanges": [change],
+                    },
+                )
+            debounce()
+            self.assertEqual(diagnostics(), (4, [(3, 0, "B009"), (4, 10, "B009")]))
+
+            # the diagnostics stay while the document doesn't parse
+            change = {"text": "def f(:\n"}
+            send(
+                method="textDocument/didChange",
+                params={
+                    "textDocument": {"uri": uri, "version": 5},
+                    "contentChanges": [change],
+                },
+            )
+            debounce()
+            change = {"text": 'getattr(x, "a")  # noqa\nx == x\n'}
+            send(
+                method="textDocument/didChange",
+                params={
+                    "textDocument": {"uri": uri, "version": 6},
+                    "contentChanges": [change],
+                },
+            )
+            debounce()
+            self.assertEqual(diagnostics(), (6, [(1, 0, "B015")]))
+
+            # a check that fails is logged, and the other documents are checked
+            other = {"uri": "file:///tmp/u.py", "version": 1, "text": "x == x\n"}
+            send(method="textDocument/didOpen", params={"textDocument": other})
+            send(
+                method="textDocument/didChange",
+                params={
+                    "textDocument": {"uri": uri, "version": 7},
+                    "contentChanges": [{"text": "x == x\n"}],
+                },
+            )
+            check = IncrementalChecker.check
+
+            def fail_t_py(checker, filename, source):
+                if filename.endswith("t.py"):
+                    raise RuntimeError("bug in a check")
+                return check(checker, filename, source)
+
+            with (
+                patch.object(IncrementalChecker, "check", fail_t_py),
+                self.assertLogs("flake8.bugbear", "ERROR") as logs,
+            ):
+                debounce()
+                # t.py was changed last, so it was checked first
+                self.assertEqual(diagnostics(), (1, [(0, 0, "B015")]))
+            (record,) = logs.records
+            self.assertEqual(record.getMessage(), f"Can't check {uri}")
+            assert record.exc_info is not None
+            self.assertIs(record.exc_info[0], RuntimeError)
+
+            send(method="textDocument/didClose", params={"textDocument": {"uri": uri}})
+            debounce()
+            self.assertEqual(diagnostics(), (None, []))
+
+            send(id=2, method="textDocument/hover", params={})
+            self.assertEqual(_read_message(client_in)["error"]["code"], -32601)
+            send(id=3, method="shutdown")
+            self.assertEqual(
+                _read_message(client_in), {"jsonrpc": "2.0", "id": 3, "result": None}
+            )
+            send(method="exit")
+        finally:
+            client_out.close()
+            thread.join(10)
+            for f in (client_in, server_in, server_out):
+                f.close()
+        self.assertEqual(status, [0])
+
     def test_b912_suppressed_on_pre_3_14(self):
         # `map(strict=...)` only exists on Python 3.14+, so the check should
         # be a noop on older interpreters.
@@ -236,6 +896,266 @@ class BugbearTestCase(unittest.TestCase):
         errors = list(bbc.run())
         self.assertEqual(errors, [])
 
+    def test_registered_checks_cover_error_codes(self):
+        registered_codes = {
+            code for check in BugBearVisitor.registered_checks for code in check.codes
+        }
+        # B040 is tracked by the visitor itself, B950 is a line-based check.
+        self.assertEqual(registered_codes | {"B040", "B950"}, set(error_codes))
+        for node_type, checks in BugBearVisitor.dispatch_table.items():
+            self.assertTrue(issubclass(node_type, ast.AST))
+            self.assertTrue(
+                all(check.__name__.startswith("check_for_") for check in checks)
+            )
+
+    def test_enabled_codes_follow_select_and_ignore(self):
+        options = Namespace(
+            select=None,
+            extend_select=["B909"],
+            ignore=None,
+            extend_ignore=["B00", "B017"],
+            extended_default_select=["B"],
+            extended_default_ignore=["B9"],
+        )
+        enabled_codes = BugBearChecker(options=options).enabled_codes()
+        self.assertIn("B909", enabled_codes)
+        self.assertIn("B010", enabled_codes)
+        self.assertNotIn("B905", enabled_codes)
+        self.assertNotIn("B950", enabled_codes)
+        self.assertNotIn("B006", enabled_codes)
+        self.assertNotIn("B017", enabled_codes)
+
+    def test_enabled_codes_are_decided_once_per_configuration(self):
+        from unittest.mock import patch
+
+        options = Namespace(select=None, extend_select=["B905"])
+        enabled_codes = BugBearChecker(options=options).enabled_codes()
+        with patch("bugbear.DecisionEngine") as decision_engine:
+            # another file of the same flake8 run
+            other_options = Namespace(select=None, extend_select=["B905"])
+            self.assertEqual(
+                BugBearChecker(options=other_options).enabled_codes(), enabled_codes
+            )
+            decision_engine.assert_not_called()
+            BugBearChecker(options=Namespace(select=["B9"])).enabled_codes()
+            decision_engine.assert_called_once()
+
+    def test_disabled_checks_are_not_dispatched(self):
+        visitor = BugBearVisitor(
+            filename="<string>", lines=[], enabled_codes=frozenset({"B001", "B014"})
+        )
+        dispatched = {
+            check.__name__ for checks in visitor.dispatch.values() for check in checks
+        }
+        self.assertEqual(
+            dispatched, {"check_for_b001", "check_for_b013_b014_b029_b030"}
+        )
+
+        visitor.visit(ast.parse("try:\n    pass\nexcept:\n    x == 1\n"))
+        self.assertEqual([e.message[:4] for e in visitor.errors], ["B001"])
+
+    def test_checks_without_triggers_in_source_are_not_dispatched(self):
+        def dispatched(source):
+            visitor = BugBearVisitor(filename="<string>", lines=source.splitlines(True))
+            return {
+                check.__name__
+                for checks in visitor.dispatch.values()
+                for check in checks
+            }
+
+        without_triggers = dispatched("x = 1\n")
+        self.assertNotIn("check_for_b905", without_triggers)
+        self.assertNotIn("check_for_b031", without_triggers)
+        self.assertIn("check_for_b006_and_b008", without_triggers)
+
+        with_zip = dispatched("list(zip(a, b))\n")
+        self.assertIn("check_for_b905", with_zip)
+        self.assertNotIn("check_for_b031", with_zip)
+
+        # identifiers are NFKC-normalized, so non-ASCII source can't be filtered
+        self.assertIn("check_for_b905", dispatched("list(\uff5aip(a, b))\n"))
+        # without the lines, nothing is filtered
+        self.assertIn("check_for_b905", dispatched(""))
+
+    def test_ast_index(self):
+        # the parser reuses a single instance of these for every occurrence
+        SINGLETON_NODES = (
+            ast.expr_context,
+            ast.boolop,
+            ast.operator,
+            ast.unaryop,
+            ast.cmpop,
+        )
+        tree = ast.parse((EVAL_FILES_DIR / "b023.py").read_text())
+        index = AstIndex(tree)
+        self.assertEqual(index.nodes, list(walk_preorder([tree])))
+        self.assertEqual(len(index), len(list(ast.walk(tree))))
+        for i, node in enumerate(index.nodes):
+            subtree = index.nodes[i : index.end[i]]
+            self.assertEqual(subtree[0], node)
+            self.assertEqual({id(n) for n in subtree}, {id(n) for n in ast.walk(node)})
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, SINGLETON_NODES):
+                    continue
+                self.assertIs(index.parent_of(child), node)
+        self.assertIsNone(index.parent_of(tree))
+        self.assertEqual(
+            list(index.walk_type(tree.body, ast.Lambda)),
+            [n for n in index.nodes if isinstance(n, ast.Lambda)],
+        )
+
+    def test_symbol_table(self):
+        tree = ast.parse(
+            "import os.path\n"
+            "def f(a, b=c):\n"
+            "    global g\n"
+            "    g = [a for a in b if (w := a)]\n"
+            "    for i in range(a):\n"
+            "        i += lambda: i\n"
+            "    del a\n"
+        )
+        symbols = SymbolTable(AstIndex(tree))
+        func = tree.body[1]
+        assert isinstance(func, ast.FunctionDef)
+        comp = func.body[1].value  # type: ignore[attr-defined]
+        loop = func.body[2]
+        lam = loop.body[0].value  # type: ignore[attr-defined]
+        self.assertEqual(
+            [(u.name, u.kind, u.scope.node) for u in symbols.uses],
+            [
+                ("os", "import", tree),
+                ("f", "def", tree),
+                ("a", "param", func),
+                ("b", "param", func),
+                ("c", "load", tree),
+                ("g", "store", func),
+                ("a", "load", comp),
+                ("a", "store", comp),
+                # the first iterable is evaluated outside of the comprehension
+                ("b", "load", func),
+                ("w", "walrus", func),
+                ("a", "load", comp),
+                ("i", "store", func),
+                ("range", "load", func),
+                ("a", "load", func),
+                ("i", "augstore", func),
+                ("i", "load", lam),
+                ("a", "del", func),
+            ],
+        )
+        self.assertFalse(symbols.scopes[func].binds("g"))
+        self.assertTrue(symbols.scopes[func].binds("w"))
+        i_load = symbols.uses_in(loop.body, "i")[1]
+        self.assertIs(i_load.loop, symbols.loops_in([loop])[0])
+        self.assertIs(i_load.statement, loop.body[0])
+        self.assertTrue(symbols.resolves_to(i_load, symbols.scopes[func]))
+        self.assertEqual([u.name for u in symbols.uses_in(func.args)], ["a", "b", "c"])
+
+    def test_loops_are_analyzed_on_demand(self):
+        from unittest.mock import patch
+
+        tree = ast.parse(
+            "def f(items):\n"
+            "    for item in items:\n"
+            "        for i, x in enumerate(item):\n"
+            "            print(i, x)\n"
+            "    return [x for x in items if x]\n"
+        )
+        with patch("bugbear.SymbolTable", wraps=SymbolTable) as symbol_table:
+            visitor = BugBearVisitor(filename="<string>", lines=[])
+            visitor.visit(tree)
+        self.assertEqual(visitor.errors, [])
+        symbol_table.assert_not_called()
+
+        # a target name in the iterable and a function inside a loop do need a
+        # symbol table, but only of the loop
+        tree = ast.parse(
+            "for x in x:\n    print(x)\nfor y in z:\n    g(lambda: y)\nq = 1\n"
+        )
+        with patch("bugbear.SymbolTable", wraps=SymbolTable) as symbol_table:
+            visitor = BugBearVisitor(filename="<string>", lines=[])
+            visitor.visit(tree)
+        self.assertEqual(
+            sorted(e.message[:4] for e in visitor.errors), ["B020", "B023"]
+        )
+        self.assertEqual(
+            [c.args[0].root for c in symbol_table.call_args_list], tree.body[:2]
+        )
+
+    def test_node_touches_per_file(self):
+        # Every node is touched by the visit, and by the few indexes, symbol
+        # tables and summaries built for the parts of the file that need them.
+        for test, path in test_files:
+            python_version = re.search(r"(?<=_PY3)\d+", test)
+            if python_version and sys.version_info < (3, int(python_version[0])):
+                continue
+            with self.subTest(test), warnings.catch_warnings():
+                warnings.simplefilter("ignore", SyntaxWarning)
+                self.assertLess(node_touches(path.read_text()), 6)
+
+        # Nesting doesn't make the checks walk the same nodes again.
+        def nested(header, depth):
+            return (
+                "".join(
+                    "    " * i + header.format(i=i, indent="    " * i) + "\n"
+                    for i in range(depth)
+                )
+                + f"{'    ' * depth}g(x0)\n"
+            )
+
+        for header in (
+            "for x{i} in y{i}:",
+            # a target in the iterable needs a symbol table
+            "for x{i} in f(x{i}):",
+            "while x{i}:",
+            "if x{i}:",
+            "def f{i}(x{i}):",
+            "class C{i}:",
+            "with x{i} as y{i}:",
+            "try:\n{indent}    pass\n{indent}except E as e:",
+        ):
+            with self.subTest(header):
+                shallow = node_touches(nested(header, 20))
+                deep = node_touches(nested(header, 80))
+                self.assertLess(deep, shallow * 1.1)
+
+    def test_visit_keeps_no_per_node_state(self):
+        # Code without loops or `except` clauses, which are analyzed on their
+        # own (see `AstIndex`), so all that is measured is the memory of
+        # visiting nodes and dispatching checks.
+        # The visit allocates short-lived objects, such as iterators, which are
+        # freed as soon as they're done and can't be counted without a debug
+        # build.  What is counted per node is the blocks that are still
+        # allocated after repeated visits, like objects made for every node and
+        # kept, and tracemalloc's peak, which also shows memory held during the
+        # visit, like a list that grows with every node.
+        tree = ast.parse(
+            "".join(
+                f"x{i} = a.b + b * {i}\ny = g(x, a, key=b)\nz = not x or y[1:2]\n"
+                for i in range(500)
+            )
+        )
+        visits = 3
+        visited_nodes = visits * sum(1 for _ in ast.walk(tree))
+        visitor = BugBearVisitor(filename="<string>", lines=[])
+        visitor.visit(tree)  # warm up context frames and caches
+
+        gc.collect()
+        blocks = sys.getallocatedblocks()
+        tracemalloc.start()
+        try:
+            for _ in range(visits):
+                visitor.visit(tree)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        gc.collect()
+        blocks = sys.getallocatedblocks() - blocks
+
+        self.assertEqual(visitor.errors, [])
+        self.assertLess(blocks / visited_nodes, 0.01, f"{blocks} blocks kept")
+        self.assertLess(peak / visited_nodes, 1, f"{peak} bytes held")
+
     def test_recursion_error_is_wrapped(self):
         from unittest.mock import patch
 
@@ -248,10 +1168,119 @@ class BugbearTestCase(unittest.TestCase):
         self.assertEqual(excinfo.exception.plugin_name, "flake8-bugbear")
         self.assertIsInstance(excinfo.exception.original_exception, RecursionError)
 
+    def test_deeply_nested_tree(self):
+        depth = 3 * sys.getrecursionlimit()
+        terms = " + ".join(["x"] * depth)
+        calls = " + ".join(["x()"] * depth)
+        code = "\n".join(
+            [
+                f"def f(a={calls}): ...",
+                "for x in y:",
+                f"    y.append({terms})",
+                f"    f = lambda: {terms}",
+                f"for x in {terms}: ...",
+                f"print(f\"'{{{terms}}}'\")",
+                "if x:",
+                "    ...",
+                *(f"elif x == {i}:\n    ..." for i in range(depth // 4)),
+            ]
+        )
+        # Building the tree itself recurses, so only the check runs with the
+        # default limit.
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(2 * depth)
+        try:
+            tree = ast.parse(code)
+        finally:
+            sys.setrecursionlimit(limit)
+
+        bbc = BugBearChecker(tree=tree, filename="<deep>", lines=code.splitlines(True))
+        errors = {e[2][:4]: e[2] for e in bbc.run()}
+        self.assertLessEqual({"B008", "B020", "B023", "B907", "B909"}, errors.keys())
+        # too deeply nested for `ast.unparse()`
+        self.assertTrue(errors["B907"].startswith(f"B907 {terms!r} is manually"))
+
+    def test_import_leaves_out_optional_modules(self):
+        # Every flake8 worker and editor run pays for `import bugbear`, so what
+        # only the process pool, stdin and asyncio need isn't imported up front,
+        # and the tools that run without flake8 are in `bugbear_cli`.
+        # scripts/import_time.py measures how long the import takes.
+        script = (
+            "import sys, attr, flake8.exceptions, flake8.style_guide, flake8.utils;"
+            " print(*sys.modules); import bugbear; print(*sys.modules)"
+        )
+        proc = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True,
+            check=True,
+            cwd=Path(__file__).parent.parent,
+            text=True,
+            timeout=60,
+        )
+        before, after = (set(line.split()) for line in proc.stdout.splitlines())
+
+        self.assertLessEqual(
+            after - before, {"bugbear", "array", "bisect", "_bisect", "math"}
+        )
+        self.assertIn("bugbear", after)
+        self.assertNotIn("bugbear_cli", after)
+        self.assertNotIn("multiprocessing", after)
+        self.assertNotIn("pycodestyle", after)
+        self.assertNotIn("asyncio", after)
+
+    def test_main_module_imports_checks_once(self):
+        root = Path(__file__).parent.parent
+        proc = subprocess.run(
+            [
+                sys.executable,
+                *("-X", "importtime", "-m", "bugbear"),
+                os.path.join("tests", "eval_files", "b001.py"),
+            ],
+            capture_output=True,
+            cwd=root,
+            text=True,
+            timeout=60,
+        )
+        self.assertEqual(proc.returncode, 1, proc.stderr)
+        self.assertIn("B001", proc.stdout)
+        imported = [
+            line.rpartition("|")[2].strip() for line in proc.stderr.splitlines()
+        ]
+        self.assertEqual(imported.count("bugbear"), 1)
+        self.assertEqual(imported.count("bugbear_cli"), 1)
+
+    def test_import_builds_few_attrs_classes(self):
+        # attrs generates and compiles the methods of each class at import time,
+        # which took longer than the rest of `import bugbear`; the records of
+        # the analysis are `__slots__` classes and named tuples instead.
+        import attr
+
+        import bugbear
+
+        attrs_classes = {
+            name
+            for name, value in vars(bugbear).items()
+            if isinstance(value, type) and attr.has(value)
+        }
+        self.assertEqual(
+            attrs_classes,
+            {
+                "B040CaughtException",
+                "B041VariableKeyType",
+                "BugBearChecker",
+                "BugBearVisitor",
+            },
+        )
+
     def test_selfclean_bugbear(self):
         filename = Path(__file__).absolute().parent.parent / "bugbear.py"
         proc = subprocess.run(
-            ["flake8", str(filename)],
+            [
+                "flake8",
+                str(filename),
+                str(filename.with_name("bugbear_cli.py")),
+                str(filename.with_name("bugbear_client.py")),
+            ],
             capture_output=True,
             timeout=60,
         )